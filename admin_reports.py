@@ -0,0 +1,49 @@
+import asyncio
+import logging
+
+
+class ReportDispatcher:
+    """
+    Фоновая отправка отчетов админу.
+    Хендлер ученика только кладет готовые сообщения в очередь и сразу отвечает ученику,
+    а фоновый воркер отправляет их по одному. Темп отправки задает общий RateLimiter
+    в сессии бота (см. rate_limiter.py), поэтому паузы asyncio.sleep здесь не нужны.
+    """
+    def __init__(self, bot, max_queue=1000):
+        self.bot = bot
+        self._queue = asyncio.Queue(maxsize=max_queue)
+        self._worker = None
+
+    def start(self):
+        if self._worker is None:
+            self._worker = asyncio.create_task(self._run())
+
+    def submit(self, chat_id, messages):
+        """messages: список словарей с аргументами bot.send_message (text, reply_markup, ...)"""
+        try:
+            self._queue.put_nowait((chat_id, messages))
+        except asyncio.QueueFull:
+            logging.error(f"Очередь отчетов переполнена, отчет для {chat_id} потерян")
+
+    async def close(self, timeout=30):
+        """Дожидаемся отправки накопленных отчетов (не дольше timeout) и останавливаем воркер"""
+        if self._worker is None:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logging.error(f"Не отправлено отчетов при остановке: {self._queue.qsize()}")
+        self._worker.cancel()
+        self._worker = None
+
+    async def _run(self):
+        while True:
+            chat_id, messages = await self._queue.get()
+            try:
+                for message in messages:
+                    try:
+                        await self.bot.send_message(chat_id, **message)
+                    except Exception as e:
+                        print(f"❌ НЕ УДАЛОСЬ ОТПРАВИТЬ ОТЧЕТ АДМИНУ: {e}")
+            finally:
+                self._queue.task_done()
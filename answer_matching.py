@@ -0,0 +1,53 @@
+import re
+
+# Линии, где ответ - набор цифр в любом порядке («выберите утверждения»)
+DIGIT_SET_LINES = {8}
+
+# Все, кроме букв и цифр: пробелы, дефисы и тире, кавычки «» "" '', точки и запятые.
+# Считаются разделителем слов и сворачиваются в один пробел
+_NOISE = re.compile(r"[\W_]+")
+_NOT_DIGIT = re.compile(r"\D+")
+
+
+def normalize_text(answer):
+    """'Северо-Западный  «Край».' -> 'северо западный край'"""
+    return _NOISE.sub(" ", answer.lower().replace("ё", "е")).strip()
+
+
+def digits_sequence(answer):
+    """'3, 1, 2' -> '312' (порядок важен: задания на соответствие)"""
+    return _NOT_DIGIT.sub("", answer)
+
+
+def digits_set(answer):
+    """'3, 1, 2' -> '123', повторы схлопываются (порядок не важен)"""
+    return "".join(sorted(set(digits_sequence(answer))))
+
+
+class AnswerMatcher:
+    """
+    Проверка ответа ученика, собранная один раз из tasks.correct_answer.
+
+    Варианты правильного ответа (через «|») приводятся к ключам, ответ ученика
+    приводится к ключу тем же правилом и ищется в множестве:
+      - линии из DIGIT_SET_LINES: отсортированные уникальные цифры;
+      - ответ только из цифр на других линиях: цифры в исходном порядке;
+      - остальное: нижний регистр, ё -> е; кавычки, знаки препинания, дефисы и тире считаются
+        пробелами, пробелы между словами сворачиваются в один, по краям отбрасываются.
+    Правила идемпотентны: ответ, уже равный ключу, принимается без нормализации.
+    """
+    __slots__ = ('rule', 'keys')
+
+    def __init__(self, line, correct_answer):
+        variants = [v.strip() for v in correct_answer.split("|") if v.strip()]
+        if line in DIGIT_SET_LINES:
+            self.rule = digits_set
+        elif variants and all(normalize_text(v).replace(" ", "").isdigit() for v in variants):
+            self.rule = digits_sequence
+        else:
+            self.rule = normalize_text
+        # Пустой ключ не должен совпадать с пустым ответом ученика
+        self.keys = frozenset(key for key in map(self.rule, variants) if key)
+
+    def matches(self, user_answer):
+        return user_answer in self.keys or self.rule(user_answer) in self.keys
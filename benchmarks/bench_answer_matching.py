@@ -0,0 +1,102 @@
+"""
+Проверка и бенчмарк сопоставления ответов (answer_matching.py).
+
+Прогоняет корпус ответов учеников (benchmarks/data/answer_corpus.json) через старую
+проверку из check_answer и через AnswerMatcher: падает, если новый движок расходится
+с ожидаемым вердиктом, и считает, сколько верных ответов старая проверка отклоняла
+(каждый такой отказ - лишний долг и лишнее сообщение админу). Затем меряет время проверки.
+
+AnswerMatcher не быстрее старой проверки: на неточных ответах корпуса он примерно вдвое дороже
+(нормализация - lower, ё -> е и одна регулярка), ответ, уже совпадающий с ключом, принимается
+без нормализации. Это единицы микросекунд на сообщение ученика - на фоне обращения к Telegram незаметно.
+
+Пополнить корпус реальными ответами: python benchmarks/bench_answer_matching.py --export literature_bot.db
+выгружает отклоненные ответы из user_results в JSON; вердикт expected проставляется вручную.
+
+Запуск: python benchmarks/bench_answer_matching.py
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from answer_matching import AnswerMatcher
+
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "answer_corpus.json")
+ROUNDS = 20000
+
+
+def old_check(line, correct_answer, user_answer):
+    """Проверка в том виде, в каком она была в check_answer до answer_matching.py"""
+    user_answer = user_answer.strip().lower()
+    correct_variants = correct_answer.split("|")
+    if line == 8:
+        return "".join(filter(str.isdigit, user_answer)) in correct_variants
+    return user_answer in correct_variants
+
+
+def export(db_name):
+    conn = sqlite3.connect(db_name)
+    rows = conn.execute('''
+        SELECT DISTINCT t.line_number, t.correct_answer, r.user_answer
+        FROM user_results r JOIN tasks t ON t.id = r.task_id
+        WHERE r.status = 2 AND r.user_answer IS NOT NULL
+        ORDER BY t.line_number
+    ''').fetchall()
+    conn.close()
+    corpus = [{"line": line, "correct_answer": correct, "user_answer": answer, "expected": None}
+              for line, correct, answer in rows]
+    json.dump(corpus, sys.stdout, ensure_ascii=False, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--export", metavar="DB", help="выгрузить отклоненные ответы из базы в JSON")
+    args = parser.parse_args()
+    if args.export:
+        export(args.export)
+        return
+
+    with open(CORPUS_PATH, encoding="utf-8") as f:
+        corpus = json.load(f)
+
+    failures = 0
+    rescued = 0
+    for case in corpus:
+        matcher = AnswerMatcher(case["line"], case["correct_answer"])
+        verdict = matcher.matches(case["user_answer"])
+        if verdict != case["expected"]:
+            failures += 1
+            print(f"РАСХОЖДЕНИЕ: линия {case['line']}, {case['correct_answer']!r} <- {case['user_answer']!r}: "
+                  f"получили {verdict}, ожидали {case['expected']}")
+        if case["expected"] and not old_check(case["line"], case["correct_answer"], case["user_answer"]):
+            rescued += 1
+    print(f"Корпус: {len(corpus)} ответов, расхождений: {failures}")
+    print(f"Верных ответов, которые старая проверка отклоняла: {rescued}\n")
+
+    matchers = [(AnswerMatcher(c["line"], c["correct_answer"]), c) for c in corpus]
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        for c in corpus:
+            old_check(c["line"], c["correct_answer"], c["user_answer"])
+    old_time = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        for matcher, c in matchers:
+            matcher.matches(c["user_answer"])
+    new_time = time.perf_counter() - start
+    checks = ROUNDS * len(corpus)
+    print(f"{'проверка':<32} {'мкс на ответ':>14}")
+    print(f"{'старая (split на каждый ответ)':<32} {old_time / checks * 1e6:>14.2f}")
+    print(f"{'AnswerMatcher':<32} {new_time / checks * 1e6:>14.2f}")
+
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Бенчмарк: 200 учеников одновременно нажимают «🔥 Получить задания на сегодня».
+
+Сравниваются два режима:
+  sync  - методы Database вызываются прямо из корутины (как было раньше);
+  async - через AsyncDatabase (пул потоков, соединение на поток), для нескольких размеров пула.
+
+Цель - p99 задержки хендлера, которая не растет с числом учеников. Для сравнения меряем
+и задержку «зонда» - легкого хендлера другого пользователя, которому нужен только event loop.
+
+Итог замеров: цель по хендлеру не достигнута. Работа хендлера (~0.5-1 мс на ученика) - запросы
+SQLite и Python-код выборщика, параллелятся они плохо (GIL, одна блокировка записи SQLite),
+поэтому при одновременном нажатии N учеников последний ждет работу почти всех остальных
+и p99 хендлера растет примерно линейно с N в обоих режимах; размер пула это не меняет.
+В async p99 хендлера даже выше, чем в sync: каждый запрос - переход в пул потоков и обратно.
+Пул потоков выигрывает только по зонду: event loop не стоит, пока идут запросы к базе.
+
+Запуск: python benchmarks/bench_async_db.py [--workers 1,4,8]
+"""
+import argparse
+import asyncio
+import os
+import sqlite3
+import tempfile
+import time
+
+from bench_utils import seed_database, percentile
+from database import Database, AsyncDatabase
+
+TASKS_COUNT = 1156
+HISTORY_PER_USER = 300
+CONCURRENCY_LEVELS = [1, 50, 200]
+PROBE_INTERVAL = 0.005
+
+
+def reset_today(db_name):
+    conn = sqlite3.connect(db_name)
+    conn.execute("DELETE FROM user_results WHERE assigned_date = CURRENT_DATE")
+    conn.commit()
+    conn.close()
+
+
+async def press_button(db, user_id, is_async):
+    """Та же последовательность запросов, что и в start_daily_tasks"""
+    started = time.perf_counter()
+    if is_async:
+        if not await db.get_pending_tasks(user_id) and not await db.check_today_completed(user_id):
+            await db.get_new_tasks_for_user(user_id)
+    else:
+        if not db.get_pending_tasks(user_id) and not db.check_today_completed(user_id):
+            db.get_new_tasks_for_user(user_id)
+        await asyncio.sleep(0)
+    return time.perf_counter() - started
+
+
+async def probe(stop, delays):
+    """Легкий хендлер: сколько он ждет event loop сверх запрошенной паузы"""
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        started = loop.time()
+        await asyncio.sleep(PROBE_INTERVAL)
+        delays.append(loop.time() - started - PROBE_INTERVAL)
+
+
+async def run(db, students, is_async):
+    stop = asyncio.Event()
+    probe_delays = []
+    probe_task = asyncio.create_task(probe(stop, probe_delays))
+    await asyncio.sleep(PROBE_INTERVAL * 2)
+    started = time.perf_counter()
+    latencies = await asyncio.gather(*(press_button(db, u, is_async) for u in range(1, students + 1)))
+    wall = time.perf_counter() - started
+    stop.set()
+    await probe_task
+    return latencies, probe_delays or [0.0], wall
+
+
+async def main(workers):
+    with tempfile.TemporaryDirectory() as tmp:
+        db_name = os.path.join(tmp, "bench.db")
+        seed_database(db_name, TASKS_COUNT, max(CONCURRENCY_LEVELS), HISTORY_PER_USER)
+
+        print(f"{'режим':<9} {'учеников':>8} {'p50 хендл.':>11} {'p99 хендл.':>11} {'p99 зонда':>10} {'время':>8}")
+        for mode in ["sync"] + [f"async/{n}" for n in workers]:
+            is_async = mode != "sync"
+            db = AsyncDatabase(db_name, max_workers=int(mode.split("/")[1])) if is_async else Database(db_name)
+            handler_p99 = []
+            for students in CONCURRENCY_LEVELS:
+                reset_today(db_name)
+                latencies, probe_delays, wall = await run(db, students, is_async)
+                handler_p99.append(percentile(latencies, 99))
+                print(f"{mode:<9} {students:>8} {percentile(latencies, 50) * 1000:>9.1f}ms "
+                      f"{handler_p99[-1] * 1000:>9.1f}ms {percentile(probe_delays, 99) * 1000:>8.1f}ms "
+                      f"{wall:>7.2f}s")
+            if is_async:
+                await db.close()
+            else:
+                db.close()
+            growth = handler_p99[-1] / max(handler_p99[0], 1e-9)
+            print(f"{mode:<9} p99 хендлера при {CONCURRENCY_LEVELS[-1]} учениках в {growth:.0f} раз(а) больше, "
+                  f"чем при {CONCURRENCY_LEVELS[0]}: цель (не растет) {'достигнута' if growth < 2 else 'НЕ достигнута'}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", default="1,4,8", help="размеры пула потоков AsyncDatabase через запятую")
+    args = parser.parse_args()
+    asyncio.run(main([int(n) for n in args.workers.split(",")]))
@@ -0,0 +1,158 @@
+"""
+Проверка и бенчмарк clean_text (card_parser.py).
+
+1. Золотые примеры (benchmarks/data/clean_text_golden.json): clean_text и прежняя версия должны выдать
+   ожидаемый текст символ в символ - пропуски " _______ ", абзацы, сущности, скрытые script/template и т. п.
+2. Скорость clean_text на карточках в духе архива против прежней версии.
+3. Повторный разбор всего архива (reparse_archive.reparse_one): сколько занимает карточка целиком
+   и какую долю из этого дает clean_text. По умолчанию - синтетический архив, --archive - настоящий.
+
+Однопроходная очистка на html.parser.HTMLParser без дерева BeautifulSoup была быстрее в 1.3-1.5 раза
+на самой clean_text, но повторный разбор карточки ускоряла лишь на 3-5%: основное время уходит
+на дерево карточки, decode_contents и CSS-селекторы в parse_card. Поэтому clean_text осталась на BeautifulSoup.
+
+Запуск: python benchmarks/bench_clean_text.py [--archive html_archive] [--limit 1000]
+"""
+import argparse
+import itertools
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from bs4 import BeautifulSoup
+
+import card_parser
+from card_parser import clean_text
+from html_archive import HtmlArchive
+from reparse_archive import reparse_one
+
+GOLDEN_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "clean_text_golden.json")
+CARDS = 300
+ROUNDS = 3
+
+
+def old_clean_text(html_content):
+    """clean_text в исходном виде: четыре прохода str.replace и re.sub без предкомпиляции"""
+    if not html_content: return None
+
+    html_content = html_content.replace("<br>", "\n").replace("<br/>", "\n")
+    html_content = html_content.replace("</p>", "\n\n")
+    html_content = html_content.replace("</div>", "\n")
+    html_content = html_content.replace("</li>", "\n")
+
+    soup = BeautifulSoup(html_content, "html.parser")
+
+    for tag in soup.find_all(True):
+        style = tag.get('style', '')
+        is_underlined = (tag.name == 'u') or ('text-decoration' in style and 'underline' in style)
+
+        if is_underlined:
+            inner_text = tag.get_text(strip=True)
+            if not inner_text:
+                tag.replace_with(" _______ ")
+
+    text = soup.get_text(separator=" ")
+
+    text = re.sub(r'[ \t]+', ' ', text)
+    text = re.sub(r' *\n *', '\n', text)
+    text = re.sub(r'\n{3,}', '\n\n', text)
+
+    return text.strip()
+
+
+def archive_cards(count):
+    rng = random.Random(1)
+    verse = "<p>" + "<br>".join("Строка стихотворения номер %d, где&nbsp;есть «кавычки»" % n for n in range(40)) + "</p>"
+    cards = []
+    for n in range(count):
+        question = (f'<p>Вопрос {n}: назовите <b>термин</b>, обозначающий приём '
+                    f'<span style="text-decoration: underline">&nbsp;&nbsp;</span> в строках {rng.randint(1, 40)}.</p>')
+        text = verse * rng.randint(1, 4)
+        cards.append(f'<div class="rounded-xl border-natural-2"><div>{rng.randint(1, 8)} линия</div>'
+                     f'<div class="detail-text_detailText__YRcv_">{question}</div>'
+                     f'<div class="detail-text_detailText__YRcv_">{text}</div><div><b>Ответ:</b> ответ</div></div>')
+    return cards
+
+
+def time_best(function, items):
+    best = None
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        for item in items:
+            function(item)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def reparse_time(jobs):
+    """(секунды на карточку с clean_text, доля clean_text) для reparse_one по заданиям архива"""
+    total = time_best(reparse_one, jobs)
+    calls = []
+    original = card_parser.clean_text
+
+    def counted(html_content):
+        start = time.perf_counter()
+        result = original(html_content)
+        calls.append(time.perf_counter() - start)
+        return result
+
+    card_parser.clean_text = counted
+    try:
+        for job in jobs:
+            reparse_one(job)
+    finally:
+        card_parser.clean_text = original
+    return total / len(jobs), sum(calls) / total
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--archive", help="каталог архива html_archive.py (по умолчанию - синтетический)")
+    parser.add_argument("--limit", type=int, default=1000, help="сколько карточек архива разобрать")
+    args = parser.parse_args()
+
+    with open(GOLDEN_PATH, encoding="utf-8") as f:
+        golden = json.load(f)
+    failures = 0
+    for case in golden:
+        for name, function in (("прежняя", old_clean_text), ("текущая", clean_text)):
+            result = function(case["html"])
+            if result != case["expected"]:
+                failures += 1
+                print(f"РАСХОЖДЕНИЕ ({name}) в «{case['name']}»: {result!r} != {case['expected']!r}")
+    print(f"Золотые примеры: {len(golden)}, расхождений: {failures}\n")
+
+    cards = archive_cards(CARDS)
+    size = sum(len(card) for card in cards)
+    print(f"Карточек: {CARDS}, {size / 1024:.0f} КБ HTML\n")
+    print(f"{'версия':<28} {'мс на карточку':>15} {'МБ/с':>8}")
+    for name, function in (("прежняя", old_clean_text), ("текущая", clean_text)):
+        best = time_best(function, cards)
+        print(f"{name:<28} {best / CARDS * 1000:>15.2f} {size / best / 1024 / 1024:>8.2f}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = args.archive
+        if root is None:
+            root = tmp
+            archive = HtmlArchive(root)
+            for card in archive_cards(args.limit):
+                archive.put(card)
+        keys = list(itertools.islice(HtmlArchive(root).keys(), args.limit))
+        jobs = [(n, root, key) for n, key in enumerate(keys)]
+        per_card, share = reparse_time(jobs)
+    print(f"\nПовторный разбор ({len(jobs)} карточек, {'синтетический архив' if args.archive is None else root}): "
+          f"{per_card * 1000:.2f} мс на карточку, из них clean_text {share:.0%}")
+
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
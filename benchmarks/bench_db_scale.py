@@ -0,0 +1,197 @@
+"""
+Время каждого метода Database на синтетических базах нескольких размеров (generate_data.py).
+Порядок вызовов повторяет учебный день: ночная выдача заданий всем ученикам, затем у учеников
+выборки проверка, задания с долгами, ответы, отчет, вечером рассылка напоминаний и поиск админа.
+Результаты - в JSON (--json), чтобы сравнивать прогоны между версиями.
+
+Запуск: python benchmarks/bench_db_scale.py --sizes small,medium,large --json results.json
+Размер задается именем из SIZES или тройкой учеников:заданий:результатов_на_ученика.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+from bench_utils import percentile
+from generate_data import generate
+from database import Database
+
+SIZES = {
+    "small": (500, 1000, 50),
+    "medium": (2000, 5000, 200),
+    "large": (5000, 10000, 400),
+}
+# Методы, которые не замеряются по отдельности: служебные или вызываются внутри других
+NOT_TIMED = {"connection", "cursor", "close"}
+REMINDER_BATCH = 100
+SEARCH_QUERIES = ["вопрос линии", "фрагмент произведения", "литературного текста", "вопрос 17", "строка"]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Замер методов Database на больших базах")
+    parser.add_argument("--sizes", default="small,medium,large")
+    parser.add_argument("--samples", type=int, default=200, help="учеников в выборке на размер")
+    parser.add_argument("--data-dir", help="где хранить сгенерированные базы (по умолчанию временная папка)")
+    parser.add_argument("--json", help="файл для результатов в JSON")
+    parser.add_argument("--seed", type=int, default=1)
+    return parser.parse_args()
+
+
+def parse_size(name):
+    if name in SIZES:
+        return SIZES[name]
+    users, tasks, per_user = (int(part) for part in name.split(":"))
+    return users, tasks, per_user
+
+
+class Timer:
+    def __init__(self):
+        self.samples = defaultdict(list)
+
+    def call(self, name, method, *args):
+        start = time.perf_counter()
+        result = method(*args)
+        self.samples[name].append((time.perf_counter() - start) * 1000)
+        return result
+
+    def summary(self):
+        return {name: {"calls": len(values),
+                       "mean_ms": round(sum(values) / len(values), 3),
+                       "p50_ms": round(percentile(values, 50), 3),
+                       "p95_ms": round(percentile(values, 95), 3),
+                       "p99_ms": round(percentile(values, 99), 3),
+                       "max_ms": round(max(values), 3)}
+                for name, values in sorted(self.samples.items())}
+
+
+def run_day(db, timer, users, tasks_count):
+    """Один учебный день выборки учеников, каждый метод через timer"""
+    # День как у CURRENT_DATE в SQLite (UTC) - по нему generate_data строит историю
+    today = datetime.datetime.now(datetime.timezone.utc).date()
+    timer.call("get_schema_version", db.get_schema_version)
+    timer.call("get_todays_lines", db.get_todays_lines)
+    timer.call("preassign_daily_tasks", db.preassign_daily_tasks, today)
+    for user_id in users:
+        timer.call("user_exists", db.user_exists, user_id)
+        timer.call("get_user_name", db.get_user_name, user_id)
+        timer.call("check_today_completed", db.check_today_completed, user_id)
+        timer.call("get_new_tasks_for_user", db.get_new_tasks_for_user, user_id)
+        timer.call("get_pending_tasks", db.get_pending_tasks, user_id)
+        timer.call("get_debt_tasks", db.get_debt_tasks, user_id)
+
+    db.task_cache.invalidate()
+    for user_id in users:
+        for task_id in db.get_pending_tasks(user_id):
+            timer.call("get_task", db.get_task, task_id)
+            timer.call("get_correct_answer", db.get_correct_answer, task_id)
+            timer.call("get_task_text", db.get_task_text, task_id)
+            timer.call("get_task_pages", db.get_task_pages, task_id)
+            timer.call("update_task_status", db.update_task_status, user_id, task_id, random.random() < 0.7, "ответ")
+        stats = timer.call("get_daily_stats", db.get_daily_stats, user_id)
+        timer.call("get_user_line_stats", db.get_user_line_stats, user_id)
+        for row in stats[:1]:
+            timer.call("get_task_text_by_result_id", db.get_task_text_by_result_id, row[0])
+            timer.call("get_task_id_by_result_id", db.get_task_id_by_result_id, row[0])
+            timer.call("toggle_result_status", db.toggle_result_status, row[0], 1)
+
+    for task_id in random.sample(range(1, tasks_count + 1), 20):
+        timer.call("toggle_task_active_status", db.toggle_task_active_status, task_id, 0)
+        timer.call("toggle_task_active_status", db.toggle_task_active_status, task_id, 1)
+    for _ in range(20):
+        timer.call("get_stats_overview", db.get_stats_overview)
+    timer.call("rebuild_stats", db.rebuild_stats)
+
+    # Вечерняя рассылка: как ReminderBroadcast.run, все сообщения считаются доставленными
+    timer.call("is_reminder_run_unfinished", db.is_reminder_run_unfinished, today)
+    timer.call("start_reminder_run", db.start_reminder_run, today)
+    to_remind = timer.call("get_users_to_remind", db.get_users_to_remind, today)
+    for start in range(0, len(to_remind), REMINDER_BATCH):
+        batch = to_remind[start:start + REMINDER_BATCH]
+        timer.call("claim_reminders", db.claim_reminders, today, batch)
+        timer.call("record_reminders", db.record_reminders, today, batch, [])
+    timer.call("finish_reminder_run", db.finish_reminder_run, today)
+
+    for query in SEARCH_QUERIES:
+        for page in range(4):
+            timer.call("search_tasks", db.search_tasks, query, 5, page * 5)
+
+    new_user = 10 ** 9
+    timer.call("add_user", db.add_user, new_user, "bench", "Новый Ученик")
+
+
+def bench_size(name, data_dir, samples, seed):
+    users_count, tasks_count, per_user = parse_size(name)
+    db_name = os.path.join(data_dir, f"bench_{users_count}_{tasks_count}_{per_user}.db")
+    rows = generate(db_name, users_count, tasks_count, per_user, days=600, seed=seed)
+
+    db = Database(db_name)
+    timer = Timer()
+    # Первое обращение загружает банк заданий в выборщик - замеряем отдельно
+    timer.call("sampler_load_tasks", db.get_new_tasks_for_user, users_count)
+    users = random.sample(range(1, users_count), min(samples, users_count - 1))
+    run_day(db, timer, users, tasks_count)
+    db.close()
+
+    uncovered = sorted(name for name in dir(Database)
+                       if not name.startswith("_") and name not in NOT_TIMED and name not in timer.samples)
+    if uncovered:
+        print(f"!!! Не замерены методы: {', '.join(uncovered)}")
+    return {"size": name, "users": users_count, "tasks": tasks_count, "user_results": rows,
+            "db_mb": round(os.path.getsize(db_name) / 1024 / 1024, 1), "methods": timer.summary()}
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def print_size(result):
+    print(f"\n=== {result['size']}: учеников {result['users']}, заданий {result['tasks']}, "
+          f"результатов {result['user_results']} ({result['db_mb']} МБ)")
+    print(f"{'метод':<28} {'вызовов':>8} {'среднее':>10} {'p50':>10} {'p95':>10} {'p99':>10}")
+    for method, row in result["methods"].items():
+        print(f"{method:<28} {row['calls']:>8} {row['mean_ms']:>8.3f}ms {row['p50_ms']:>8.3f}ms "
+              f"{row['p95_ms']:>8.3f}ms {row['p99_ms']:>8.3f}ms")
+
+
+def main():
+    args = parse_args()
+    random.seed(args.seed)
+    report = {
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "git_revision": git_revision(),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "samples": args.samples,
+        "sizes": [],
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = args.data_dir or tmp
+        os.makedirs(data_dir, exist_ok=True)
+        for name in args.sizes.split(","):
+            result = bench_size(name, data_dir, args.samples, args.seed)
+            print_size(result)
+            report["sizes"].append(result)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\nРезультаты записаны в {args.json}")
+    else:
+        json.dump(report, sys.stdout, ensure_ascii=False)
+        print()
+
+
+if __name__ == "__main__":
+    main()
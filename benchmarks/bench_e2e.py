@@ -0,0 +1,158 @@
+"""
+Сквозной нагрузочный тест main.py без настоящего Telegram.
+Бот работает в этом же процессе через long polling к заглушке Bot API (fake_telegram.py).
+Каждый симулированный ученик проходит весь путь: /start, регистрация, кнопка заданий,
+ответы (иногда с «📖 Показать текст»), итог дня. Админ в это время получает отчеты.
+
+Выводит по каждому хендлеру пропускную способность и p50/p95/p99 времени обработки,
+по каждому шагу ученика - задержку от сообщения до ответа бота.
+С --json результаты пишутся в файл для сравнения между версиями.
+Запуск: python benchmarks/bench_e2e.py --students 2000
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+from bench_utils import seed_database, percentile
+from fake_telegram import FakeTelegram
+
+ADMIN_ID = 1
+BUTTON = "🔥 Получить задания на сегодня"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--students", type=int, default=2000)
+    parser.add_argument("--text-share", type=float, default=0.3, help="доля заданий, где ученик открывает текст")
+    parser.add_argument("--wrong-share", type=float, default=0.3, help="доля неверных ответов")
+    parser.add_argument("--real-limits", action="store_true",
+                        help="оставить лимиты отправки Telegram (по умолчанию сняты: у заглушки их нет)")
+    parser.add_argument("--json", help="файл для результатов в JSON")
+    parser.add_argument("--seed", type=int, default=1)
+    return parser.parse_args()
+
+
+class Student:
+    def __init__(self, fake, user_id, steps, args):
+        self.fake = fake
+        self.user_id = user_id
+        self.steps = steps
+        self.args = args
+
+    async def say(self, step, text, *markers):
+        start = time.perf_counter()
+        self.fake.send_text(self.user_id, text)
+        return await self.wait(step, start, markers)
+
+    async def press(self, step, data, *markers):
+        start = time.perf_counter()
+        self.fake.press_button(self.user_id, data)
+        return await self.wait(step, start, markers)
+
+    async def wait(self, step, start, markers):
+        while True:
+            message = await self.fake.inbox[self.user_id].get()
+            if any(marker in message["text"] for marker in markers):
+                self.steps[step].append((time.perf_counter() - start) * 1000)
+                return message
+
+    async def run(self):
+        await self.say("/start", "/start", "Фамилию и Имя")
+        await self.say("регистрация", f"Ученик{self.user_id} Тестовый", "Приятно познакомиться")
+        message = await self.say("кнопка заданий", BUTTON, "Задание №", "заданий больше нет")
+        while "Задание №" in message["text"]:
+            buttons = [button for row in message.get("reply_markup", {}).get("inline_keyboard", []) for button in row]
+            if buttons and random.random() < self.args.text_share:
+                await self.press("показать текст", buttons[0]["callback_data"], "Текст к заданию")
+            answer = "неверно" if random.random() < self.args.wrong_share else "ответ"
+            message = await self.say("ответ", answer, "Задание №", "закончены")
+
+
+def collect_handler_timings(dp, timings):
+    """Inner middleware: время каждого хендлера по имени функции"""
+    async def timing(handler, event, data):
+        start = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            timings[data["handler"].callback.__name__].append((time.perf_counter() - start) * 1000)
+    dp.message.middleware(timing)
+    dp.callback_query.middleware(timing)
+
+
+def summarize(samples, elapsed):
+    return {name: {"count": len(values), "per_second": round(len(values) / elapsed, 1),
+                   "p50_ms": round(percentile(values, 50), 2), "p95_ms": round(percentile(values, 95), 2),
+                   "p99_ms": round(percentile(values, 99), 2)}
+            for name, values in sorted(samples.items())}
+
+
+def print_table(title, rows):
+    print(f"\n{title:<28} {'кол-во':>8} {'в сек':>8} {'p50':>9} {'p95':>9} {'p99':>9}")
+    for name, row in rows.items():
+        print(f"{name:<28} {row['count']:>8} {row['per_second']:>8} "
+              f"{row['p50_ms']:>7.1f}ms {row['p95_ms']:>7.1f}ms {row['p99_ms']:>7.1f}ms")
+
+
+async def run(args, db_name):
+    fake = FakeTelegram()
+    api_url = await fake.start()
+    env = dict(BOT_TOKEN="42:BENCH", DB_PATH=db_name, TELEGRAM_API_URL=api_url, ADMIN_ID=str(ADMIN_ID))
+    if not args.real_limits:
+        env.update(SEND_RATE="1000000", SEND_CHAT_RATE="1000000")
+    os.environ.update(env)
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+    import main
+
+    timings, steps = defaultdict(list), defaultdict(list)
+    collect_handler_timings(main.dp, timings)
+    main.dp.shutdown.register(main.on_shutdown)
+    main.reports.start()
+    polling = asyncio.create_task(main.dp.start_polling(main.bot, handle_signals=False))
+
+    start = time.perf_counter()
+    students = [Student(fake, user_id, steps, args) for user_id in range(1000, 1000 + args.students)]
+    await asyncio.gather(*(student.run() for student in students))
+    elapsed = time.perf_counter() - start
+
+    await main.dp.stop_polling()
+    await polling  # при остановке очередь отчетов админу отправляется до конца
+    await fake.stop()
+    return {
+        "students": args.students,
+        "elapsed_s": round(elapsed, 2),
+        "updates": sum(len(values) for values in steps.values()),
+        "bot_api_calls": {method: fake.count(method) for method in sorted({call[0] for call in fake.calls})},
+        "admin_messages": fake.inbox[ADMIN_ID].qsize(),
+        "handlers": summarize(timings, elapsed),
+        "steps": summarize(steps, elapsed),
+    }
+
+
+def main():
+    args = parse_args()
+    random.seed(args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        db_name = os.path.join(tmp, "bench.db")
+        seed_database(db_name)
+        result = asyncio.run(run(args, db_name))
+
+    print(f"\nУчеников: {result['students']}, время: {result['elapsed_s']} с, "
+          f"сообщений админу: {result['admin_messages']}")
+    print("Вызовы Bot API: " + ", ".join(f"{method} {count}" for method, count in result["bot_api_calls"].items()))
+    print_table("Хендлер (время обработки)", result["handlers"])
+    print_table("Шаг ученика (до ответа бота)", result["steps"])
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"\nРезультаты записаны в {args.json}")
+
+
+if __name__ == "__main__":
+    main()
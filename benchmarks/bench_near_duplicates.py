@@ -0,0 +1,111 @@
+"""
+Проверка и бенчмарк поиска почти одинаковых заданий (near_duplicates.py).
+
+Синтетический банк: отрывки по нескольку заданий с разными вопросами на каждый
+(общий текст - не дубль) и подброшенные копии заданий с одной-двумя заменами слов
+(дубли, которые должен найти отчет).
+1. На всем банке: сколько подброшенных дублей найдено через MinHash/LSH и за какое время.
+2. На первых --brute заданиях: LSH против сравнения всех пар той же линии - те же пары, время.
+
+Запуск: python benchmarks/bench_near_duplicates.py [--tasks 10000] [--brute 2000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from near_duplicates import TaskShingles, find_similar_pairs, jaccard, DEFAULT_THRESHOLD
+
+LINES = [1, 2, 3, 6, 7, 8]
+TASKS_PER_EXCERPT = 5
+DUPLICATE_SHARE = 0.03
+SYLLABLES = ["ка", "ро", "ми", "на", "ле", "ст", "во", "ду", "ше", "ть", "пра", "зо", "гу", "бе", "лё"]
+
+
+def make_vocabulary(size=5000):
+    words = set()
+    while len(words) < size:
+        words.add("".join(random.choices(SYLLABLES, k=random.randint(2, 4))))
+    return sorted(words)
+
+
+def mutate(text, vocabulary, edits):
+    words = text.split()
+    for _ in range(edits):
+        words[random.randrange(len(words))] = random.choice(vocabulary)
+    return " ".join(words)
+
+
+def generate_bank(tasks_count):
+    """[(task_id, line, вопрос, текст)] и множество пар (оригинал, копия)"""
+    vocabulary = make_vocabulary()
+    bank, planted = [], set()
+    while len(bank) < tasks_count:
+        line = random.choice(LINES)
+        excerpt = " ".join(random.choices(vocabulary, k=random.randint(150, 400)))
+        for _ in range(TASKS_PER_EXCERPT):
+            question = " ".join(random.choices(vocabulary, k=random.randint(15, 40)))
+            bank.append((len(bank) + 1, line, question, excerpt))
+            if random.random() < DUPLICATE_SHARE:
+                original = bank[-1]
+                bank.append((len(bank) + 1, line, mutate(question, vocabulary, 1), mutate(excerpt, vocabulary, 2)))
+                planted.add((original[0], len(bank)))
+    return bank[:tasks_count], {pair for pair in planted if pair[1] <= tasks_count}
+
+
+def brute_force_pairs(items, threshold):
+    pairs = []
+    for i, a in enumerate(items):
+        for b in items[i + 1:]:
+            if a.line == b.line and jaccard(a.question, b.question) >= threshold \
+                    and jaccard(a.content, b.content) >= threshold:
+                pairs.append((a.task_id, b.task_id))
+    return pairs
+
+
+def normalized(pairs):
+    return {tuple(sorted(pair[:2])) for pair in pairs}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tasks", type=int, default=10000)
+    parser.add_argument("--brute", type=int, default=2000, help="заданий для сравнения со всеми парами")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    bank, planted = generate_bank(args.tasks)
+    start = time.perf_counter()
+    items = [TaskShingles(task_id, line, question, excerpt) for task_id, line, question, excerpt in bank]
+    shingled = time.perf_counter()
+    found = normalized(find_similar_pairs(items, DEFAULT_THRESHOLD))
+    searched = time.perf_counter()
+    # Одна замена в коротком вопросе может опустить сходство ниже порога - такие копии отчет находить не должен
+    by_id = {item.task_id: item for item in items}
+    expected = {(a, b) for a, b in planted if jaccard(by_id[a].question, by_id[b].question) >= DEFAULT_THRESHOLD
+                and jaccard(by_id[a].content, by_id[b].content) >= DEFAULT_THRESHOLD}
+    print(f"Банк: заданий {len(items)}, подброшено копий {len(planted)}, из них сходство >= {DEFAULT_THRESHOLD}: {len(expected)}")
+    print(f"LSH: найдено пар {len(found)}, из ожидаемых {len(expected & found)}/{len(expected)}, "
+          f"лишних {len(found - planted)}; шинглы {shingled - start:.2f} с, поиск {searched - shingled:.2f} с")
+
+    subset = items[:args.brute]
+    start = time.perf_counter()
+    lsh = normalized(find_similar_pairs(subset, DEFAULT_THRESHOLD))
+    lsh_time = time.perf_counter() - start
+    start = time.perf_counter()
+    brute = normalized(brute_force_pairs(subset, DEFAULT_THRESHOLD))
+    brute_time = time.perf_counter() - start
+    print(f"\nПервые {len(subset)} заданий: все пары {brute_time:.2f} с, LSH {lsh_time:.3f} с "
+          f"(x{brute_time / max(lsh_time, 1e-9):.0f})")
+    print(f"Пары совпадают: {'да' if lsh == brute else 'нет'} (все пары: {len(brute)}, LSH: {len(lsh)}, "
+          f"пропущено LSH: {len(brute - lsh)})")
+    scale = (len(items) / max(len(subset), 1)) ** 2
+    print(f"Все пары на всем банке заняли бы около {brute_time * scale:.0f} с")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Бенчмарк памяти FSM-сессий при 1000 активных учеников.
+
+Старая схема: в state.set_data клались полные словари заданий
+(вопрос, варианты и весь текст произведения) для каждого задания и каждого долга.
+Новая схема: только id заданий, граница долгов и текущий индекс (см. new_session в main.py).
+
+Меряем память данных сессий (tracemalloc) и размер JSON, который хранилище
+сериализует при каждом update_data.
+
+Запуск: python benchmarks/bench_session_memory.py
+"""
+import json
+import random
+import tracemalloc
+
+SESSIONS = 1000
+NEW_TASKS = 5
+AVG_DEBTS = 3
+TASKS_COUNT = 1156
+
+QUESTION = "Укажите название литературного направления, принципы которого нашли воплощение в произведении. " * 2
+OPTIONS = "1) романтизм 2) реализм 3) сентиментализм 4) классицизм 5) модернизм"
+CONTENT = "Строка литературного текста, которую ученик читает перед ответом. " * 80
+
+
+def fresh(text):
+    # Каждая строка из sqlite - отдельный объект, поэтому копируем, а не переиспользуем
+    return text.encode("utf-8").decode("utf-8")
+
+
+def old_session(task_ids, debt_count):
+    queue = []
+    for number, task_id in enumerate(task_ids):
+        queue.append({
+            'id': task_id, 'line': random.choice([1, 2, 3, 6, 7, 8]), 'question': fresh(QUESTION),
+            'options': fresh(OPTIONS), 'text': fresh(CONTENT), 'is_debt': number >= len(task_ids) - debt_count,
+        })
+    return {'tasks_queue': queue, 'current_index': 0}
+
+
+def compact_session(task_ids, debt_count):
+    return {'task_ids': list(task_ids), 'debt_from': len(task_ids) - debt_count, 'current_index': 0}
+
+
+def measure(build):
+    random.seed(1)
+    tracemalloc.start()
+    sessions = {}
+    for user_id in range(SESSIONS):
+        debt_count = random.randint(0, AVG_DEBTS * 2)
+        task_ids = random.sample(range(1, TASKS_COUNT + 1), NEW_TASKS + debt_count)
+        sessions[user_id] = build(task_ids, debt_count)
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    payload = sum(len(json.dumps(data, ensure_ascii=False).encode("utf-8")) for data in sessions.values())
+    return memory, payload
+
+
+def main():
+    print(f"Активных сессий: {SESSIONS}, в среднем {NEW_TASKS} заданий + {AVG_DEBTS} долга\n")
+    print(f"{'схема':<22} {'память':>10} {'JSON всех сессий':>18} {'JSON на сессию':>16}")
+    results = {}
+    for name, build in (("полные словари", old_session), ("только id", compact_session)):
+        memory, payload = measure(build)
+        results[name] = memory
+        print(f"{name:<22} {memory / 1024 / 1024:>8.2f}МБ {payload / 1024 / 1024:>16.2f}МБ {payload / SESSIONS / 1024:>14.2f}КБ")
+    print(f"\nЭкономия памяти: в {results['полные словари'] / results['только id']:.0f} раз")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""Общие помощники бенчмарков: тестовая база и перцентили."""
+import os
+import random
+import sqlite3
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from create_db import create_database
+from text_storage import compress_text, index_task_texts
+
+LINES = [1, 2, 3, 6, 7, 8]
+
+
+def seed_database(db_name, tasks_count=1156, users_count=0, history_per_user=0, text_repeat=60):
+    """Создает базу по миграциям и заполняет задания, учеников и старую историю ответов"""
+    create_database(db_name).close()
+    conn = sqlite3.connect(db_name)
+    plain_text = "Строка литературного текста. " * text_repeat
+    text = compress_text(plain_text)
+    conn.executemany(
+        "INSERT INTO tasks (line_number, question_text, options_text, content_z, correct_answer) VALUES (?, ?, NULL, ?, ?)",
+        [(LINES[i % len(LINES)], f"Вопрос {i}", text, "ответ") for i in range(tasks_count)],
+    )
+    index_task_texts(conn.cursor(), [(row[0], plain_text) for row in conn.execute("SELECT id FROM tasks").fetchall()])
+    conn.executemany("INSERT INTO users (user_id, username, full_name) VALUES (?, ?, ?)",
+                     [(u, f"user{u}", f"Ученик {u}") for u in range(1, users_count + 1)])
+    rows = []
+    for user_id in range(1, users_count + 1):
+        for task_id in random.sample(range(1, tasks_count + 1), history_per_user):
+            rows.append((user_id, task_id, random.choice([1, 1, 1, 2]), "2024-01-01"))
+    conn.executemany("INSERT INTO user_results (user_id, task_id, status, assigned_date) VALUES (?, ?, ?, ?)", rows)
+    conn.commit()
+    conn.close()
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
@@ -0,0 +1,136 @@
+"""
+Локальная проверка webhook-режима: бот из main.py принимает записанные апдейты
+(benchmarks/data/recorded_updates.json) по HTTP, исходящие вызовы уходят в заглушку Bot API.
+Меряет задержку от отправки запроса до входа в хендлер и до его завершения,
+проверяет отказ при неверном секрете и корректную остановку с дожиданием хендлеров.
+Запуск: python benchmarks/bench_webhook.py [--students 200]
+"""
+import argparse
+import asyncio
+import copy
+import json
+import os
+import socket
+import sys
+import tempfile
+import time
+
+import aiohttp
+
+from bench_utils import seed_database, percentile
+from fake_telegram import FakeTelegram
+
+SECRET = "bench-secret"
+UPDATES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "recorded_updates.json")
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def student_updates(template, user_id, first_update_id):
+    """Записанные апдейты от имени конкретного ученика"""
+    updates = []
+    for offset, update in enumerate(copy.deepcopy(template)):
+        event = update.get("message") or update.get("callback_query")
+        event["from"]["id"] = user_id
+        message = update.get("message") or update["callback_query"]["message"]
+        message["chat"]["id"] = user_id
+        if "callback_query" in update:
+            update["callback_query"]["id"] = str(first_update_id + offset)
+        update["update_id"] = first_update_id + offset
+        updates.append(update)
+    return updates
+
+
+async def run(db_name, students):
+    fake = FakeTelegram()
+    api_url = await fake.start()
+    # У заглушки нет лимитов Telegram, глобальный лимитер не должен быть узким местом
+    os.environ.update(BOT_TOKEN="42:BENCH", DB_PATH=db_name, TELEGRAM_API_URL=api_url, ADMIN_ID="1", SEND_RATE="10000")
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+    import main
+    from webhook_server import run_webhook
+
+    sent, entered, finished = {}, {}, {}
+
+    async def stamp(handler, event, data):
+        entered[event.update_id] = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            finished[event.update_id] = time.perf_counter()
+
+    main.dp.update.outer_middleware(stamp)
+    main.dp.shutdown.register(main.on_shutdown)
+    main.reports.start()
+
+    port = free_port()
+    stop_event = asyncio.Event()
+    server = asyncio.create_task(run_webhook(main.dp, main.bot, "https://bench.local", path="/webhook", secret=SECRET,
+                                             host="127.0.0.1", port=port, stop_event=stop_event))
+    url = f"http://127.0.0.1:{port}/webhook"
+    with open(UPDATES_FILE, encoding="utf-8") as f:
+        template = json.load(f)
+
+    async with aiohttp.ClientSession() as http:
+        for _ in range(100):
+            try:
+                async with http.post(url, json={"update_id": 0}) as response:
+                    rejected = response.status
+                break
+            except aiohttp.ClientConnectorError:
+                await asyncio.sleep(0.05)
+        print(f"Запрос без секрета: HTTP {rejected} (ожидается 401)")
+
+        async def student(number):
+            user_id = 1000 + number
+            for update in student_updates(template, user_id, number * len(template) + 1):
+                sent[update["update_id"]] = time.perf_counter()
+                async with http.post(url, json=update,
+                                     headers={"X-Telegram-Bot-Api-Secret-Token": SECRET}) as response:
+                    assert response.status == 200, response.status
+                # Ученик ждет ответа бота перед следующим действием
+                while update["update_id"] not in finished:
+                    await asyncio.sleep(0.001)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(student(n) for n in range(students)))
+        elapsed = time.perf_counter() - start
+
+    # Два апдейта одного чата отправляем без ожидания и сразу останавливаем сервер: второй ждет
+    # блокировку чата, пока обрабатывается первый, и оба хендлера должны успеть завершиться
+    drain_id = 10 ** 9
+    async with aiohttp.ClientSession() as http:
+        for update in student_updates(template, 999, drain_id)[1:3]:
+            async with http.post(url, json=update, headers={"X-Telegram-Bot-Api-Secret-Token": SECRET}):
+                pass
+    stop_event.set()
+    await server
+    await fake.stop()
+
+    to_handler = [(entered[u] - sent[u]) * 1000 for u in sent if u in entered]
+    to_done = [(finished[u] - sent[u]) * 1000 for u in sent if u in finished]
+    print(f"Учеников: {students}, апдейтов: {len(sent)} за {elapsed:.2f} с ({len(sent) / elapsed:.0f} апдейтов/с)")
+    print(f"{'':18} {'p50':>9} {'p95':>9} {'p99':>9}")
+    for title, values in (("запрос -> хендлер", to_handler), ("запрос -> готово", to_done)):
+        print(f"{title:18} {percentile(values, 50):7.1f}ms {percentile(values, 95):7.1f}ms {percentile(values, 99):7.1f}ms")
+    print(f"Вызовов Bot API: {len(fake.calls)}")
+    drained = all(update_id in finished for update_id in (drain_id + 1, drain_id + 2))
+    print(f"Апдейты во время остановки обработаны: {'да' if drained else 'НЕТ'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Проверка webhook-режима бота на записанных апдейтах")
+    parser.add_argument("--students", type=int, default=200, help="учеников, отправляющих апдейты одновременно")
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        db_name = os.path.join(tmp, "bench.db")
+        seed_database(db_name)
+        asyncio.run(run(db_name, args.students))
+
+
+if __name__ == "__main__":
+    main()
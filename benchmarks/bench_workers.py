@@ -0,0 +1,88 @@
+"""
+Масштабирование режима BOT_WORKERS: сколько ответов на задания в секунду обрабатывает бот
+при 1, 2, 4... процессах-воркерах. Бот запускается отдельным процессом (python main.py)
+и работает с заглушкой Bot API через getUpdates. Каждый ученик ждет ответа бота
+перед следующим сообщением, как живой человек.
+Запуск: python benchmarks/bench_workers.py [число учеников] [воркеры через запятую]
+"""
+import asyncio
+import os
+import signal
+import sys
+import tempfile
+import time
+
+from bench_utils import seed_database
+from fake_telegram import FakeTelegram
+
+STUDENTS = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+WORKER_COUNTS = [int(n) for n in sys.argv[2].split(",")] if len(sys.argv) > 2 else [1, 2, 4]
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+BUTTON = "🔥 Получить задания на сегодня"
+
+
+async def wait_for(fake, user_id, *markers):
+    while True:
+        text = (await fake.inbox[user_id].get())["text"]
+        if any(marker in text for marker in markers):
+            return text
+
+
+async def student(fake, user_id):
+    """Весь дневной сценарий ученика, возвращает число отправленных ответов"""
+    answers = 0
+    fake.send_text(user_id, BUTTON)
+    while True:
+        text = await wait_for(fake, user_id, "Задание №", "закончены", "план выполнен", "заданий больше нет")
+        if "Задание №" not in text:
+            return answers
+        fake.send_text(user_id, "ответ" if answers % 3 else "неверно")
+        answers += 1
+
+
+async def run(workers, db_name):
+    fake = FakeTelegram()
+    api_url = await fake.start()
+    env = dict(os.environ, BOT_TOKEN="42:BENCH", DB_PATH=db_name, TELEGRAM_API_URL=api_url,
+               BOT_WORKERS=str(workers), SEND_RATE="100000", SEND_CHAT_RATE="100000", ADMIN_ID="")
+    # Лог бота пишем рядом с базой, чтобы он не смешивался с таблицей результатов
+    log = open(os.path.join(os.path.dirname(db_name), "bot.log"), "w")
+    bot = await asyncio.create_subprocess_exec(sys.executable, "main.py", cwd=ROOT, env=env,
+                                               stdout=log, stderr=log)
+    users = range(1, STUDENTS + 1)
+
+    # Прогрев: все воркеры запущены и ответили каждому ученику
+    for user_id in users:
+        fake.send_text(user_id, "/start")
+    await asyncio.gather(*(wait_for(fake, user_id, "С возвращением") for user_id in users))
+
+    start = time.perf_counter()
+    answers = sum(await asyncio.gather(*(student(fake, user_id) for user_id in users)))
+    elapsed = time.perf_counter() - start
+
+    bot.send_signal(signal.SIGINT)
+    await bot.wait()
+    await fake.stop()
+    log.close()
+    if bot.returncode:
+        with open(log.name) as f:
+            print(f.read()[-2000:])
+    return answers, elapsed
+
+
+def main():
+    print(f"Учеников: {STUDENTS}, ядер: {os.cpu_count()}")
+    print(f"{'воркеров':>9} {'ответов':>8} {'время':>8} {'ответов/с':>10} {'ускорение':>10}")
+    baseline = None
+    for workers in WORKER_COUNTS:
+        with tempfile.TemporaryDirectory() as tmp:
+            db_name = os.path.join(tmp, "bench.db")
+            seed_database(db_name, users_count=STUDENTS, history_per_user=50)
+            answers, elapsed = asyncio.run(run(workers, db_name))
+        throughput = answers / elapsed
+        baseline = baseline or throughput
+        print(f"{workers:>9} {answers:>8} {elapsed:>7.2f}с {throughput:>10.0f} {throughput / baseline:>9.2f}x")
+
+
+if __name__ == "__main__":
+    main()
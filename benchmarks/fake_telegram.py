@@ -0,0 +1,128 @@
+"""
+Заглушка Telegram Bot API для локальных бенчмарков.
+Бот подключается к ней через TELEGRAM_API_URL=http://127.0.0.1:<порт>.
+Отвечает на запросы как настоящий сервер (минимально правдоподобными объектами)
+и запоминает все вызовы, чтобы бенчмарк мог их посчитать.
+"""
+import asyncio
+import itertools
+import json
+import time
+from collections import defaultdict
+
+from aiohttp import web
+
+BOT_USER = {"id": 100000, "is_bot": True, "first_name": "Bench", "username": "bench_bot"}
+
+
+class FakeTelegram:
+    def __init__(self):
+        self.calls = []  # (метод, chat_id, время вызова)
+        # Сообщения, отправленные ботом в каждый чат: симулированный ученик ждет в них ответа
+        self.inbox = defaultdict(asyncio.Queue)
+        self._message_ids = itertools.count(1)
+        self._update_ids = itertools.count(1)
+        self._updates = []
+        self._new_updates = asyncio.Event()
+        self.app = web.Application()
+        self.app.router.add_post("/bot{token}/{method}", self._handle)
+        self._runner = None
+
+    async def start(self, host="127.0.0.1", port=0):
+        """Запускает сервер и возвращает его адрес для TELEGRAM_API_URL"""
+        self._runner = web.AppRunner(self.app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        return f"http://{host}:{port}"
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+
+    def count(self, method):
+        return sum(1 for call in self.calls if call[0] == method)
+
+    # --- Апдейты для getUpdates ---
+
+    def push_update(self, update):
+        """Ставит апдейт в очередь, бот заберет его через getUpdates"""
+        update["update_id"] = next(self._update_ids)
+        self._updates.append(update)
+        self._new_updates.set()
+        return update["update_id"]
+
+    def send_text(self, user_id, text):
+        """Ученик пишет боту сообщение"""
+        message = {
+            "message_id": next(self._message_ids),
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": f"Ученик {user_id}"},
+            "text": text,
+        }
+        if text.startswith("/"):
+            message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+        return self.push_update({"message": message})
+
+    def press_button(self, user_id, data, message_id=1):
+        """Ученик нажимает inline-кнопку под сообщением бота"""
+        return self.push_update({"callback_query": {
+            "id": str(next(self._message_ids)),
+            "chat_instance": str(user_id),
+            "from": {"id": user_id, "is_bot": False, "first_name": f"Ученик {user_id}"},
+            "message": {"message_id": message_id, "date": int(time.time()),
+                        "chat": {"id": user_id, "type": "private"}, "text": "..."},
+            "data": data,
+        }})
+
+    async def _get_updates(self, params):
+        offset = int(params.get("offset") or 0)
+        timeout = float(params.get("timeout") or 0)
+        limit = int(params.get("limit") or 100)
+        # Подтвержденные ботом апдейты (id < offset) больше не отдаем
+        self._updates = [update for update in self._updates if update["update_id"] >= offset]
+        if not self._updates and timeout:
+            self._new_updates.clear()
+            try:
+                await asyncio.wait_for(self._new_updates.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return self._updates[:limit]
+
+    # --- Ответы Bot API ---
+
+    async def _handle(self, request):
+        method = request.match_info["method"]
+        params = dict(await request.post())
+        self.calls.append((method, params.get("chat_id"), time.perf_counter()))
+        if method == "getUpdates":
+            result = await self._get_updates(params)
+        else:
+            result = self.result(method, params)
+        return web.json_response({"ok": True, "result": result})
+
+    def result(self, method, params):
+        if method == "getMe":
+            return BOT_USER
+        if method in ("sendMessage", "editMessageText"):
+            message = self._message(params)
+            self.inbox[message["chat"]["id"]].put_nowait(message)
+            return message
+        return True
+
+    def _message(self, params):
+        chat_id = int(params.get("chat_id") or 0)
+        message = {
+            "message_id": int(params.get("message_id") or next(self._message_ids)),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": BOT_USER,
+            "text": params.get("text", ""),
+        }
+        if params.get("reply_markup"):
+            markup = json.loads(params["reply_markup"])
+            if "inline_keyboard" in markup:
+                message["reply_markup"] = markup
+        return message
@@ -0,0 +1,124 @@
+"""
+Генератор синтетической базы «через пару учебных лет» для нагрузочных замеров.
+Схема создается миграциями create_db.py, данные похожи на настоящие:
+- задания распределены по линиям, часть скрыта админом, у всех есть сжатый текст произведения;
+- активность учеников неравномерна: немногие решают почти каждый день, многие бросают;
+- ученик получает 5 заданий в день, около четверти ответов неверные, большинство старых
+  долгов позже перерешаны (статус 1 с датой перерешивания), остальные висят долгами;
+- изредка сессия брошена на середине (статус 0 в прошлом).
+Последний день истории - вчера (по UTC, как CURRENT_DATE в SQLite), сегодня у всех чисто.
+
+Запуск: python benchmarks/generate_data.py bench_data.db --users 5000 --tasks 10000 --results-per-user 400
+"""
+import argparse
+import datetime
+import os
+import random
+import sqlite3
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from create_db import create_database
+from database import rebuild_stats_tables
+from text_storage import compress_text, decompress_text, index_task_texts
+
+LINES = [1, 2, 3, 6, 7, 8]
+TASKS_PER_DAY = 5
+WRONG_SHARE = 0.25
+RETRIED_SHARE = 0.8       # доля старых ошибок, которые ученик потом перерешал
+ABANDONED_SHARE = 0.02    # доля заданий, брошенных недорешенными
+HIDDEN_TASKS_SHARE = 0.03
+BATCH = 50000
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Генератор синтетической базы бота")
+    parser.add_argument("db_name")
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--tasks", type=int, default=10000)
+    parser.add_argument("--results-per-user", type=int, default=400, help="в среднем строк user_results на ученика")
+    parser.add_argument("--days", type=int, default=600, help="длина истории в днях")
+    parser.add_argument("--seed", type=int, default=1)
+    return parser.parse_args()
+
+
+def generate_tasks(count):
+    texts = [compress_text(f"Фрагмент произведения №{n}. " + "Строка литературного текста. " * random.randint(20, 200))
+             for n in range(50)]
+    for task_id in range(1, count + 1):
+        line = LINES[task_id % len(LINES)]
+        answer = "".join(sorted(random.sample("123456789", 3))) if line == 8 else f"ответ{task_id % 97}"
+        yield (task_id, line, f"Вопрос {task_id} по линии {line}", random.choice(texts), answer,
+               int(random.random() >= HIDDEN_TASKS_SHARE))
+
+
+def generate_results(user_id, tasks_count, results_per_user, days, today):
+    """История одного ученика: дни активности по 5 заданий, ошибки, перерешенные долги"""
+    # Активность ~ квадрат равномерной величины: длинный хвост редко заходящих учеников
+    total = min(tasks_count, int(3 * results_per_user * random.random() ** 2) + TASKS_PER_DAY)
+    active_days = max(1, total // TASKS_PER_DAY)
+    offsets = sorted(random.sample(range(1, days + 1), min(days, active_days)), reverse=True)
+    tasks = random.sample(range(1, tasks_count + 1), min(total, len(offsets) * TASKS_PER_DAY))
+    for index, task_id in enumerate(tasks):
+        offset = offsets[index // TASKS_PER_DAY]
+        day = today - datetime.timedelta(days=offset)
+        roll = random.random()
+        if roll < ABANDONED_SHARE:
+            yield (user_id, task_id, 0, None, day.isoformat())
+        elif roll < ABANDONED_SHARE + WRONG_SHARE:
+            if offset > 1 and random.random() < RETRIED_SHARE:
+                retried = today - datetime.timedelta(days=random.randint(1, offset - 1))
+                yield (user_id, task_id, 1, "ответ", retried.isoformat())
+            else:
+                yield (user_id, task_id, 2, "неверно", day.isoformat())
+        else:
+            yield (user_id, task_id, 1, "ответ", day.isoformat())
+
+
+def generate(db_name, users, tasks, results_per_user, days, seed=1):
+    random.seed(seed)
+    start = time.perf_counter()
+    for path in (db_name, db_name + "-wal", db_name + "-shm"):
+        if os.path.exists(path):
+            os.remove(path)
+    create_database(db_name).close()
+    conn = sqlite3.connect(db_name)
+    # Быструю запись без журнала можно себе позволить: база одноразовая
+    conn.execute("PRAGMA journal_mode=OFF")
+    conn.execute("PRAGMA synchronous=OFF")
+    today = datetime.datetime.now(datetime.timezone.utc).date()
+
+    with conn:
+        conn.executemany("INSERT INTO tasks (id, line_number, question_text, content_z, correct_answer, is_active) "
+                         "VALUES (?, ?, ?, ?, ?, ?)", generate_tasks(tasks))
+        index_task_texts(conn.cursor(), [(task_id, decompress_text(blob))
+                                         for task_id, blob in conn.execute("SELECT id, content_z FROM tasks")])
+        conn.executemany("INSERT INTO users (user_id, username, full_name) VALUES (?, ?, ?)",
+                         ((u, f"user{u}", f"Ученик{u} Тестовый") for u in range(1, users + 1)))
+        rows, total = [], 0
+        for user_id in range(1, users + 1):
+            rows.extend(generate_results(user_id, tasks, results_per_user, days, today))
+            if len(rows) >= BATCH:
+                conn.executemany("INSERT INTO user_results (user_id, task_id, status, user_answer, assigned_date) "
+                                 "VALUES (?, ?, ?, ?, ?)", rows)
+                total += len(rows)
+                rows = []
+        conn.executemany("INSERT INTO user_results (user_id, task_id, status, user_answer, assigned_date) "
+                         "VALUES (?, ?, ?, ?, ?)", rows)
+        total += len(rows)
+        # Расписание повторов для висящих долгов - как при миграции migration_9_debt_schedule
+        conn.execute("UPDATE user_results SET due_date = date(assigned_date, '+1 day'), interval_days = 1 "
+                     "WHERE status = 2")
+        rebuild_stats_tables(conn.cursor())
+    conn.close()
+    size_mb = os.path.getsize(db_name) / 1024 / 1024
+    print(f"База {db_name}: учеников {users}, заданий {tasks}, результатов {total}, "
+          f"{size_mb:.0f} МБ за {time.perf_counter() - start:.1f} с")
+    return total
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    generate(args.db_name, args.users, args.tasks, args.results_per_user, args.days, args.seed)
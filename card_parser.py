@@ -0,0 +1,89 @@
+import re
+
+from bs4 import BeautifulSoup
+
+# Разбор карточек банка заданий neofamily.ru без браузера: общая часть парсера
+# (parser_firefox.py) и повторного разбора архива (reparse_archive.py)
+
+CARD_SELECTOR = "div.rounded-xl.border-natural-2"
+DETAIL_SELECTOR = ".detail-text_detailText__YRcv_"
+# Номер задания на сайте: из ссылки на карточку или из подписи «№ 1234».
+# Синтаксис общий для Python и JS - тем же выражением скролл ищет известные задания
+SOURCE_ID_PATTERN = r"task-bank/(\d+)|№\s*(\d+)"
+SOURCE_ID_RE = re.compile(SOURCE_ID_PATTERN)
+
+_BLOCK_END_RE = re.compile(r"<br>|<br/>|</p>|</div>|</li>")
+_BLOCK_END = {"<br>": "\n", "<br/>": "\n", "</p>": "\n\n", "</div>": "\n", "</li>": "\n"}
+_SPACES_RE = re.compile(r'[ \t]+')
+_LINE_EDGE_RE = re.compile(r' *\n *')
+_BLANK_LINES_RE = re.compile(r'\n{3,}')
+
+
+def clean_text(html_content):
+    """
+    Очистка текста с сохранением форматирования (абзацы, пробелы, подчеркивания).
+    """
+    if not html_content: return None
+
+    # 1. Заменяем блочные элементы на переносы строк (одним проходом)
+    html_content = _BLOCK_END_RE.sub(lambda m: _BLOCK_END[m.group()], html_content)
+
+    soup = BeautifulSoup(html_content, "html.parser")
+
+    # 2. Обработка пропусков (подчеркнутый текст)
+    for tag in soup.find_all(True):
+        style = tag.get('style', '')
+        is_underlined = (tag.name == 'u') or ('text-decoration' in style and 'underline' in style)
+
+        if is_underlined:
+            inner_text = tag.get_text(strip=True)
+            if not inner_text: # Если внутри только пробелы
+                tag.replace_with(" _______ ")
+
+    # 3. Получаем текст с разделителем-пробелом (чтобы не было вертикальных слов)
+    text = soup.get_text(separator=" ")
+
+    # 4. Финальная чистка
+    text = _SPACES_RE.sub(' ', text)           # Убираем лишние пробелы
+    text = _LINE_EDGE_RE.sub('\n', text)       # Убираем пробелы у переносов строк
+    text = _BLANK_LINES_RE.sub('\n\n', text)    # Не более 2 пустых строк
+
+    return text.strip()
+
+def parse_answer_from_text(full_text):
+    """Ищет слово 'Ответ:' в полном тексте карточки"""
+    if "Ответ:" in full_text:
+        parts = full_text.split("Ответ:")
+        if len(parts) > 1:
+            raw_ans = parts[-1].strip().split('\n')[0]
+            if "Источник" in raw_ans:
+                raw_ans = raw_ans.split("Источник")[0].strip()
+            raw_ans = raw_ans.replace(" ИЛИ ", "|").replace(" или ", "|")
+            return raw_ans.lower()
+    return None
+
+def source_id_from_html(card_html):
+    match = SOURCE_ID_RE.search(card_html)
+    return int(match.group(1) or match.group(2)) if match else None
+
+def has_line_label(tag):
+    # Аналог XPath .//div[contains(text(), 'линия')]: ищем только в собственных текстовых узлах div
+    return tag.name == "div" and any("линия" in s for s in tag.find_all(string=True, recursive=False))
+
+def parse_card(card):
+    """Карточка из снимка страницы (тег BeautifulSoup) -> словарь задания или None, если нет линии"""
+    line_div = card.find(has_line_label)
+    match = re.search(r'\d+', line_div.get_text()) if line_div else None
+    if not match:
+        return None
+
+    blocks = card.select(DETAIL_SELECTOR)
+    question_text = clean_text(blocks[0].decode_contents()) if blocks else "Текст вопроса не найден"
+    content_text = None
+    if card.get('data-has-text') and len(blocks) > 1:
+        content_text = clean_text(blocks[1].decode_contents())
+
+    # Видимого текста карточки (card.text в Selenium) в снимке нет - восстанавливаем его той же очисткой
+    correct_answer = parse_answer_from_text(clean_text(card.decode_contents()) or "")
+    return {'line': int(match.group()), 'question': question_text, 'content': content_text,
+            'answer': correct_answer, 'source_id': source_id_from_html(str(card))}
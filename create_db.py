@@ -1,10 +1,18 @@
+import hashlib
+import os
 import sqlite3
+import sys
 
-def create_database():
-    db_name = 'literature_bot.db'
-    conn = sqlite3.connect(db_name)
-    cursor = conn.cursor()
+from text_storage import compress_text
+
+DB_NAME = 'literature_bot.db'
 
+# --- МИГРАЦИИ ---
+# Каждая миграция - функция, получающая курсор. Номер миграции = ее позиция в списке MIGRATIONS.
+# Текущая версия схемы хранится в PRAGMA user_version, поэтому повторный запуск
+# применяет только новые миграции и безопасен для уже существующей базы.
+
+def migration_1_initial_schema(cursor):
     # 1. Таблица пользователей
     cursor.execute('''
     CREATE TABLE IF NOT EXISTS users (
@@ -34,7 +42,7 @@ def create_database():
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         user_id INTEGER,
         task_id INTEGER,
-        status INTEGER DEFAULT 0, 
+        status INTEGER DEFAULT 0,
         user_answer TEXT DEFAULT NULL,
         assigned_date DATE DEFAULT CURRENT_DATE,
         FOREIGN KEY (user_id) REFERENCES users(user_id),
@@ -42,9 +50,316 @@ def create_database():
     )
     ''')
 
-    conn.commit()
-    conn.close()
-    print(f"База данных '{db_name}' успешно создана (версия с is_active).")
+def migration_2_hot_path_indexes(cursor):
+    # Уникальный индекс не создастся при дублях (user_id, task_id) - оставляем последнюю запись
+    cursor.execute('''
+    DELETE FROM user_results WHERE id NOT IN (
+        SELECT MAX(id) FROM user_results GROUP BY user_id, task_id
+    )
+    ''')
+    if cursor.rowcount > 0:
+        print(f"    Удалено дублей в user_results: {cursor.rowcount}")
+
+    # Выдача и обновление результата, подзапрос NOT IN по истории ученика
+    cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_results_user_task ON user_results(user_id, task_id)")
+    # Норма на сегодня, незаконченные задания, дневной отчет
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_results_user_date_status ON user_results(user_id, assigned_date, status)")
+    # Долги за прошлые дни (status = 2, дата != сегодня)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_results_user_status ON user_results(user_id, status)")
+    # Поиск активного задания по линии
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_tasks_line_active ON tasks(line_number, is_active)")
+
+def migration_3_compress_content_text(cursor):
+    # Тексты произведений храним сжатыми в content_z, content_text остается NULL.
+    # Читатели (database.py) понимают обе колонки, поэтому старые строки тоже работают.
+    cursor.execute("ALTER TABLE tasks ADD COLUMN content_z BLOB")
+    rows = cursor.execute("SELECT id, content_text FROM tasks WHERE content_text IS NOT NULL").fetchall()
+    raw_bytes = compressed_bytes = 0
+    for task_id, text in rows:
+        blob = compress_text(text)
+        raw_bytes += len(text.encode("utf-8"))
+        compressed_bytes += len(blob) if blob else 0
+        cursor.execute("UPDATE tasks SET content_z = ?, content_text = NULL WHERE id = ?", (blob, task_id))
+    if rows:
+        print(f"    Сжато текстов: {len(rows)}, {raw_bytes / 1024:.0f} КБ -> {compressed_bytes / 1024:.0f} КБ "
+              f"({100 - compressed_bytes * 100 / max(raw_bytes, 1):.0f}% экономии)")
+
+def migration_4_fsm_storage(cursor):
+    # Состояния FSM aiogram (см. fsm_storage.py): сессии переживают перезапуск бота
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS fsm_storage (
+        key TEXT PRIMARY KEY,
+        state TEXT,
+        data TEXT,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+
+def migration_5_stats_counters(cursor):
+    # Счетчики попыток и верных ответов, их ведет database.py (_count_answer)
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS task_stats (
+        task_id INTEGER PRIMARY KEY,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        correct INTEGER NOT NULL DEFAULT 0
+    )
+    ''')
+    # Самые трудные задания для /stats без сортировки всей таблицы
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_task_stats_wrong ON task_stats(attempts - correct)")
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS line_stats (
+        line_number INTEGER PRIMARY KEY,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        correct INTEGER NOT NULL DEFAULT 0
+    )
+    ''')
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS user_line_stats (
+        user_id INTEGER NOT NULL,
+        line_number INTEGER NOT NULL,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        correct INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (user_id, line_number)
+    )
+    ''')
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS daily_stats (
+        day DATE PRIMARY KEY,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        correct INTEGER NOT NULL DEFAULT 0
+    )
+    ''')
+    # Заполняем счетчики по уже накопленной истории. Запросы - копия database.rebuild_stats_tables
+    # на момент миграции: миграция не должна меняться вместе с кодом бота
+    answered = "FROM user_results ur JOIN tasks t ON ur.task_id = t.id WHERE ur.status IN (1, 2)"
+    for table in ("task_stats", "line_stats", "user_line_stats", "daily_stats"):
+        cursor.execute(f"DELETE FROM {table}")
+    cursor.execute(f"INSERT INTO task_stats SELECT ur.task_id, COUNT(*), SUM(ur.status = 1) {answered} GROUP BY ur.task_id")
+    cursor.execute(f"INSERT INTO line_stats SELECT t.line_number, COUNT(*), SUM(ur.status = 1) {answered} GROUP BY t.line_number")
+    cursor.execute(f"INSERT INTO user_line_stats SELECT ur.user_id, t.line_number, COUNT(*), SUM(ur.status = 1) {answered} GROUP BY ur.user_id, t.line_number")
+    cursor.execute(f"INSERT INTO daily_stats SELECT ur.assigned_date, COUNT(*), SUM(ur.status = 1) {answered} GROUP BY ur.assigned_date")
+
+def migration_6_task_content_hash(cursor):
+    # Ключ дедупликации для массовой загрузки (task_loader.py) вместо поиска по полным текстам.
+    # У уже существующих дублей хеш получает только первое задание: остальные на них ссылаются результаты.
+    # task_hash - копия task_loader.task_hash на момент миграции: миграция не должна меняться вместе с загрузчиком
+    def task_hash(question_text, correct_answer):
+        return hashlib.sha1(f"{question_text}\x00{correct_answer}".encode("utf-8")).hexdigest()
+
+    cursor.execute("ALTER TABLE tasks ADD COLUMN content_hash TEXT")
+    seen = set()
+    rows = cursor.execute("SELECT id, question_text, correct_answer FROM tasks ORDER BY id").fetchall()
+    for task_id, question_text, correct_answer in rows:
+        content_hash = task_hash(question_text, correct_answer)
+        if content_hash in seen:
+            continue
+        seen.add(content_hash)
+        cursor.execute("UPDATE tasks SET content_hash = ? WHERE id = ?", (content_hash, task_id))
+    if len(rows) > len(seen):
+        print(f"    Дублей заданий без хеша: {len(rows) - len(seen)}")
+    cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_tasks_content_hash ON tasks(content_hash)")
+
+def migration_7_scrape_checkpoints(cursor):
+    # Номер задания на сайте и чекпоинты парсера для --incremental и --resume (parser_firefox.py)
+    cursor.execute("ALTER TABLE tasks ADD COLUMN source_id INTEGER")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_tasks_source_id ON tasks(source_id)")
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS scrape_checkpoints (
+        url TEXT PRIMARY KEY,
+        max_source_id INTEGER,
+        last_index INTEGER NOT NULL DEFAULT -1,
+        finished INTEGER NOT NULL DEFAULT 0,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+
+def migration_8_raw_html_archive(cursor):
+    # Ключ исходного HTML карточки в архиве (html_archive.py) для повторного разбора
+    cursor.execute("ALTER TABLE tasks ADD COLUMN raw_hash TEXT")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_tasks_raw_hash ON tasks(raw_hash)")
+
+def migration_9_debt_schedule(cursor):
+    # Интервальное повторение долгов: дата следующего повтора и текущий интервал в днях.
+    # Строки без due_date в долги не попадают, частичный индекс покрывает только расписание
+    cursor.execute("ALTER TABLE user_results ADD COLUMN due_date DATE")
+    cursor.execute("ALTER TABLE user_results ADD COLUMN interval_days INTEGER")
+    cursor.execute('''
+        UPDATE user_results SET due_date = date(assigned_date, '+1 day'), interval_days = 1
+        WHERE status = 2
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_results_due ON user_results(user_id, due_date)
+        WHERE due_date IS NOT NULL
+    ''')
+
+# ё -> е перед индексацией: unicode61 приводит регистр кириллицы, но ё считает отдельной буквой
+def _fts_fold(column):
+    return f"replace(replace({column}, 'ё', 'е'), 'Ё', 'Е')"
+
+def migration_10_task_search(cursor):
+    # Полнотекстовый поиск заданий для /find по вопросу и тексту произведения.
+    # Таблица хранит свою копию индексированных строк: тексты сжаты в content_z (migration_3),
+    # и без копии строку индекса нельзя было бы удалить или поменять, не зная прежнего текста.
+    # Вопросы ведут триггеры, тексты из content_z - Python (text_storage.index_task_texts)
+    from text_storage import decompress_text
+    cursor.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS tasks_fts USING fts5(
+            question_text, content_text, tokenize='unicode61 remove_diacritics 2'
+        )
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS tasks_fts_insert AFTER INSERT ON tasks BEGIN
+            INSERT INTO tasks_fts (rowid, question_text, content_text)
+            VALUES (new.id, {_fts_fold('new.question_text')}, {_fts_fold('new.content_text')});
+        END
+    ''')
+    cursor.execute("CREATE TRIGGER IF NOT EXISTS tasks_fts_delete AFTER DELETE ON tasks BEGIN "
+                   "DELETE FROM tasks_fts WHERE rowid = old.id; END")
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS tasks_fts_update_question AFTER UPDATE OF question_text ON tasks BEGIN
+            UPDATE tasks_fts SET question_text = {_fts_fold('new.question_text')} WHERE rowid = new.id;
+        END
+    ''')
+    # Несжатый текст, записанный в обход content_z (старые импорты, ручная правка) - тоже в индекс.
+    # Запись NULL при переходе на content_z индекс не трогает: его обновит тот, кто пишет content_z
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS tasks_fts_update_content AFTER UPDATE OF content_text ON tasks
+        WHEN new.content_text IS NOT NULL BEGIN
+            UPDATE tasks_fts SET content_text = {_fts_fold('new.content_text')} WHERE rowid = new.id;
+        END
+    ''')
+
+    def fold(text):
+        # То же, что _fts_fold в SQL (копия, а не text_storage.search_text: миграция не меняется вместе с кодом)
+        return text.replace("ё", "е").replace("Ё", "Е") if text else None
+
+    rows = cursor.execute("SELECT id, question_text, content_z, content_text FROM tasks").fetchall()
+    cursor.executemany("INSERT INTO tasks_fts (rowid, question_text, content_text) VALUES (?, ?, ?)",
+                       ((task_id, fold(question), fold(decompress_text(content_z) if content_z else content_text))
+                        for task_id, question, content_z, content_text in rows))
+
+def migration_11_reminders(cursor):
+    # Ежедневная рассылка напоминаний (reminders.py): запуск за день и отметка о каждом ученике.
+    # Отметка ставится до отправки, поэтому после перезапуска посреди рассылки никто не получит второе сообщение
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS reminder_runs (
+        day DATE PRIMARY KEY,
+        started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        finished_at TIMESTAMP,
+        sent INTEGER NOT NULL DEFAULT 0,
+        failed INTEGER NOT NULL DEFAULT 0
+    )
+    ''')
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS reminder_deliveries (
+        day DATE NOT NULL,
+        user_id INTEGER NOT NULL,
+        status INTEGER NOT NULL DEFAULT 0,  -- 0 = взят в отправку, 1 = доставлено, 2 = ошибка
+        PRIMARY KEY (day, user_id)
+    ) WITHOUT ROWID
+    ''')
+
+MIGRATIONS = [
+    migration_1_initial_schema,
+    migration_2_hot_path_indexes,
+    migration_3_compress_content_text,
+    migration_4_fsm_storage,
+    migration_5_stats_counters,
+    migration_6_task_content_hash,
+    migration_7_scrape_checkpoints,
+    migration_8_raw_html_archive,
+    migration_9_debt_schedule,
+    migration_10_task_search,
+    migration_11_reminders,
+]
+SCHEMA_VERSION = len(MIGRATIONS)
+
+def get_schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def migrate(conn):
+    """Применяет все миграции новее текущей версии. Каждая - в своей транзакции."""
+    version = get_schema_version(conn)
+    for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+        print(f">>> Миграция {number}: {migration.__name__}")
+        conn.execute("BEGIN")
+        try:
+            migration(conn.cursor())
+            # PRAGMA не поддерживает параметры, number - наш собственный int
+            conn.execute(f"PRAGMA user_version = {number}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return get_schema_version(conn)
+
+# --- ПРОВЕРКА ПЛАНОВ ГОРЯЧИХ ЗАПРОСОВ ---
+# Те же запросы, что выполняет database.py (с тестовыми параметрами)
+HOT_QUERIES = [
+    ("check_today_completed",
+     "SELECT COUNT(*) FROM user_results WHERE user_id = ? AND assigned_date = CURRENT_DATE", (0,)),
+    ("get_pending_tasks",
+     "SELECT task_id FROM user_results WHERE user_id = ? AND status = 0 AND assigned_date = CURRENT_DATE ORDER BY id", (0,)),
+    ("get_new_tasks_for_user (история ученика для выборщика)",
+     "SELECT task_id FROM user_results WHERE user_id = ?", (0,)),
+    ("get_debt_tasks",
+     '''SELECT ur.task_id FROM user_results ur JOIN tasks t ON ur.task_id = t.id
+        WHERE ur.user_id = ? AND ur.due_date <= CURRENT_DATE AND ur.assigned_date != CURRENT_DATE
+        AND t.is_active = 1 ORDER BY ur.due_date LIMIT ?''', (0, 10)),
+    ("get_users_to_remind",
+     '''SELECT u.user_id FROM users u
+        WHERE ((SELECT COUNT(*) FROM user_results ur WHERE ur.user_id = u.user_id AND ur.assigned_date = :day) < 5
+               OR EXISTS (SELECT 1 FROM user_results ur WHERE ur.user_id = u.user_id AND ur.assigned_date = :day AND ur.status = 0))
+        AND NOT EXISTS (SELECT 1 FROM reminder_deliveries r WHERE r.day = :day AND r.user_id = u.user_id)''',
+     {'day': "2024-01-01"}),
+    ("update_task_status",
+     '''UPDATE user_results SET status = ?, user_answer = ?, assigned_date = CURRENT_DATE
+        WHERE user_id = ? AND task_id = ?''', (1, "", 0, 0)),
+    ("get_daily_stats",
+     '''SELECT ur.id, t.id, t.line_number, ur.status, ur.user_answer, t.correct_answer, t.question_text
+        FROM user_results ur JOIN tasks t ON ur.task_id = t.id
+        WHERE ur.user_id = ? AND ur.assigned_date = CURRENT_DATE''', (0,)),
+    ("get_stats_overview (самые трудные задания)",
+     "SELECT task_id, attempts, correct FROM task_stats ORDER BY attempts - correct DESC LIMIT ?", (5,)),
+]
+
+def explain_hot_queries(conn):
+    for name, sql, params in HOT_QUERIES:
+        print(f"\n--- {name}")
+        for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params):
+            # row: (id, parent, notused, detail)
+            print(f"    {row[3]}")
+
+def has_tasks(conn):
+    """Есть ли в базе задания (таблицы tasks может еще не быть)"""
+    if not conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'tasks'").fetchone():
+        return False
+    return bool(conn.execute("SELECT EXISTS (SELECT 1 FROM tasks)").fetchone()[0])
+
+def create_database(db_name=DB_NAME):
+    conn = sqlite3.connect(db_name)
+    old_version = get_schema_version(conn)
+    # Базы до миграций (user_version = 0) тоже бывают с данными: решаем по заданиям, а не по версии
+    had_tasks = has_tasks(conn)
+    new_version = migrate(conn)
+    if new_version == old_version:
+        print(f"База данных '{db_name}' уже актуальна (версия схемы {new_version}).")
+        return conn
+
+    print(f"База данных '{db_name}' обновлена: версия схемы {old_version} -> {new_version}.")
+    if had_tasks:
+        # Миграции могли освободить много страниц (сжатие текстов) - возвращаем место на диске
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        size_before = os.path.getsize(db_name)
+        conn.execute("VACUUM")
+        # В WAL-режиме результат VACUUM попадает в основной файл только после checkpoint
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        size_after = os.path.getsize(db_name)
+        print(f"Размер файла: {size_before / 1024:.0f} КБ -> {size_after / 1024:.0f} КБ")
+    return conn
 
 if __name__ == '__main__':
-    create_database()
\ No newline at end of file
+    # python create_db.py [путь_к_базе]
+    conn = create_database(sys.argv[1] if len(sys.argv) > 1 else DB_NAME)
+    explain_hot_queries(conn)
+    conn.close()
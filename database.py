@@ -1,16 +1,164 @@
 import sqlite3
 import datetime
+import re
+import sys
+import threading
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from task_sampler import TaskSampler
+from task_cache import TaskCache, TaskRecord, DEFAULT_TEXT_CACHE_BYTES
+from text_storage import decompress_text, paginate_html
+
+# Интервальное повторение долгов (user_results.due_date / interval_days):
+# ошибка - повтор завтра, верный повтор - интервал растет в DEBT_INTERVAL_GROWTH раз,
+# а когда он превысил бы DEBT_MAX_INTERVAL дней, задание выходит из расписания
+DEBT_SESSION_LIMIT = 10
+DEBT_INTERVAL_GROWTH = 2
+DEBT_MAX_INTERVAL = 16
+
+# Ночная выдача заданий читает историю учеников порциями по столько человек
+PREASSIGN_CHUNK = 500
+
+_FTS_TOKEN = re.compile(r"\w+")
+
+def fts_query(text):
+    """Запрос пользователя -> выражение MATCH для tasks_fts: все слова, каждое как префикс"""
+    words = _FTS_TOKEN.findall(text.lower().replace("ё", "е"))
+    return " ".join(f'"{word}"*' for word in words)
+
+def utc_today():
+    """Сегодняшняя дата в SQLite (CURRENT_DATE считается по UTC)"""
+    return datetime.datetime.now(datetime.timezone.utc).date()
+
+def rebuild_stats_tables(cursor):
+    """Заполняет таблицы статистики заново по user_results"""
+    answered = "FROM user_results ur JOIN tasks t ON ur.task_id = t.id WHERE ur.status IN (1, 2)"
+    for table in ("task_stats", "line_stats", "user_line_stats", "daily_stats"):
+        cursor.execute(f"DELETE FROM {table}")
+    cursor.execute(f"INSERT INTO task_stats SELECT ur.task_id, COUNT(*), SUM(ur.status = 1) {answered} GROUP BY ur.task_id")
+    cursor.execute(f"INSERT INTO line_stats SELECT t.line_number, COUNT(*), SUM(ur.status = 1) {answered} GROUP BY t.line_number")
+    cursor.execute(f"INSERT INTO user_line_stats SELECT ur.user_id, t.line_number, COUNT(*), SUM(ur.status = 1) {answered} GROUP BY ur.user_id, t.line_number")
+    cursor.execute(f"INSERT INTO daily_stats SELECT ur.assigned_date, COUNT(*), SUM(ur.status = 1) {answered} GROUP BY ur.assigned_date")
+
+class TimedCursor:
+    """
+    Обертка курсора для метрик: после каждого запроса вызывает hook(name, sql, seconds, rows),
+    где name - метод Database, выполнивший запрос. SQLite читает строки лениво, поэтому
+    SELECT замеряется вместе с fetchone/fetchall, а изменения - сразу после execute.
+    """
+    def __init__(self, cursor, hook):
+        self._cursor = cursor
+        self._hook = hook
+        self._pending = None
+
+    def execute(self, sql, parameters=()):
+        return self._timed(self._cursor.execute, sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self._timed(self._cursor.executemany, sql, seq_of_parameters)
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = self._cursor.fetchone()
+        self._finish(time.perf_counter() - start, int(row is not None))
+        return row
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = self._cursor.fetchall()
+        self._finish(time.perf_counter() - start, len(rows))
+        return rows
+
+    def __iter__(self):
+        # Построчное чтение без списка всех строк; запрос замеряется, когда строки кончились
+        start = time.perf_counter()
+        rows = 0
+        for row in self._cursor:
+            rows += 1
+            yield row
+        self._finish(time.perf_counter() - start, rows)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def _timed(self, execute, sql, parameters):
+        self._finish()
+        # Имя вызывающего метода Database - метка запроса (дешевле и понятнее текста SQL)
+        name = sys._getframe(2).f_code.co_name
+        start = time.perf_counter()
+        execute(sql, parameters)
+        elapsed = time.perf_counter() - start
+        if self._cursor.description is None:
+            self._hook(name, sql, elapsed, max(self._cursor.rowcount, 0))
+        else:
+            self._pending = (name, sql, elapsed)
+        return self
+
+    def _finish(self, fetch_seconds=0.0, rows=0):
+        if self._pending is not None:
+            name, sql, elapsed = self._pending
+            self._pending = None
+            self._hook(name, sql, elapsed + fetch_seconds, rows)
 
 class Database:
-    def __init__(self, db_file):
-        # check_same_thread=False важен для асинхронного бота
-        self.connection = sqlite3.connect(db_file, check_same_thread=False)
-        self.cursor = self.connection.cursor()
-        
+    def __init__(self, db_file, text_cache_bytes=DEFAULT_TEXT_CACHE_BYTES, query_hook=None):
+        self.db_file = db_file
+        # hook(name, sql, seconds, rows) для каждого запроса (метрики, лог медленных запросов)
+        self.query_hook = query_hook
+        # У каждого потока свое соединение: AsyncDatabase вызывает методы из пула потоков,
+        # а один sqlite3-курсор нельзя безопасно делить между потоками
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        # Общий для всех потоков выборщик нерешенных заданий (см. task_sampler.py)
+        self.sampler = TaskSampler()
+        # Кеш заданий: ответы, готовый HTML вопросов, тексты произведений (см. task_cache.py)
+        self.task_cache = TaskCache(text_cache_bytes)
+
+    def _connect(self):
+        # check_same_thread=False нужен только для close() из главного потока.
+        # IMMEDIATE: транзакция записи сразу берет блокировку на запись и при занятой базе ждет
+        # до timeout секунд. С отложенной (DEFERRED) транзакцией при нескольких процессах-воркерах
+        # запись после чтения может сразу упасть с "database is locked"
+        connection = sqlite3.connect(self.db_file, check_same_thread=False, timeout=30, isolation_level="IMMEDIATE")
+        cursor = connection.cursor()
+
         # Включаем WAL-режим (Write-Ahead Logging)
         # Это позволяет читать и писать в базу одновременно без лагов
-        self.cursor.execute("PRAGMA journal_mode=WAL;")
-        self.cursor.execute("PRAGMA synchronous=NORMAL;")
+        cursor.execute("PRAGMA journal_mode=WAL;")
+        cursor.execute("PRAGMA synchronous=NORMAL;")
+        if self.query_hook:
+            cursor = TimedCursor(cursor, self.query_hook)
+
+        with self._connections_lock:
+            self._connections.append(connection)
+        self._local.connection = connection
+        self._local.cursor = cursor
+        return connection
+
+    @property
+    def connection(self):
+        connection = getattr(self._local, 'connection', None)
+        return connection if connection is not None else self._connect()
+
+    @property
+    def cursor(self):
+        if getattr(self._local, 'cursor', None) is None:
+            self._connect()
+        return self._local.cursor
+
+    def close(self):
+        with self._connections_lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+    def get_schema_version(self):
+        return self.cursor.execute("PRAGMA user_version").fetchone()[0]
 
     def user_exists(self, user_id):
         with self.connection:
@@ -29,14 +177,15 @@ class Database:
 
     # --- ЛОГИКА ВЫДАЧИ ЗАДАНИЙ ---
 
-    def get_todays_lines(self):
+    def get_todays_lines(self, day=None):
         """
-        Вычисляет 5 линий для сегодняшнего дня (скользящее окно).
+        Вычисляет 5 линий для дня day (по умолчанию - сегодня) скользящим окном.
         Линии: 1, 2, 3, 6, 7, 8.
         """
         available_lines = [1, 2, 3, 6, 7, 8]
-        # Получаем номер дня года (1...365)
-        day_of_year = datetime.datetime.now().timetuple().tm_yday
+        # Номер дня года (1...365). День - по UTC, как CURRENT_DATE в SQL, которым датируются выдачи
+        day = day or utc_today()
+        day_of_year = day.timetuple().tm_yday
         
         # Простое решение для сдвига:
         offset = day_of_year % len(available_lines)
@@ -62,93 +211,219 @@ class Database:
         """
         Ищет задания, которые были выданы СЕГОДНЯ, но еще не решены (status = 0).
         Нужно для восстановления сессии после перезагрузки бота.
+        Возвращает только id заданий: содержимое берется из кеша (get_task).
         """
         with self.connection:
             tasks = self.cursor.execute('''
-                SELECT t.id, t.line_number, t.question_text, t.options_text, t.content_text
+                SELECT task_id FROM user_results
+                WHERE user_id = ? 
+                AND status = 0 
+                AND assigned_date = CURRENT_DATE
+                ORDER BY id
+            ''', (user_id,)).fetchall()
+            return [task[0] for task in tasks]
+
+    def get_debt_tasks(self, user_id, limit=DEBT_SESSION_LIMIT):
+        """
+        Долги: не больше limit активных заданий, чей повтор уже наступил, самые просроченные первыми.
+        Идет по индексу idx_results_due (user_id, due_date) и останавливается после limit строк.
+        """
+        with self.connection:
+            debts = self.cursor.execute('''
+                SELECT ur.task_id
                 FROM user_results ur
                 JOIN tasks t ON ur.task_id = t.id
-                WHERE ur.user_id = ? 
-                AND ur.status = 0 
-                AND ur.assigned_date = CURRENT_DATE
-            ''', (user_id,)).fetchall()
-            
-            result = []
-            for task in tasks:
-                result.append({
-                    'id': task[0], 'line': task[1], 'question': task[2], 
-                    'options': task[3], 'text': task[4], 'is_debt': False 
-                })
-            return result
+                WHERE ur.user_id = ?
+                AND ur.due_date <= CURRENT_DATE
+                AND ur.assigned_date != CURRENT_DATE
+                AND t.is_active = 1
+                ORDER BY ur.due_date
+                LIMIT ?
+            ''', (user_id, limit)).fetchall()
+            return [task[0] for task in debts]
 
-    def get_new_tasks_for_user(self, user_id):
+    def preassign_daily_tasks(self, day, chunk_size=PREASSIGN_CHUNK):
+        """
+        Заранее выдает всем зарегистрированным ученикам 5 новых заданий на день day (date)
+        одной транзакцией - ночная задача бота. Ученики, у которых на этот день уже есть
+        выдачи, пропускаются, поэтому повторный запуск безопасен. Выдачи прошлых дней не меняются.
+        Возвращает (учеников, выдано заданий).
+        """
+        day_text = day.isoformat()
+        lines = self.get_todays_lines(day)
+        # Свой выборщик на время задачи: история всех учеников в общем self.sampler осталась бы
+        # в памяти бота до перезапуска. Ученики берутся по chunk_size, в памяти только их история
+        sampler = TaskSampler()
+        with self.connection:
+            self.cursor.execute("BEGIN IMMEDIATE")
+            user_ids = [row[0] for row in self.cursor.execute('''
+                SELECT user_id FROM users
+                WHERE user_id NOT IN (SELECT user_id FROM user_results WHERE assigned_date = ?)
+            ''', (day_text,)).fetchall()]
+            sampler.load_tasks(self.cursor.execute("SELECT id, line_number FROM tasks WHERE is_active = 1").fetchall())
+
+            assigned = 0
+            for start in range(0, len(user_ids), chunk_size):
+                chunk = user_ids[start:start + chunk_size]
+                history = {user_id: [] for user_id in chunk}
+                placeholders = ",".join("?" * len(chunk))
+                for user_id, task_id in self.cursor.execute(
+                        f"SELECT user_id, task_id FROM user_results WHERE user_id IN ({placeholders})", chunk):
+                    history[user_id].append(task_id)
+
+                rows = []
+                for user_id, task_ids in history.items():
+                    sampler.load_user(user_id, task_ids)
+                    for line in lines:
+                        task_id = sampler.draw(user_id, line)
+                        if task_id is not None:
+                            sampler.mark_seen(user_id, task_id)
+                            # Если ученик уже есть в общем выборщике, там задание тоже отмечается
+                            self.sampler.mark_seen(user_id, task_id)
+                            rows.append((user_id, task_id, day_text))
+                sampler.clear_users()
+                self.cursor.executemany(
+                    "INSERT OR IGNORE INTO user_results (user_id, task_id, status, assigned_date) VALUES (?, ?, 0, ?)", rows)
+                assigned += len(rows)
+        return len(user_ids), assigned
+
+    def get_new_tasks_for_user(self, user_id, debt_limit=DEBT_SESSION_LIMIT):
         """
         Логика:
         1. 5 свежих заданий на сегодня (в первую очередь).
-        2. Все накопившиеся долги за прошлые дни (дополнительный блок).
+        2. До debt_limit самых просроченных долгов (дополнительный блок).
+        Возвращает пару списков id: (новые задания, долги).
         """
-        tasks_to_send = []
+        new_ids = []
         lines_today = self.get_todays_lines()
 
         with self.connection:
             # --- БЛОК 1: НОВЫЕ ЗАДАНИЯ (5 штук) ---
             # Берем первые 5 линий из расписания на сегодня
             current_lines_queue = lines_today[:5]
-            
+            self._prepare_sampler(user_id)
+
             for line in current_lines_queue:
-                # Ищем нерешенное задание по этой линии
-                task = self.cursor.execute('''
-                    SELECT id, line_number, question_text, options_text, content_text 
-                    FROM tasks 
-                    WHERE line_number = ? 
-                    AND is_active = 1
-                    AND id NOT IN (SELECT task_id FROM user_results WHERE user_id = ?)
-                    ORDER BY RANDOM() LIMIT 1
-                ''', (line, user_id)).fetchone()
-                
-                if task:
-                    # Записываем выдачу в базу
-                    self.cursor.execute("INSERT INTO user_results (user_id, task_id, status, assigned_date) VALUES (?, ?, 0, CURRENT_DATE)", 
-                                        (user_id, task[0]))
-                    
-                    tasks_to_send.append({
-                        'id': task[0], 'line': task[1], 'question': task[2], 
-                        'options': task[3], 'text': task[4], 'is_debt': False
-                    })
-
-            # --- БЛОК 2: ДОЛГИ (Все остальные) ---
-            # Статус 2 = ошибка/пропуск, Дата != сегодня, Задание активно
-            debts = self.cursor.execute('''
-                SELECT t.id, t.line_number, t.question_text, t.options_text, t.content_text
-                FROM user_results ur
-                JOIN tasks t ON ur.task_id = t.id
-                WHERE ur.user_id = ? 
-                AND ur.status = 2 
-                AND ur.assigned_date != CURRENT_DATE
-                AND t.is_active = 1
-            ''', (user_id,)).fetchall()
-            
-            for task in debts:
-                tasks_to_send.append({
-                    'id': task[0], 'line': task[1], 'question': task[2], 
-                    'options': task[3], 'text': task[4], 'is_debt': True
-                })
-            
-            return tasks_to_send
+                # Ищем нерешенное задание по этой линии (выбор в памяти, запись выдачи в базу)
+                task_id = self._draw_task(user_id, line)
+                if task_id:
+                    new_ids.append(task_id)
+
+        # --- БЛОК 2: ДОЛГИ (Все остальные) ---
+        return new_ids, self.get_debt_tasks(user_id, debt_limit)
+
+    def _prepare_sampler(self, user_id):
+        """Загружает в выборщик активные задания и историю ученика, если их еще нет в памяти"""
+        if not self.sampler.is_loaded():
+            rows = self.cursor.execute("SELECT id, line_number FROM tasks WHERE is_active = 1").fetchall()
+            self.sampler.load_tasks(rows)
+        if not self.sampler.has_user(user_id):
+            rows = self.cursor.execute("SELECT task_id FROM user_results WHERE user_id = ?", (user_id,)).fetchall()
+            self.sampler.load_user(user_id, (row[0] for row in rows))
+
+    def _draw_task(self, user_id, line, attempts=3):
+        """
+        Выбирает задание линии через выборщик и записывает выдачу в базу.
+        База остается источником истины: если выборщик устарел (задание скрыто
+        или уже выдано), исправляем его состояние и пробуем еще раз.
+        """
+        for _ in range(attempts):
+            task_id = self.sampler.draw(user_id, line)
+            if task_id is None:
+                return None
+
+            task = self.cursor.execute("SELECT is_active FROM tasks WHERE id = ?", (task_id,)).fetchone()
+            if not task or not task[0]:
+                self.sampler.set_active(task_id, line, False)
+                continue
+
+            # Записываем выдачу в базу
+            self.cursor.execute("INSERT OR IGNORE INTO user_results (user_id, task_id, status, assigned_date) VALUES (?, ?, 0, CURRENT_DATE)",
+                                (user_id, task_id))
+            self.sampler.mark_seen(user_id, task_id)
+            if self.cursor.rowcount == 1:
+                return task_id
+        return None
+
+    def get_task(self, task_id):
+        """Задание из кеша (TaskRecord), при промахе читается из базы"""
+        record = self.task_cache.get(task_id)
+        if record is not None:
+            return record
+        with self.connection:
+            row = self.cursor.execute('''
+                SELECT id, line_number, question_text, options_text, correct_answer,
+                       content_z IS NOT NULL OR content_text IS NOT NULL
+                FROM tasks WHERE id = ?
+            ''', (task_id,)).fetchone()
+        if not row:
+            return None
+        record = TaskRecord(*row)
+        self.task_cache.put(record)
+        return record
 
     def get_correct_answer(self, task_id):
+        return "|".join(self.get_task(task_id).answer_variants)
+
+    # --- ТЕКСТЫ ПРОИЗВЕДЕНИЙ ---
+    # Хранятся сжатыми в tasks.content_z (см. text_storage.py), распаковываются только по запросу.
+    # В content_text могут остаться несжатые строки от старых импортов - их тоже понимаем.
+
+    def get_task_text(self, task_id):
+        """Полный текст произведения к заданию (распаковывается при каждом вызове)"""
         with self.connection:
-            return self.cursor.execute("SELECT correct_answer FROM tasks WHERE id = ?", (task_id,)).fetchone()[0]
+            res = self.cursor.execute("SELECT content_z, content_text FROM tasks WHERE id = ?", (task_id,)).fetchone()
+        if not res:
+            return None
+        return decompress_text(res[0]) if res[0] else res[1]
+
+    def get_task_pages(self, task_id):
+        """Текст произведения, разбитый на готовые HTML-страницы для Telegram (кешируется)"""
+        pages = self.task_cache.get_pages(task_id)
+        if pages is not None:
+            return pages
+        text = self.get_task_text(task_id)
+        if not text:
+            return None
+        pages = paginate_html(text)
+        # Запись должна быть в кеше, чтобы к ней можно было прикрепить страницы
+        if self.get_task(task_id) is not None:
+            self.task_cache.put_pages(task_id, pages)
+        return pages
 
     def update_task_status(self, user_id, task_id, is_correct, user_answer):
-        """Обновляет статус задания после ответа"""
+        """Обновляет статус задания после ответа и расписание его повторов"""
         status = 1 if is_correct else 2
+        record = self.get_task(task_id)
         with self.connection:
+            if record is None:
+                # Задание удалено из базы во время решения: ответ сохраняем, без счетчиков и повторов
+                self.cursor.execute('''
+                    UPDATE user_results SET status = ?, user_answer = ?, assigned_date = CURRENT_DATE
+                    WHERE user_id = ? AND task_id = ?
+                ''', (status, user_answer, user_id, task_id))
+                return
+            # Ошибка ставит повтор на завтра; верный ответ на задание из расписания отодвигает повтор
+            # на выросший интервал (или убирает из расписания); верный ответ на новое задание - без повторов.
+            # В SET справа везде старые значения строки
             self.cursor.execute('''
-                UPDATE user_results 
-                SET status = ?, user_answer = ?, assigned_date = CURRENT_DATE 
-                WHERE user_id = ? AND task_id = ?
-            ''', (status, user_answer, user_id, task_id))
+                UPDATE user_results
+                SET status = :status, user_answer = :answer, assigned_date = CURRENT_DATE,
+                    interval_days = CASE
+                        WHEN :status = 2 THEN 1
+                        WHEN due_date IS NOT NULL AND interval_days * :growth <= :max_interval
+                        THEN interval_days * :growth
+                    END,
+                    due_date = CASE
+                        WHEN :status = 2 THEN date('now', '+1 day')
+                        WHEN due_date IS NOT NULL AND interval_days * :growth <= :max_interval
+                        THEN date('now', '+' || (interval_days * :growth) || ' days')
+                    END
+                WHERE user_id = :user_id AND task_id = :task_id
+            ''', {'status': status, 'answer': user_answer, 'growth': DEBT_INTERVAL_GROWTH,
+                  'max_interval': DEBT_MAX_INTERVAL, 'user_id': user_id, 'task_id': task_id})
+            if self.cursor.rowcount:
+                self._count_answer(user_id, task_id, record.line, 1, int(is_correct))
 
     # --- ИЗМЕНЕНИЯ ДЛЯ АДМИНКИ НИЖЕ ---
 
@@ -170,7 +445,26 @@ class Database:
         Используется админом для ручной корректировки.
         """
         with self.connection:
+            # Блокировка до чтения: старый статус не должен измениться между SELECT и UPDATE
+            self.cursor.execute("BEGIN IMMEDIATE")
+            old = self.cursor.execute('''
+                SELECT ur.user_id, ur.task_id, ur.status, ur.assigned_date, t.line_number
+                FROM user_results ur JOIN tasks t ON ur.task_id = t.id
+                WHERE ur.id = ?
+            ''', (result_id,)).fetchone()
             self.cursor.execute("UPDATE user_results SET status = ? WHERE id = ?", (new_status, result_id))
+            if old and old[2] != new_status:
+                user_id, task_id, old_status, day, line = old
+                # Засчитанный ответ убирает задание из долгов, незасчитанный - ставит повтор на завтра
+                self.cursor.execute('''
+                    UPDATE user_results
+                    SET due_date = CASE WHEN :status = 2 THEN date('now', '+1 day') END,
+                        interval_days = CASE WHEN :status = 2 THEN 1 END
+                    WHERE id = :id
+                ''', {'status': new_status, 'id': result_id})
+                # Попыток не прибавляется (если ответ уже был), меняется только число верных
+                self._count_answer(user_id, task_id, line, int(old_status == 0),
+                                   int(new_status == 1) - int(old_status == 1), day)
             
     def get_task_text_by_result_id(self, result_id):
         """
@@ -179,15 +473,203 @@ class Database:
         """
         with self.connection:
             res = self.cursor.execute('''
-                SELECT t.content_text FROM tasks t
+                SELECT t.content_z, t.content_text FROM tasks t
                 JOIN user_results ur ON ur.task_id = t.id
                 WHERE ur.id = ?
             ''', (result_id,)).fetchone()
+        if not res:
+            return None
+        return decompress_text(res[0]) if res[0] else res[1]
+
+    def get_task_id_by_result_id(self, result_id):
+        with self.connection:
+            res = self.cursor.execute("SELECT task_id FROM user_results WHERE id = ?", (result_id,)).fetchone()
             return res[0] if res else None
 
+    # --- СТАТИСТИКА ---
+    # Счетчики в таблицах task_stats, line_stats, user_line_stats и daily_stats
+    # обновляются в той же транзакции, что и ответ, поэтому отчеты читают готовые числа.
+
+    def _count_answer(self, user_id, task_id, line, attempts, correct, day=None):
+        """Прибавляет attempts попыток и correct верных ответов ко всем счетчикам (вызывать внутри транзакции)"""
+        self.cursor.execute('''
+            INSERT INTO task_stats (task_id, attempts, correct) VALUES (?, ?, ?)
+            ON CONFLICT(task_id) DO UPDATE SET attempts = attempts + excluded.attempts, correct = correct + excluded.correct
+        ''', (task_id, attempts, correct))
+        self.cursor.execute('''
+            INSERT INTO line_stats (line_number, attempts, correct) VALUES (?, ?, ?)
+            ON CONFLICT(line_number) DO UPDATE SET attempts = attempts + excluded.attempts, correct = correct + excluded.correct
+        ''', (line, attempts, correct))
+        self.cursor.execute('''
+            INSERT INTO user_line_stats (user_id, line_number, attempts, correct) VALUES (?, ?, ?, ?)
+            ON CONFLICT(user_id, line_number) DO UPDATE SET attempts = attempts + excluded.attempts, correct = correct + excluded.correct
+        ''', (user_id, line, attempts, correct))
+        self.cursor.execute('''
+            INSERT INTO daily_stats (day, attempts, correct) VALUES (COALESCE(?, CURRENT_DATE), ?, ?)
+            ON CONFLICT(day) DO UPDATE SET attempts = attempts + excluded.attempts, correct = correct + excluded.correct
+        ''', (day, attempts, correct))
+
+    def get_stats_overview(self, days=7, hardest=5):
+        """Сводка для /stats: последние дни, точность по линиям, самые трудные задания"""
+        with self.connection:
+            daily = self.cursor.execute('''
+                SELECT day, attempts, correct FROM daily_stats
+                WHERE day > date(CURRENT_DATE, ?) ORDER BY day DESC
+            ''', (f"-{days} days",)).fetchall()
+            lines = self.cursor.execute("SELECT line_number, attempts, correct FROM line_stats ORDER BY line_number").fetchall()
+            # Сортировка по индексу idx_task_stats_wrong, читаются только первые строки
+            tasks = self.cursor.execute('''
+                SELECT task_id, attempts, correct FROM task_stats
+                ORDER BY attempts - correct DESC LIMIT ?
+            ''', (hardest,)).fetchall()
+            return {'daily': daily, 'lines': lines, 'hardest': tasks}
+
+    def get_user_line_stats(self, user_id):
+        with self.connection:
+            return self.cursor.execute('''
+                SELECT line_number, attempts, correct FROM user_line_stats
+                WHERE user_id = ? ORDER BY line_number
+            ''', (user_id,)).fetchall()
+
+    def rebuild_stats(self):
+        """
+        Пересчитывает все счетчики по user_results.
+        В истории хранится только последняя попытка по каждому заданию,
+        поэтому после пересчета повторные попытки по долгам не учитываются.
+        """
+        with self.connection:
+            rebuild_stats_tables(self.cursor)
+            return self.cursor.execute("SELECT COALESCE(SUM(attempts), 0) FROM daily_stats").fetchone()[0]
+
+    # --- НАПОМИНАНИЯ (reminders.py) ---
+
+    def get_users_to_remind(self, day):
+        """
+        Ученики, не закончившие день day, одним запросом на всех: меньше 5 выдач за день
+        (как в check_today_completed) или есть нерешенные - после ночной выдачи выдачи есть у всех.
+        Ученики, уже взятые в рассылку этого дня, пропускаются.
+        """
+        day_text = day.isoformat()
+        with self.connection:
+            rows = self.cursor.execute('''
+                SELECT u.user_id
+                FROM users u
+                WHERE ((SELECT COUNT(*) FROM user_results ur WHERE ur.user_id = u.user_id AND ur.assigned_date = :day) < 5
+                       OR EXISTS (SELECT 1 FROM user_results ur
+                                  WHERE ur.user_id = u.user_id AND ur.assigned_date = :day AND ur.status = 0))
+                AND NOT EXISTS (SELECT 1 FROM reminder_deliveries r WHERE r.day = :day AND r.user_id = u.user_id)
+            ''', {'day': day_text}).fetchall()
+            return [row[0] for row in rows]
+
+    def start_reminder_run(self, day, keep_days=7):
+        """Отмечает начало (или продолжение) рассылки дня day; старые отметки о доставке удаляются"""
+        day_text = day.isoformat()
+        with self.connection:
+            self.cursor.execute("INSERT INTO reminder_runs (day) VALUES (?) ON CONFLICT(day) DO UPDATE SET finished_at = NULL",
+                                (day_text,))
+            self.cursor.execute("DELETE FROM reminder_deliveries WHERE day < date(?, ?)", (day_text, f"-{keep_days} days"))
+
+    def claim_reminders(self, day, user_ids):
+        """Берет учеников в отправку до самой отправки: при сбое посреди пачки повторного сообщения не будет"""
+        with self.connection:
+            self.cursor.executemany("INSERT OR IGNORE INTO reminder_deliveries (day, user_id) VALUES (?, ?)",
+                                    [(day.isoformat(), user_id) for user_id in user_ids])
+
+    def record_reminders(self, day, delivered, failed):
+        """Итог пачки: статусы доставки и счетчики запуска"""
+        day_text = day.isoformat()
+        with self.connection:
+            self.cursor.executemany("UPDATE reminder_deliveries SET status = ? WHERE day = ? AND user_id = ?",
+                                    [(1, day_text, user_id) for user_id in delivered] +
+                                    [(2, day_text, user_id) for user_id in failed])
+            self.cursor.execute("UPDATE reminder_runs SET sent = sent + ?, failed = failed + ? WHERE day = ?",
+                                (len(delivered), len(failed), day_text))
+
+    def finish_reminder_run(self, day):
+        """Закрывает рассылку дня и возвращает итог за день (с учетом прерванных запусков): (отправлено, ошибок)"""
+        with self.connection:
+            self.cursor.execute("UPDATE reminder_runs SET finished_at = CURRENT_TIMESTAMP WHERE day = ?", (day.isoformat(),))
+            row = self.cursor.execute("SELECT sent, failed FROM reminder_runs WHERE day = ?", (day.isoformat(),)).fetchone()
+        return tuple(row) if row else (0, 0)
+
+    def is_reminder_run_unfinished(self, day):
+        with self.connection:
+            row = self.cursor.execute("SELECT finished_at FROM reminder_runs WHERE day = ?", (day.isoformat(),)).fetchone()
+        return row is not None and row[0] is None
+
+    def search_tasks(self, query, limit, offset=0):
+        """
+        Поиск заданий по словам вопроса и текста (для /find), включая скрытые.
+        Возвращает (всего найдено, [(id, линия, is_active, question_text), ...]) - страницу по релевантности.
+        """
+        match = fts_query(query)
+        if not match:
+            return 0, []
+        with self.connection:
+            total = self.cursor.execute("SELECT COUNT(*) FROM tasks_fts WHERE tasks_fts MATCH ?", (match,)).fetchone()[0]
+            rows = self.cursor.execute('''
+                SELECT t.id, t.line_number, t.is_active, t.question_text
+                FROM tasks_fts f
+                JOIN tasks t ON t.id = f.rowid
+                WHERE tasks_fts MATCH ?
+                ORDER BY f.rank
+                LIMIT ? OFFSET ?
+            ''', (match, limit, offset)).fetchall()
+        return total, rows
+
     def toggle_task_active_status(self, task_id, is_active):
         """
         Меняет глобальную активность задания (1 - активно, 0 - скрыто/удалено).
         """
         with self.connection:
-            self.cursor.execute("UPDATE tasks SET is_active = ? WHERE id = ?", (is_active, task_id))
\ No newline at end of file
+            self.cursor.execute("UPDATE tasks SET is_active = ? WHERE id = ?", (is_active, task_id))
+            row = self.cursor.execute("SELECT line_number FROM tasks WHERE id = ?", (task_id,)).fetchone()
+        self.task_cache.invalidate(task_id)
+        # Незагруженный выборщик сам прочитает актуальные задания при первом выборе
+        if row and self.sampler.is_loaded():
+            self.sampler.set_active(task_id, row[0], is_active)
+
+
+class AsyncDatabase:
+    """
+    Асинхронная обертка над Database для хендлеров бота.
+    Любой метод Database доступен как корутина: вызов уходит в ограниченный пул потоков,
+    у каждого потока свое соединение, поэтому медленный запрос одного ученика
+    не останавливает event loop для остальных.
+    """
+    def __init__(self, db_file, max_workers=4, **kwargs):
+        self.sync = Database(db_file, **kwargs)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="db")
+
+    async def _run(self, method, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, partial(method, *args, **kwargs))
+
+    def __getattr__(self, name):
+        method = getattr(self.sync, name)
+        if not callable(method):
+            return method
+
+        async def call_in_executor(*args, **kwargs):
+            return await self._run(method, *args, **kwargs)
+
+        call_in_executor.__name__ = name
+        # Кешируем обертку, чтобы не создавать ее на каждый вызов
+        setattr(self, name, call_in_executor)
+        return call_in_executor
+
+    # Попадание в кеш заданий отдаем сразу, без похода в пул потоков
+
+    async def get_task(self, task_id):
+        record = self.sync.task_cache.get(task_id)
+        return record if record is not None else await self._run(self.sync.get_task, task_id)
+
+    async def get_task_pages(self, task_id):
+        pages = self.sync.task_cache.get_pages(task_id)
+        return pages if pages is not None else await self._run(self.sync.get_task_pages, task_id)
+
+    async def close(self):
+        # Дожидаемся запросов, которые уже в пуле, и закрываем соединения всех потоков
+        await asyncio.get_running_loop().run_in_executor(None, self._executor.shutdown, True)
+        self.sync.close()
+
@@ -0,0 +1,172 @@
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder
+
+# Сколько сессий держим в памяти; несохраненные изменения не вытесняются и сверх лимита
+DEFAULT_MAX_ENTRIES = 10000
+
+
+class SQLiteStorage(BaseStorage):
+    """
+    FSM-хранилище aiogram в таблице fsm_storage нашей базы SQLite.
+    Сессии учеников переживают перезапуск бота.
+
+    Сессия читается из базы при первом обращении к ее ключу и дальше живет в LRU
+    на max_entries ключей; вытесняются только сохраненные в базу сессии.
+    Записи не уходят в базу сразу: измененные ключи копятся и раз в flush_interval
+    секунд сбрасываются одной транзакцией, поэтому частые update_data(current_index=...)
+    не добавляют по записи на каждый ответ. При остановке бота (close) сбрасывается остаток,
+    а при падении процесса теряются изменения последних flush_interval секунд:
+    ученик вернется к состоянию на момент последнего сброса.
+    """
+    def __init__(self, db_file, flush_interval=1.0, max_entries=DEFAULT_MAX_ENTRIES):
+        self.db_file = db_file
+        self.flush_interval = flush_interval
+        self.max_entries = max_entries
+        self._key_builder = DefaultKeyBuilder(with_bot_id=True, with_business_connection_id=True, with_destiny=True)
+        self._entries = OrderedDict()  # ключ -> (state, data)
+        self._dirty = set()
+        self._writing = set()          # ключи, которые сейчас записываются в базу
+        self._loading = {}             # ключ -> Future чтения из базы
+        self._connection = None
+        self._db_lock = threading.Lock()
+        self._flush_task = None
+        self._flush_lock = asyncio.Lock()
+
+    # --- Интерфейс BaseStorage ---
+
+    async def set_state(self, key, state=None):
+        key = self._key(key)
+        _, data = await self._entry(key)
+        self._entries[key] = (state.state if isinstance(state, State) else state, data)
+        self._mark_dirty(key)
+
+    async def get_state(self, key):
+        state, _ = await self._entry(self._key(key))
+        return state
+
+    async def set_data(self, key, data):
+        key = self._key(key)
+        state, _ = await self._entry(key)
+        self._entries[key] = (state, dict(data))
+        self._mark_dirty(key)
+
+    async def get_data(self, key):
+        _, data = await self._entry(self._key(key))
+        return dict(data)
+
+    async def close(self):
+        if self._flush_task:
+            self._flush_task.cancel()
+            self._flush_task = None
+        await self.flush()
+        if self._connection:
+            self._connection.close()
+            self._connection = None
+
+    # --- Запись в базу ---
+
+    async def flush(self):
+        """Сбрасывает все накопленные изменения одной транзакцией"""
+        async with self._flush_lock:
+            if not self._dirty:
+                return
+            keys, self._dirty = self._dirty, set()
+            upserts, deletes = [], []
+            for key in keys:
+                state, data = self._entries[key]
+                if state is None and not data:
+                    deletes.append((key,))
+                else:
+                    upserts.append((key, state, json.dumps(data, ensure_ascii=False)))
+            # Пока идет запись, ключи нельзя вытеснять: повторное чтение увидело бы старую строку
+            self._writing = keys
+            try:
+                await asyncio.get_running_loop().run_in_executor(None, self._write, upserts, deletes)
+            except Exception:
+                # Не теряем изменения: попробуем еще раз при следующем сбросе
+                self._dirty |= keys
+                raise
+            finally:
+                self._writing = set()
+            self._evict()
+
+    def _write(self, upserts, deletes):
+        with self._db_lock:
+            connection = self._connect()
+            with connection:
+                connection.executemany('''
+                    INSERT INTO fsm_storage (key, state, data, updated_at) VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+                    ON CONFLICT(key) DO UPDATE SET state = excluded.state, data = excluded.data, updated_at = CURRENT_TIMESTAMP
+                ''', upserts)
+                connection.executemany("DELETE FROM fsm_storage WHERE key = ?", deletes)
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logging.error(f"Не удалось сохранить FSM-состояния: {e}")
+
+    # --- Внутреннее ---
+
+    def _key(self, key):
+        return self._key_builder.build(key)
+
+    def _mark_dirty(self, key):
+        self._dirty.add(key)
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def _entry(self, key):
+        """(state, data) ключа: из памяти или одним запросом по первичному ключу"""
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            return entry
+        # Параллельные хендлеры одного ключа ждут одно чтение
+        future = self._loading.get(key)
+        if future is None:
+            future = self._loading[key] = asyncio.get_running_loop().run_in_executor(None, self._load, key)
+            try:
+                row = await asyncio.shield(future)
+            finally:
+                del self._loading[key]
+            # Пока читали, ключ не мог появиться в памяти: все обращения к нему ждали это чтение
+            state, data = row if row else (None, None)
+            entry = self._entries[key] = (state, json.loads(data) if data else {})
+            self._evict()
+            return entry
+        await asyncio.shield(future)
+        return await self._entry(key)
+
+    def _load(self, key):
+        with self._db_lock:
+            return self._connect().execute("SELECT state, data FROM fsm_storage WHERE key = ?", (key,)).fetchone()
+
+    def _connect(self):
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.db_file, check_same_thread=False, timeout=30,
+                                               isolation_level="IMMEDIATE")
+        return self._connection
+
+    def _evict(self):
+        """Вытесняет давно не использованные сессии, уже сохраненные в базе"""
+        excess = len(self._entries) - self.max_entries
+        if excess <= 0:
+            return
+        victims = []
+        for key in self._entries:
+            if key not in self._dirty and key not in self._writing:
+                victims.append(key)
+                if len(victims) == excess:
+                    break
+        for key in victims:
+            del self._entries[key]
@@ -0,0 +1,46 @@
+import hashlib
+import os
+import tempfile
+import zlib
+
+# Архив исходного HTML карточек: парсер сохраняет каждую карточку, а reparse_archive.py
+# разбирает их заново при изменении правил очистки - без повторного обхода сайта
+DEFAULT_ARCHIVE_DIR = "html_archive"
+COMPRESSION_LEVEL = 9
+
+
+class HtmlArchive:
+    """
+    Хранилище с адресацией по содержимому: ключ - sha1 HTML, файл - <ключ[:2]>/<ключ>.html.z (zlib).
+    Одинаковые карточки хранятся один раз; запись атомарна (temp + rename),
+    поэтому в архив могут одновременно писать несколько процессов парсера.
+    """
+    def __init__(self, root=DEFAULT_ARCHIVE_DIR):
+        self.root = root
+
+    def path(self, key):
+        return os.path.join(self.root, key[:2], f"{key}.html.z")
+
+    def put(self, html):
+        data = html.encode("utf-8")
+        key = hashlib.sha1(data).hexdigest()
+        path = self.path(key)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(zlib.compress(data, COMPRESSION_LEVEL))
+            os.replace(tmp_path, path)
+        return key
+
+    def get(self, key):
+        with open(self.path(key), "rb") as f:
+            return zlib.decompress(f.read()).decode("utf-8")
+
+    def keys(self):
+        if not os.path.isdir(self.root):
+            return
+        for folder in sorted(os.listdir(self.root)):
+            for name in sorted(os.listdir(os.path.join(self.root, folder))):
+                if name.endswith(".html.z"):
+                    yield name[:-len(".html.z")]
@@ -1,29 +1,98 @@
 import asyncio
+import datetime
 import logging
 import os
-import sqlite3
 import html
+import time
 from aiogram import Bot, Dispatcher, types, F
-from aiogram.filters import Command
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.filters import Command, CommandObject
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
+from aiogram.fsm.storage.memory import SimpleEventIsolation
 from aiogram.types import ReplyKeyboardMarkup, KeyboardButton, InlineKeyboardMarkup, InlineKeyboardButton
 from dotenv import load_dotenv
 
-from database import Database
+from database import AsyncDatabase, utc_today
+from fsm_storage import SQLiteStorage
+from rate_limiter import RateLimiter, RateLimitMiddleware
+from admin_reports import ReportDispatcher
+from webhook_server import run_webhook
+from sharding import run_sharded_polling, serve_updates
+from metrics import Metrics, HandlerTimingMiddleware, ApiTimingMiddleware, start_metrics_server
+from create_db import SCHEMA_VERSION
+from scheduler import DailyJob, parse_time
+from reminders import ReminderBroadcast
 
 # Загрузка конфига
 load_dotenv()
 TOKEN = os.getenv("BOT_TOKEN")
 ADMIN_ID = os.getenv("ADMIN_ID")
+DB_PATH = os.getenv("DB_PATH", "literature_bot.db")
+# Свой сервер Bot API (локальный telegram-bot-api или заглушка для нагрузочных тестов)
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL")
+
+# Режим получения апдейтов: polling (по умолчанию) или webhook
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+WEBHOOK_URL = os.getenv("WEBHOOK_URL")  # Публичный адрес, например https://bot.example.com
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")  # Обязателен: Telegram присылает его в X-Telegram-Bot-Api-Secret-Token
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8080"))
+
+# Число процессов-обработчиков в режиме polling. Апдейты распределяются по id пользователя
+BOT_WORKERS = int(os.getenv("BOT_WORKERS", "1"))
 
 # Очистка ID от пробелов
 if ADMIN_ID:
     ADMIN_ID = str(ADMIN_ID).strip()
 
-bot = Bot(token=TOKEN)
-dp = Dispatcher()
-db = Database('literature_bot.db')
+# Метрики Prometheus на http://METRICS_HOST:METRICS_PORT/metrics (при BOT_WORKERS > 1 у воркера i порт METRICS_PORT + 1 + i).
+# SLOW_QUERY_MS - писать в лог запросы к базе дольше порога (работает и без METRICS_PORT)
+METRICS_PORT = os.getenv("METRICS_PORT")
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+SLOW_QUERY_MS = os.getenv("SLOW_QUERY_MS")
+
+# Отчет админу одним сообщением-дайджестом на ученика вместо сообщения на каждую ошибку
+ADMIN_REPORT_DIGEST = os.getenv("ADMIN_REPORT_DIGEST", "0") == "1"
+DIGEST_MAX_LENGTH = 3800
+
+# Сколько самых просроченных долгов добавлять к сессии (остальные дождутся следующих дней)
+DEBT_LIMIT = int(os.getenv("DEBT_LIMIT", "10"))
+
+# Ночная выдача заданий всем ученикам заранее (локальное время ЧЧ:ММ; пусто - выключено, задания выдаются по кнопке).
+# Задания выдаются на местные сутки, в которые приходится запуск, поэтому время ставится вскоре после полуночи
+PREASSIGN_TIME = parse_time(os.getenv("PREASSIGN_TIME", ""))
+
+# Напоминание ученикам, не закончившим день (локальное время ЧЧ:ММ; пусто - выключено).
+# REMINDER_CONCURRENCY - сколько сообщений рассылки отправляется одновременно
+REMINDER_TIME = parse_time(os.getenv("REMINDER_TIME", ""))
+REMINDER_CONCURRENCY = int(os.getenv("REMINDER_CONCURRENCY", "5"))
+REMINDER_TEXT = ("⏰ <b>Задания на сегодня еще ждут тебя!</b>\n"
+                 "Нажми кнопку <b>«🔥 Получить задания на сегодня»</b>, чтобы продолжить.")
+
+session = AiohttpSession(api=TelegramAPIServer.from_base(TELEGRAM_API_URL)) if TELEGRAM_API_URL else None
+bot = Bot(token=TOKEN, session=session)
+# Все исходящие сообщения проходят через общий лимитер и повторяются при flood-ошибках
+send_limiter = RateLimiter(rate=int(os.getenv("SEND_RATE", "25")), chat_rate=float(os.getenv("SEND_CHAT_RATE", "1")))
+bot.session.middleware(RateLimitMiddleware(send_limiter))
+reports = ReportDispatcher(bot)
+# Состояния FSM хранятся в той же базе и переживают перезапуск бота.
+# Апдейты одного ученика обрабатываются по очереди: запросы к базе идут в пуле потоков, и без этого
+# два быстрых нажатия «Получить задания» проходят проверки выдачи одновременно и выдают норму дважды.
+# Апдейты ученика всегда попадают в один процесс (см. sharding.py), поэтому блокировки в памяти достаточно
+dp = Dispatcher(storage=SQLiteStorage(DB_PATH, flush_interval=float(os.getenv("FSM_FLUSH_INTERVAL", "1.0"))),
+                events_isolation=SimpleEventIsolation())
+metrics = Metrics(slow_query_ms=float(SLOW_QUERY_MS) if SLOW_QUERY_MS else None) if METRICS_PORT or SLOW_QUERY_MS else None
+if metrics:
+    bot.session.middleware(ApiTimingMiddleware(metrics))
+    dp.message.middleware(HandlerTimingMiddleware(metrics))
+    dp.callback_query.middleware(HandlerTimingMiddleware(metrics))
+# Запросы к базе выполняются в пуле потоков, чтобы не блокировать event loop
+db = AsyncDatabase(DB_PATH, max_workers=int(os.getenv("DB_WORKERS", "4")),
+                   text_cache_bytes=int(os.getenv("TEXT_CACHE_MB", "32")) * 1024 * 1024,
+                   query_hook=metrics.observe_query if metrics else None)
 
 class Registration(StatesGroup):
     waiting_for_name = State()
@@ -42,19 +111,119 @@ async def on_startup():
         print("❌ ОШИБКА: ADMIN_ID не найден в файле .env!")
     else:
         print(f"✅ ADMIN_ID загружен: {ADMIN_ID}")
+    schema_version = await db.get_schema_version()
+    if schema_version < SCHEMA_VERSION:
+        print(f"❌ ОШИБКА: схема базы устарела ({schema_version} < {SCHEMA_VERSION}). Запустите python create_db.py")
+    else:
+        print(f"✅ Схема базы актуальна (версия {schema_version})")
     print("-------------------")
 
 @dp.message(Command("start"))
 async def cmd_start(message: types.Message, state: FSMContext):
     user_id = message.from_user.id
-    if not db.user_exists(user_id):
+    if not await db.user_exists(user_id):
         await message.answer("Привет! Я бот для подготовки к ЕГЭ по литературе.\n"
                              "Для начала введи свои **Фамилию и Имя** (например: Иванов Иван).", parse_mode="Markdown")
         await state.set_state(Registration.waiting_for_name)
     else:
-        name = db.get_user_name(user_id)
+        name = await db.get_user_name(user_id)
         await message.answer(f"С возвращением, {html.escape(name)}!", reply_markup=main_kb)
 
+# --- АДМИН-КОМАНДЫ ---
+# Стоят до хендлера ответов, чтобы команда не приняла за ответ на задание
+def is_admin(user):
+    return bool(ADMIN_ID) and str(user.id) == ADMIN_ID
+
+def format_accuracy(attempts, correct):
+    return f"{correct * 100 // attempts}% ({correct}/{attempts})" if attempts else "нет ответов"
+
+@dp.message(Command("stats"), F.from_user.func(is_admin))
+async def admin_stats(message: types.Message, command: CommandObject):
+    # /stats - общая сводка, /stats <user_id> - по одному ученику
+    if command.args and command.args.strip().isdigit():
+        user_id = int(command.args.strip())
+        name = html.escape(await db.get_user_name(user_id))
+        rows = await db.get_user_line_stats(user_id)
+        lines_text = "\n".join(f"Линия {line}: {format_accuracy(attempts, correct)}" for line, attempts, correct in rows)
+        await message.answer(f"📊 <b>{name}</b>\n\n{lines_text or 'Пока нет ответов'}", parse_mode="HTML")
+        return
+
+    overview = await db.get_stats_overview()
+    text = "📊 <b>Статистика</b>\n\n<b>По дням:</b>\n"
+    text += "\n".join(f"{day}: {format_accuracy(attempts, correct)}" for day, attempts, correct in overview['daily']) or "нет ответов"
+    text += "\n\n<b>По линиям:</b>\n"
+    text += "\n".join(f"Линия {line}: {format_accuracy(attempts, correct)}" for line, attempts, correct in overview['lines']) or "нет ответов"
+    if overview['hardest']:
+        text += "\n\n<b>Самые трудные задания:</b>\n"
+        for task_id, attempts, correct in overview['hardest']:
+            record = await db.get_task(task_id)
+            line = record.line if record else "?"
+            text += f"№{task_id} (линия {line}): ошибок {attempts - correct} из {attempts}\n"
+    await message.answer(text, parse_mode="HTML")
+
+@dp.message(Command("stats_rebuild"), F.from_user.func(is_admin))
+async def admin_stats_rebuild(message: types.Message):
+    answers = await db.rebuild_stats()
+    await message.answer(f"♻️ Статистика пересчитана по истории: учтено ответов {answers}.")
+
+# --- ПОИСК ЗАДАНИЙ (/find) ---
+# Запрос хранится в первой строке сообщения с результатами: кнопки листания и скрытия читают его оттуда
+FIND_HEADER = "🔎 Поиск: "
+FIND_PAGE_SIZE = 5
+FIND_EXCERPT_LENGTH = 200
+
+@dp.message(Command("find"), F.from_user.func(is_admin))
+async def admin_find(message: types.Message, command: CommandObject):
+    # /find <слова> - задания (и скрытые тоже), где в вопросе или тексте есть все слова
+    query = (command.args or "").strip()
+    if not query:
+        await message.answer("Использование: /find слова из задания")
+        return
+    text, markup = await render_find_page(query, 0)
+    await message.answer(text, parse_mode="HTML", reply_markup=markup)
+
+async def render_find_page(query, page):
+    total, rows = await db.search_tasks(query, FIND_PAGE_SIZE, page * FIND_PAGE_SIZE)
+    header = f"{FIND_HEADER}{html.escape(query)}"
+    if not total:
+        return f"{header}\n\nНичего не найдено.", None
+    pages = (total + FIND_PAGE_SIZE - 1) // FIND_PAGE_SIZE
+    if page >= pages:
+        # Заданий стало меньше, чем при отправке сообщения - показываем последнюю страницу
+        return await render_find_page(query, pages - 1)
+    text = f"{header}\nНайдено: {total}, страница {page + 1} из {pages}\n"
+    buttons = []
+    for task_id, line, is_active, question in rows:
+        excerpt = question if len(question) <= FIND_EXCERPT_LENGTH else question[:FIND_EXCERPT_LENGTH] + "…"
+        status = "" if is_active else " · 🗑 <b>скрыто</b>"
+        text += f"\n<b>№{task_id}</b> (линия {line}){status}\n{html.escape(excerpt)}\n"
+        if is_active:
+            buttons.append([InlineKeyboardButton(text=f"🗑 Скрыть №{task_id}", callback_data=f"find_del_{task_id}_{page}")])
+        else:
+            buttons.append([InlineKeyboardButton(text=f"♻️ Вернуть №{task_id}", callback_data=f"find_res_{task_id}_{page}")])
+    navigation = []
+    if page > 0:
+        navigation.append(InlineKeyboardButton(text="⬅️", callback_data=f"find_page_{page - 1}"))
+    if page + 1 < pages:
+        navigation.append(InlineKeyboardButton(text="➡️", callback_data=f"find_page_{page + 1}"))
+    if navigation:
+        buttons.append(navigation)
+    return text, InlineKeyboardMarkup(inline_keyboard=buttons)
+
+@dp.callback_query(F.data.startswith("find_"), F.from_user.func(is_admin))
+async def admin_find_action(callback: types.CallbackQuery):
+    # find_page_<страница> | find_del_<id>_<страница> | find_res_<id>_<страница>
+    parts = callback.data.split("_")
+    action, page = parts[1], int(parts[-1])
+    if action == "del":
+        await db.toggle_task_active_status(int(parts[2]), 0)
+    elif action == "res":
+        await db.toggle_task_active_status(int(parts[2]), 1)
+    query = callback.message.text.split("\n", 1)[0][len(FIND_HEADER):]
+    text, markup = await render_find_page(query, page)
+    await callback.message.edit_text(text, parse_mode="HTML", reply_markup=markup)
+    await callback.answer("Статус задания изменен" if action in ("del", "res") else None)
+
 @dp.message(Registration.waiting_for_name)
 async def process_name(message: types.Message, state: FSMContext):
     full_name = message.text.strip()
@@ -62,7 +231,7 @@ async def process_name(message: types.Message, state: FSMContext):
     if len(full_name.split()) < 2:
         await message.answer("Пожалуйста, введи и Фамилию, и Имя (два слова).")
         return
-    db.add_user(message.from_user.id, message.from_user.username, full_name)
+    await db.add_user(message.from_user.id, message.from_user.username, full_name)
     await state.clear()
     await message.answer(f"Приятно познакомиться, {safe_name}! Регистрация пройдена.", reply_markup=main_kb)
 
@@ -73,53 +242,74 @@ async def start_daily_tasks(message: types.Message, state: FSMContext):
     
     # 1. ПРОВЕРКА: Есть ли незаконченные задания (статус 0) с сегодняшней датой?
     # Это "восстановление сессии"
-    pending_tasks = db.get_pending_tasks(user_id)
+    pending_tasks = await db.get_pending_tasks(user_id)
     
     if pending_tasks:
-        await message.answer("🔄 **Нашел незаконченные задания! Продолжаем...**", parse_mode="Markdown")
-        # Загружаем их в состояние
-        await state.set_data({'tasks_queue': pending_tasks, 'current_index': 0})
+        # Сессия продолжается, только если в ней сегодняшние задания: task_ids брошенной
+        # вчерашней сессии остаются в FSM, а сегодня ученику выданы уже другие задания
+        session_ids = (await state.get_data()).get('task_ids') or ()
+        if set(pending_tasks) <= set(session_ids):
+            await message.answer("🔄 **Нашел незаконченные задания! Продолжаем...**", parse_mode="Markdown")
+            # Загружаем их в состояние
+            await state.set_data(new_session(pending_tasks))
+        else:
+            # Сессии еще не было: задания выданы заранее ночной задачей, добавляем к ним долги
+            await state.set_data(new_session(pending_tasks, await db.get_debt_tasks(user_id, DEBT_LIMIT)))
         await send_next_task(message, state)
         return
 
     # 2. Если незаконченных нет, проверяем лимит на сегодня
-    if db.check_today_completed(user_id):
+    if await db.check_today_completed(user_id):
         await message.answer("✋ **На сегодня план выполнен!**\nВозвращайся завтра за новой порцией заданий.", parse_mode="Markdown")
         return
 
     # 3. Если лимит не исчерпан, берем новые + долги
-    tasks = db.get_new_tasks_for_user(user_id)
+    new_ids, debt_ids = await db.get_new_tasks_for_user(user_id, DEBT_LIMIT)
     
-    if not tasks:
+    if not new_ids and not debt_ids:
         await message.answer("На сегодня заданий больше нет. Приходи завтра!")
         return
 
-    await state.set_data({'tasks_queue': tasks, 'current_index': 0})
+    await state.set_data(new_session(new_ids, debt_ids))
     await send_next_task(message, state)
 
+def new_session(task_ids, debt_ids=()):
+    """
+    Данные FSM для сессии решения: только id заданий, позиция и граница долгов.
+    Задания с индексом >= debt_from - долги с прошлых дней.
+    Содержимое заданий берется из кеша по id (db.get_task).
+    """
+    return {'task_ids': list(task_ids) + list(debt_ids), 'debt_from': len(task_ids), 'current_index': 0}
+
 async def send_next_task(message: types.Message, state: FSMContext):
     data = await state.get_data()
-    queue = data['tasks_queue']
+    task_ids = data['task_ids']
     index = data['current_index']
 
-    if index >= len(queue):
+    if index >= len(task_ids):
         await finish_daily_session(message, state)
         return
 
-    task = queue[index]
-    safe_question = html.escape(task['question'])
-    safe_options = html.escape(task['options']) if task['options'] else ""
+    # Вопрос и варианты уже экранированы в кеше заданий
+    record = await db.get_task(task_ids[index])
+    if record is None:
+        # Задание пропало из базы - просто переходим к следующему
+        await state.update_data(current_index=index + 1)
+        await send_next_task(message, state)
+        return
+    safe_question = record.question_html
+    safe_options = record.options_html
 
-    msg_text = f"📝 **Задание №{index + 1}** (Линия {task['line']})\n\n"
-    if task.get('is_debt'):
+    msg_text = f"📝 **Задание №{index + 1}** (Линия {record.line})\n\n"
+    if index >= data['debt_from']:
         msg_text = "⚠️ **ДОЛГ С ПРОШЛОГО РАЗА**\n\n" + msg_text
     msg_text += f"{safe_question}\n\n"
     if safe_options:
         msg_text += f"{safe_options}\n"
     
     buttons = []
-    if task['text']:
-        buttons.append([InlineKeyboardButton(text="📖 Показать текст", callback_data=f"user_show_text_{task['id']}")])
+    if record.has_text:
+        buttons.append([InlineKeyboardButton(text="📖 Показать текст", callback_data=f"user_show_text_{record.id}")])
     
     keyboard = InlineKeyboardMarkup(inline_keyboard=buttons)
     try:
@@ -128,23 +318,46 @@ async def send_next_task(message: types.Message, state: FSMContext):
         await message.answer(msg_text.replace("<b>", "").replace("</b>", ""), reply_markup=keyboard)
     await state.set_state(Solving.waiting_for_answer)
 
+# --- ТЕКСТ ПРОИЗВЕДЕНИЯ ПО СТРАНИЦАМ ---
+# Страницы уже экранированы и закешированы в database (get_task_pages)
+def text_page_view(task_id, pages, page):
+    header = "📜 <b>Текст к заданию:</b>"
+    if len(pages) > 1:
+        header = f"📜 <b>Текст к заданию</b> (стр. {page + 1} из {len(pages)}):"
+
+    nav = []
+    if page > 0:
+        nav.append(InlineKeyboardButton(text="◀️ Назад", callback_data=f"user_text_page_{task_id}_{page - 1}"))
+    if page < len(pages) - 1:
+        nav.append(InlineKeyboardButton(text="Далее ▶️", callback_data=f"user_text_page_{task_id}_{page + 1}"))
+    markup = InlineKeyboardMarkup(inline_keyboard=[nav]) if nav else None
+    return f"{header}\n\n{pages[page]}", markup
+
 @dp.callback_query(F.data.startswith("user_show_text_"))
 async def user_show_text(callback: types.CallbackQuery):
     task_id = int(callback.data.split("_")[3])
     try:
-        with sqlite3.connect('literature_bot.db') as conn:
-            res = conn.cursor().execute("SELECT content_text FROM tasks WHERE id = ?", (task_id,)).fetchone()
-            if res and res[0]:
-                text = res[0]
-                safe_text = html.escape(text)
-                if len(safe_text) > 3800: safe_text = safe_text[:3800] + "\n..."
-                await callback.message.answer(f"📜 **Текст к заданию:**\n\n{safe_text}", parse_mode="HTML")
-            else:
-                await callback.answer("Текст не найден", show_alert=True)
+        pages = await db.get_task_pages(task_id)
+        if pages:
+            text, markup = text_page_view(task_id, pages, 0)
+            await callback.message.answer(text, parse_mode="HTML", reply_markup=markup)
+        else:
+            await callback.answer("Текст не найден", show_alert=True)
     except:
         await callback.answer("Ошибка")
     await callback.answer()
 
+@dp.callback_query(F.data.startswith("user_text_page_"))
+async def user_text_page(callback: types.CallbackQuery):
+    task_id, page = int(callback.data.split("_")[3]), int(callback.data.split("_")[4])
+    pages = await db.get_task_pages(task_id)
+    if not pages or page >= len(pages):
+        await callback.answer("Текст не найден", show_alert=True)
+        return
+    text, markup = text_page_view(task_id, pages, page)
+    await callback.message.edit_text(text, parse_mode="HTML", reply_markup=markup)
+    await callback.answer()
+
 @dp.message(Solving.waiting_for_answer)
 async def check_answer(message: types.Message, state: FSMContext):
     # Проверка на наличие текста (вдруг стикер прислали)
@@ -152,29 +365,25 @@ async def check_answer(message: types.Message, state: FSMContext):
         await message.answer("Пожалуйста, пришли ответ текстом!")
         return
 
-    user_answer = message.text.strip().lower()
     data = await state.get_data()
     
     # Если бот перезагрузился во время решения, state data может быть пустым
-    if not data or 'tasks_queue' not in data:
+    if not data or 'task_ids' not in data:
         await message.answer("⚠️ Произошла ошибка состояния. Пожалуйста, нажми «🔥 Получить задания» заново.")
         await state.clear()
         return
 
     index = data['current_index']
-    task = data['tasks_queue'][index]
-    db_answer = db.get_correct_answer(task['id']) 
-    correct_variants = db_answer.split("|")
-    is_correct = False
-    
-    if task['line'] == 8:
-        clean_user = "".join(filter(str.isdigit, user_answer))
-        for variant in correct_variants:
-            if clean_user == variant: is_correct = True; break
-    else:
-        if user_answer in correct_variants: is_correct = True
+    record = await db.get_task(data['task_ids'][index])
+    if record is None:
+        # Задание пропало из базы, пока ученик решал - проверять не с чем, переходим к следующему
+        await state.update_data(current_index=index + 1)
+        await send_next_task(message, state)
+        return
+    # Ответ нормализуется по правилам линии (регистр, ё/е, знаки препинания, порядок цифр), см. answer_matching.py
+    is_correct = record.matcher.matches(message.text)
 
-    db.update_task_status(message.from_user.id, task['id'], is_correct, message.text)
+    await db.update_task_status(message.from_user.id, record.id, is_correct, message.text)
     if is_correct: await message.answer("✅ **Верно!**", parse_mode="Markdown")
     else: await message.answer("❌ **Неверно.**", parse_mode="Markdown")
     await state.update_data(current_index=index + 1)
@@ -186,8 +395,8 @@ async def check_answer(message: types.Message, state: FSMContext):
 
 async def finish_daily_session(message: types.Message, state: FSMContext):
     user_id = message.from_user.id
-    name = db.get_user_name(user_id)
-    stats = db.get_daily_stats(user_id)
+    name = await db.get_user_name(user_id)
+    stats = await db.get_daily_stats(user_id)
     
     correct_count = sum(1 for s in stats if s[3] == 1)
     total_count = len(stats)
@@ -196,46 +405,83 @@ async def finish_daily_session(message: types.Message, state: FSMContext):
     await state.clear()
     
     if ADMIN_ID:
+        # Отчет уходит через фоновую очередь: ученик не ждет, пока админ получит все сообщения
         safe_name = html.escape(name)
         header_text = (f"🔔 <b>Новый отчет</b>\n"
                        f"👤 Ученик: {safe_name}\n"
                        f"📊 Результат: {correct_count}/{total_count}")
-        
-        try:
-            await bot.send_message(ADMIN_ID, header_text, parse_mode="HTML")
-        except Exception as e:
-            print(f"❌ НЕ УДАЛОСЬ ОТПРАВИТЬ ОТЧЕТ АДМИНУ: {e}")
-        
-        if correct_count != total_count:
-            for s in stats:
-                # s: (result_id, task_id, line, status, user_ans, cor_ans, q_text)
-                if s[3] == 2: # Если ошибка
-                    try:
-                        result_id = s[0]
-                        task_id = s[1]
-                        line = s[2]
-                        u_ans = html.escape(s[4]) if s[4] else "Нет ответа"
-                        c_ans = html.escape(s[5])
-                        q_text = html.escape(s[6])
-                        q_text_short = q_text[:150] + "..." if len(q_text) > 150 else q_text
-                        
-                        err_msg = (
-                            f"❌ <b>Ошибка (Линия {line})</b>\n\n"
-                            f"❓ <b>Вопрос:</b> {q_text_short}\n"
-                            f"👤 <b>Ответ ученика:</b> {u_ans}\n"
-                            f"✅ <b>Правильно:</b> {c_ans}"
-                        )
-                        
-                        keyboard = InlineKeyboardMarkup(inline_keyboard=[
-                            [InlineKeyboardButton(text="📖 Показать текст", callback_data=f"adm_text_show_{result_id}")],
-                            [InlineKeyboardButton(text="✅ Отметить как правильное", callback_data=f"adm_mark_correct_{result_id}")],
-                            [InlineKeyboardButton(text="🗑 Удалить задание из БД", callback_data=f"adm_task_del_{task_id}")]
-                        ])
-                        
-                        await bot.send_message(ADMIN_ID, err_msg, parse_mode="HTML", reply_markup=keyboard)
-                        await asyncio.sleep(0.2)
-                    except Exception as e:
-                        print(f"Ошибка отправки детального отчета: {e}")
+        # s: (result_id, task_id, line, status, user_ans, cor_ans, q_text)
+        errors = [s for s in stats if s[3] == 2]
+        if ADMIN_REPORT_DIGEST:
+            reports.submit(ADMIN_ID, build_digest_report(header_text, errors))
+        else:
+            reports.submit(ADMIN_ID, [{'text': header_text, 'parse_mode': "HTML"}] + build_error_reports(errors))
+
+def format_error(s):
+    u_ans = html.escape(s[4]) if s[4] else "Нет ответа"
+    c_ans = html.escape(s[5])
+    q_text = html.escape(s[6])
+    q_text_short = q_text[:150] + "..." if len(q_text) > 150 else q_text
+    return (
+        f"❓ <b>Вопрос:</b> {q_text_short}\n"
+        f"👤 <b>Ответ ученика:</b> {u_ans}\n"
+        f"✅ <b>Правильно:</b> {c_ans}"
+    )
+
+def build_error_reports(errors):
+    """По отдельному сообщению на каждую ошибку"""
+    messages = []
+    for s in errors:
+        result_id, task_id, line = s[0], s[1], s[2]
+        err_msg = f"❌ <b>Ошибка (Линия {line})</b>\n\n" + format_error(s)
+        keyboard = InlineKeyboardMarkup(inline_keyboard=[
+            [InlineKeyboardButton(text="📖 Показать текст", callback_data=f"adm_text_show_{result_id}")],
+            [InlineKeyboardButton(text="✅ Отметить как правильное", callback_data=f"adm_mark_correct_{result_id}")],
+            [InlineKeyboardButton(text="🗑 Удалить задание из БД", callback_data=f"adm_task_del_{task_id}")]
+        ])
+        messages.append({'text': err_msg, 'parse_mode': "HTML", 'reply_markup': keyboard})
+    return messages
+
+def build_digest_report(header_text, errors):
+    """
+    Все ошибки ученика одним сообщением (ADMIN_REPORT_DIGEST=1), у каждой ошибки - свой ряд кнопок.
+    Номер ошибки передается последним полем callback_data, см. admin_label / admin_marker.
+    Если текст не влезает в одно сообщение Telegram, дайджест делится на несколько.
+    """
+    messages = []
+    text, rows = header_text, []
+    for number, s in enumerate(errors, start=1):
+        result_id, task_id, line = s[0], s[1], s[2]
+        block = f"\n\n❌ <b>№{number} (Линия {line})</b>\n" + format_error(s)
+        if rows and len(text) + len(block) > DIGEST_MAX_LENGTH:
+            messages.append({'text': text, 'parse_mode': "HTML", 'reply_markup': InlineKeyboardMarkup(inline_keyboard=rows)})
+            text, rows = "🔔 <b>Отчет (продолжение)</b>", []
+        text += block
+        rows.append([
+            InlineKeyboardButton(text=admin_label("📖", "", number), callback_data=f"user_show_text_{task_id}"),
+            InlineKeyboardButton(text=admin_label("✅", "", number), callback_data=f"adm_mark_correct_{result_id}_{number}"),
+            InlineKeyboardButton(text=admin_label("🗑", "", number), callback_data=f"adm_task_del_{task_id}_{number}"),
+        ])
+    messages.append({'text': text, 'parse_mode': "HTML",
+                     'reply_markup': InlineKeyboardMarkup(inline_keyboard=rows) if rows else None})
+    return messages
+
+def parse_admin_callback(data):
+    """adm_<группа>_<действие>_<id>[_<номер ошибки в дайджесте>]"""
+    parts = data.split("_")
+    number = int(parts[4]) if len(parts) > 4 else None
+    return parts[2], int(parts[3]), number
+
+def admin_label(emoji, text, number):
+    """Подпись кнопки: полная в отдельном отчете, короткая с номером ошибки в дайджесте"""
+    return f"{emoji} {text}" if number is None else f"{emoji} №{number}"
+
+def admin_marker(emoji, text, number):
+    """Пометка в тексте отчета; в дайджесте - с номером ошибки, чтобы пометки не смешивались"""
+    return f"\n\n{emoji} <b>{text}</b>" if number is None else f"\n\n{emoji} <b>№{number}: {text}</b>"
+
+def admin_callback(prefix, item_id, number):
+    return f"{prefix}_{item_id}" if number is None else f"{prefix}_{item_id}_{number}"
 
 # --- КНОПКА "ПОКАЗАТЬ/СКРЫТЬ ТЕКСТ" ---
 @dp.callback_query(F.data.startswith("adm_text_"))
@@ -245,21 +491,26 @@ async def admin_toggle_text(callback: types.CallbackQuery):
     current_markup = callback.message.reply_markup
     
     if action == "show":
-        text_content = db.get_task_text_by_result_id(result_id)
-        if not text_content:
+        task_id = await db.get_task_id_by_result_id(result_id)
+        pages = await db.get_task_pages(task_id) if task_id else None
+        if not pages:
             await callback.answer("Текст не найден", show_alert=True)
             return
-        safe_content = html.escape(text_content)
-        if len(safe_content) > 3000: safe_content = safe_content[:3000] + "..."
-        new_text = f"{current_text}\n\n📜 <b>Текст произведения:</b>\n{safe_content}"
-        new_markup = update_button(current_markup, 0, "📖 Скрыть текст", f"adm_text_hide_{result_id}")
+        # В отчет помещается первая страница, остальные - отдельным сообщением с листанием
+        new_text = f"{current_text}\n\n📜 <b>Текст произведения:</b>\n{pages[0]}"
+        new_markup = update_button(current_markup, callback.data, "📖 Скрыть текст", f"adm_text_hide_{result_id}")
+        if len(pages) > 1:
+            new_text += f"\n\n<i>Страница 1 из {len(pages)}</i>"
+            new_markup.inline_keyboard.append([InlineKeyboardButton(text="📜 Весь текст", callback_data=f"user_show_text_{task_id}")])
         await callback.message.edit_text(new_text, parse_mode="HTML", reply_markup=new_markup)
         
     elif action == "hide":
         marker = "\n\n📜 <b>Текст произведения:</b>"
         if marker in current_text:
             new_text = current_text.split(marker)[0]
-            new_markup = update_button(current_markup, 0, "📖 Показать текст", f"adm_text_show_{result_id}")
+            new_markup = update_button(current_markup, callback.data, "📖 Показать текст", f"adm_text_show_{result_id}")
+            new_markup.inline_keyboard[:] = [row for row in new_markup.inline_keyboard
+                                             if not row[0].callback_data.startswith("user_show_text_")]
             await callback.message.edit_text(new_text, parse_mode="HTML", reply_markup=new_markup)
     
     await callback.answer()
@@ -267,20 +518,22 @@ async def admin_toggle_text(callback: types.CallbackQuery):
 # --- КНОПКА "СМЕНИТЬ СТАТУС ОТВЕТА" ---
 @dp.callback_query(F.data.startswith("adm_mark_"))
 async def admin_toggle_status(callback: types.CallbackQuery):
-    action, result_id = callback.data.split("_")[2], int(callback.data.split("_")[3])
+    action, result_id, number = parse_admin_callback(callback.data)
     current_text = callback.message.html_text
     current_markup = callback.message.reply_markup
     
-    marker_correct = "\n\n✅ <b>ВЫ ИЗМЕНИЛИ ЭТОТ ОТВЕТ НА ПРАВИЛЬНЫЙ</b>"
+    marker_correct = admin_marker("✅", "ВЫ ИЗМЕНИЛИ ЭТОТ ОТВЕТ НА ПРАВИЛЬНЫЙ", number)
     
     if action == "correct":
-        db.toggle_result_status(result_id, 1)
+        await db.toggle_result_status(result_id, 1)
         new_text = current_text + marker_correct
-        new_markup = update_button(current_markup, 1, "❌ Отметить как неправильное", f"adm_mark_wrong_{result_id}")
+        new_markup = update_button(current_markup, callback.data, admin_label("❌", "Отметить как неправильное", number),
+                                   admin_callback("adm_mark_wrong", result_id, number))
     elif action == "wrong":
-        db.toggle_result_status(result_id, 2)
+        await db.toggle_result_status(result_id, 2)
         new_text = current_text.replace(marker_correct, "")
-        new_markup = update_button(current_markup, 1, "✅ Отметить как правильное", f"adm_mark_correct_{result_id}")
+        new_markup = update_button(current_markup, callback.data, admin_label("✅", "Отметить как правильное", number),
+                                   admin_callback("adm_mark_correct", result_id, number))
         
     await callback.message.edit_text(new_text, parse_mode="HTML", reply_markup=new_markup)
     await callback.answer("Статус ответа изменен")
@@ -288,30 +541,35 @@ async def admin_toggle_status(callback: types.CallbackQuery):
 # --- КНОПКА "УДАЛИТЬ ЗАДАНИЕ ИЗ БД" ---
 @dp.callback_query(F.data.startswith("adm_task_"))
 async def admin_toggle_task_active(callback: types.CallbackQuery):
-    action, task_id = callback.data.split("_")[2], int(callback.data.split("_")[3])
+    action, task_id, number = parse_admin_callback(callback.data)
     current_text = callback.message.html_text
     current_markup = callback.message.reply_markup
     
-    marker_deleted = "\n\n🗑 <b>ЗАДАНИЕ УДАЛЕНО ИЗ БАЗЫ (СКРЫТО)</b>"
+    marker_deleted = admin_marker("🗑", "ЗАДАНИЕ УДАЛЕНО ИЗ БАЗЫ (СКРЫТО)", number)
     
     if action == "del":
-        db.toggle_task_active_status(task_id, 0) # 0 = скрыто
+        await db.toggle_task_active_status(task_id, 0) # 0 = скрыто
         new_text = current_text + marker_deleted
-        new_markup = update_button(current_markup, 2, "♻️ Вернуть задание в базу", f"adm_task_res_{task_id}")
+        new_markup = update_button(current_markup, callback.data, admin_label("♻️", "Вернуть задание в базу", number),
+                                   admin_callback("adm_task_res", task_id, number))
         
     elif action == "res": # restore
-        db.toggle_task_active_status(task_id, 1) # 1 = активно
+        await db.toggle_task_active_status(task_id, 1) # 1 = активно
         new_text = current_text.replace(marker_deleted, "")
-        new_markup = update_button(current_markup, 2, "🗑 Удалить задание из БД", f"adm_task_del_{task_id}")
+        new_markup = update_button(current_markup, callback.data, admin_label("🗑", "Удалить задание из БД", number),
+                                   admin_callback("adm_task_del", task_id, number))
         
     await callback.message.edit_text(new_text, parse_mode="HTML", reply_markup=new_markup)
     await callback.answer("Статус задания изменен")
 
-def update_button(markup, row_index, new_text, new_callback):
+def update_button(markup, old_callback, new_text, new_callback):
+    """Меняет подпись и callback_data кнопки, найденной по ее текущему callback_data"""
     rows = markup.inline_keyboard
-    if row_index < len(rows) and len(rows[row_index]) > 0:
-        rows[row_index][0].text = new_text
-        rows[row_index][0].callback_data = new_callback
+    for row in rows:
+        for button in row:
+            if button.callback_data == old_callback:
+                button.text = new_text
+                button.callback_data = new_callback
     return InlineKeyboardMarkup(inline_keyboard=rows)
 
 # --- ЛОВУШКА ДЛЯ ПОТЕРЯННОГО СОСТОЯНИЯ ---
@@ -325,8 +583,123 @@ async def handle_unknown_message(message: types.Message):
         parse_mode="HTML"
     )
 
+def preassign_day(at, now=None):
+    """
+    День ночной выдачи: местная дата последнего запуска по расписанию в локальное время at.
+    Запуск в 00:00 по Москве - это 21:00 UTC, когда utc_today() еще вчерашний, а ученики будут
+    решать уже в новых сутках. Догоняющая выдача после перезапуска получает тот же день
+    """
+    now = now or datetime.datetime.now()
+    scheduled = datetime.datetime.combine(now.date(), at)
+    if scheduled > now:
+        scheduled -= datetime.timedelta(days=1)
+    return scheduled.date()
+
+async def preassign_tasks(day=None):
+    """Выдает всем ученикам задания на день day (по умолчанию - день последнего запуска по расписанию)"""
+    day = day or preassign_day(PREASSIGN_TIME)
+    started = time.monotonic()
+    users, assigned = await db.preassign_daily_tasks(day)
+    logging.info(f"Выдача заданий на {day}: учеников {users}, заданий {assigned}, "
+                 f"{time.monotonic() - started:.1f} с")
+
+# Продолжение прерванной рассылки и запуск по расписанию не должны идти одновременно
+reminder_lock = asyncio.Lock()
+
+async def send_reminders():
+    """Рассылка напоминаний за текущие сутки (по UTC, как даты выдач) с отчетом админу"""
+    async with reminder_lock:
+        stats = await ReminderBroadcast(bot, db, REMINDER_TEXT, reply_markup=main_kb,
+                                        concurrency=REMINDER_CONCURRENCY).run(utc_today())
+    logging.info(str(stats))
+    if ADMIN_ID:
+        reports.submit(ADMIN_ID, [{'text': f"📣 {stats}"}])
+
+preassign_job = DailyJob("preassign", PREASSIGN_TIME, preassign_tasks) if PREASSIGN_TIME else None
+reminder_job = DailyJob("reminders", REMINDER_TIME, send_reminders) if REMINDER_TIME else None
+reminder_resume = None
+
+async def start_daily_jobs():
+    """
+    Догоняющая выдача на текущие сутки (бот мог быть выключен ночью), продолжение рассылки,
+    прерванной перезапуском, и запуск расписания
+    """
+    global reminder_resume
+    if preassign_job:
+        await preassign_tasks()
+        preassign_job.start()
+    if reminder_job:
+        if await db.is_reminder_run_unfinished(utc_today()):
+            reminder_resume = asyncio.create_task(send_reminders())
+        reminder_job.start()
+
+async def stop_daily_jobs():
+    if reminder_resume:
+        reminder_resume.cancel()
+    for job in (preassign_job, reminder_job):
+        if job:
+            await job.close()
+
+async def on_shutdown():
+    await stop_daily_jobs()
+    await reports.close()
+    await db.close()
+
+async def start_metrics(port):
+    if METRICS_PORT:
+        runner = await start_metrics_server(metrics, METRICS_HOST, port)
+        dp.shutdown.register(runner.cleanup)
+
+def run_worker(index, updates_queue):
+    """Процесс-воркер при BOT_WORKERS > 1: обрабатывает апдейты своей доли учеников"""
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(worker_main(index, updates_queue))
+
+async def worker_main(index, updates_queue):
+    dp.shutdown.register(on_shutdown)
+    await start_metrics(int(METRICS_PORT or 0) + 1 + index)
+    reports.start()
+    await serve_updates(dp, bot, updates_queue)
+
 async def main():
+    if BOT_MODE == "webhook" and not (WEBHOOK_URL and WEBHOOK_SECRET):
+        # Без секрета эндпоинт принимает апдейты от кого угодно, без адреса некуда ставить вебхук
+        print("❌ ОШИБКА: для BOT_MODE=webhook нужны WEBHOOK_URL и WEBHOOK_SECRET!")
+        raise SystemExit(1)
     await on_startup()
+    if BOT_MODE == "polling" and BOT_WORKERS > 1:
+        print(f"Бот запущен (воркеров: {BOT_WORKERS})!")
+        # Лимит Telegram общий на бота: делим его между воркерами (окружение наследуют дочерние процессы).
+        # Главный процесс рассылает напоминания - тогда и ему своя доля.
+        # Лимит на чат у каждого воркера свой, но чаты учеников не пересекаются между воркерами
+        share = max(1, int(os.getenv("SEND_RATE", "25")) // (BOT_WORKERS + (1 if reminder_job else 0)))
+        os.environ["SEND_RATE"] = str(share)
+        send_limiter.set_rate(share)
+        await bot.delete_webhook(drop_pending_updates=True)
+        # Ночная выдача и напоминания идут в главном процессе; выборщики воркеров сверяются с базой при записи выдачи.
+        # Отчет админу о рассылке уходит через диспетчер отчетов главного процесса
+        reports.start()
+        await start_daily_jobs()
+        try:
+            await run_sharded_polling(bot, run_worker, BOT_WORKERS)
+        finally:
+            await stop_daily_jobs()
+            await reports.close()
+            await db.close()
+            await bot.session.close()
+        return
+
+    dp.shutdown.register(on_shutdown)
+    await start_metrics(int(METRICS_PORT or 0))
+    reports.start()
+    await start_daily_jobs()
+    if BOT_MODE == "webhook":
+        print("Бот запущен (webhook)!")
+        await run_webhook(dp, bot, WEBHOOK_URL, path=WEBHOOK_PATH, secret=WEBHOOK_SECRET,
+                          host=WEBHOOK_HOST, port=WEBHOOK_PORT,
+                          drain_timeout=float(os.getenv("WEBHOOK_DRAIN_TIMEOUT", "30")))
+        return
+
     print("Бот запущен!")
     await bot.delete_webhook(drop_pending_updates=True) 
     await dp.start_polling(bot)
@@ -0,0 +1,161 @@
+import bisect
+import logging
+import threading
+import time
+
+from aiohttp import web
+from aiogram import BaseMiddleware
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+
+# Границы корзин гистограмм в секундах (как у клиентских библиотек Prometheus)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _labels(names, values, extra=""):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Histogram:
+    """Гистограмма в формате Prometheus. observe() можно вызывать из любого потока."""
+    def __init__(self, name, help_text, label_names, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series = {}  # значения меток -> [счетчики по корзинам, сумма, количество]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * len(self.buckets), 0.0, 0]
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((key, (list(counts), total, count)) for key, (counts, total, count) in self._series.items())
+        for label_values, (counts, total, count) in series:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = _labels(self.label_names, label_values, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            le = _labels(self.label_names, label_values, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{le} {count}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, label_values)} {total}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, label_values)} {count}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help_text, label_names):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount, *label_values):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = sorted(self._values.items())
+        lines += [f"{self.name}{_labels(self.label_names, key)} {value}" for key, value in values]
+        return lines
+
+
+class Metrics:
+    """
+    Все метрики бота: время хендлеров, запросов к базе и вызовов Bot API.
+    slow_query_ms - если задано, запросы дольше порога пишутся в лог с текстом SQL.
+    """
+    def __init__(self, slow_query_ms=None):
+        self.slow_query_ms = slow_query_ms
+        self.handler_seconds = Histogram("bot_handler_seconds", "Время работы хендлера", ("handler",))
+        self.handler_errors = Counter("bot_handler_errors_total", "Хендлеры, завершившиеся исключением", ("handler",))
+        self.query_seconds = Histogram("bot_db_query_seconds", "Время запроса к SQLite (с выборкой строк)", ("query",))
+        self.query_rows = Counter("bot_db_rows_total", "Строк прочитано или изменено запросами", ("query",))
+        self.api_seconds = Histogram("bot_api_seconds", "Время вызова Telegram Bot API", ("method", "status"))
+
+    def observe_query(self, name, sql, seconds, rows):
+        """Хук для Database(query_hook=...): name - метод Database, из которого выполнен запрос"""
+        self.query_seconds.observe(seconds, name)
+        self.query_rows.inc(rows, name)
+        if self.slow_query_ms is not None and seconds * 1000 >= self.slow_query_ms:
+            logging.warning(f"Медленный запрос в {name}: {seconds * 1000:.1f} мс, строк {rows}\n{' '.join(sql.split())}")
+
+    def render(self):
+        lines = []
+        for metric in (self.handler_seconds, self.handler_errors, self.query_seconds, self.query_rows, self.api_seconds):
+            lines += metric.render()
+        return "\n".join(lines) + "\n"
+
+
+class HandlerTimingMiddleware(BaseMiddleware):
+    """
+    Inner middleware: время каждого хендлера по имени функции.
+    Подключается на каждый тип событий: dp.message.middleware(...), dp.callback_query.middleware(...)
+    """
+    def __init__(self, metrics):
+        self.metrics = metrics
+
+    async def __call__(self, handler, event, data):
+        name = data["handler"].callback.__name__
+        start = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            self.metrics.handler_errors.inc(1, name)
+            raise
+        finally:
+            self.metrics.handler_seconds.observe(time.perf_counter() - start, name)
+
+
+class ApiTimingMiddleware(BaseRequestMiddleware):
+    """
+    Middleware сессии бота: время каждого вызова Bot API по методу и исходу.
+    Подключается после RateLimitMiddleware, поэтому меряет сам запрос к Telegram
+    (каждую попытку отдельно), без ожидания в лимитере.
+    """
+    def __init__(self, metrics):
+        self.metrics = metrics
+
+    async def __call__(self, make_request, bot, method):
+        start = time.perf_counter()
+        status = "error"
+        try:
+            result = await make_request(bot, method)
+            status = "ok"
+            return result
+        finally:
+            self.metrics.api_seconds.observe(time.perf_counter() - start, type(method).__name__, status)
+
+
+async def start_metrics_server(metrics, host="127.0.0.1", port=9100):
+    """HTTP-эндпоинт /metrics в текстовом формате Prometheus. Возвращает runner для cleanup()"""
+    async def handle(request):
+        return web.Response(text=metrics.render(), content_type="text/plain", charset="utf-8")
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    print(f"Метрики: http://{host}:{port}/metrics")
+    return runner
@@ -0,0 +1,184 @@
+"""
+Отчет о почти одинаковых заданиях в банке: дубли, которые пропустила проверка
+по точному тексту (task_loader.task_hash) - лишний пробел, другая кавычка, опечатка.
+
+Задание -> два множества шинглов (по SHINGLE_SIZE слов подряд): вопрос с вариантами
+и текст произведения. По их объединению строится MinHash-подпись (одна хеш-функция,
+MINHASH_SIZE корзин), подпись режется на LSH_BANDS полос: кандидатами становятся только
+задания одной линии с совпавшей полосой. Для кандидатов считается точная мера Жаккара,
+отдельно по вопросу и по тексту - общий отрывок с разными вопросами дублем не считается.
+Попарно все задания не сравниваются, поэтому весь банк проверяется за секунды.
+
+Запуск: python near_duplicates.py [--db literature_bot.db] [--threshold 0.8] [--active-only] [--report dups.json]
+"""
+import argparse
+import bisect
+import json
+import re
+import sqlite3
+import time
+from collections import defaultdict
+
+from create_db import DB_NAME
+from text_storage import decompress_text
+
+SHINGLE_SIZE = 3
+MINHASH_SIZE = 64
+LSH_BANDS = 16          # 16 полос по 4 значения: пара со сходством 0.8 становится кандидатом с вероятностью > 0.999
+DEFAULT_THRESHOLD = 0.8
+PREVIEW_LENGTH = 80
+
+_WORD = re.compile(r"\w+")
+_HASH_MASK = (1 << 64) - 1
+
+
+def shingles(text, tag):
+    """Хеши всех последовательностей из SHINGLE_SIZE слов; tag разделяет шинглы вопроса и текста"""
+    words = _WORD.findall((text or "").lower().replace("ё", "е"))
+    if len(words) <= SHINGLE_SIZE:
+        return {hash((tag, *words)) & _HASH_MASK} if words else set()
+    return {hash((tag, *words[i:i + SHINGLE_SIZE])) & _HASH_MASK for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def minhash(hashes, size=MINHASH_SIZE):
+    """
+    MinHash одной перестановкой: хеш шингла выбирает корзину, в корзине остается минимум.
+    Пустые корзины берут значение ближайшей непустой справа (по кругу), чтобы подписи
+    коротких заданий оставались сравнимыми.
+    """
+    signature = [None] * size
+    for value in hashes:
+        bucket, rest = value % size, value // size
+        if signature[bucket] is None or rest < signature[bucket]:
+            signature[bucket] = rest
+    filled = [i for i, value in enumerate(signature) if value is not None]
+    if not filled:
+        return None
+    for i in range(size):
+        if signature[i] is None:
+            nearest = filled[bisect.bisect(filled, i) % len(filled)]
+            signature[i] = signature[nearest]
+    return signature
+
+
+def jaccard(a, b):
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+class TaskShingles:
+    __slots__ = ('task_id', 'line', 'question', 'content')
+
+    def __init__(self, task_id, line, question_text, content_text):
+        self.task_id = task_id
+        self.line = line
+        self.question = shingles(question_text, "q")
+        self.content = shingles(content_text, "c")
+
+
+def find_similar_pairs(items, threshold=DEFAULT_THRESHOLD, bands=LSH_BANDS):
+    """items: [TaskShingles] -> [(id1, id2, сходство вопроса, сходство текста)] для пар не ниже threshold"""
+    rows = MINHASH_SIZE // bands
+    buckets = defaultdict(list)
+    for index, item in enumerate(items):
+        signature = minhash(item.question | item.content)
+        if signature is None:
+            continue
+        for band in range(bands):
+            buckets[(item.line, band, *signature[band * rows:(band + 1) * rows])].append(index)
+
+    candidates = set()
+    for members in buckets.values():
+        for i, first in enumerate(members):
+            for second in members[i + 1:]:
+                candidates.add((first, second))
+
+    pairs = []
+    for first, second in candidates:
+        a, b = items[first], items[second]
+        question_similarity = jaccard(a.question, b.question)
+        if question_similarity < threshold:
+            continue
+        content_similarity = jaccard(a.content, b.content)
+        if content_similarity >= threshold:
+            pairs.append((a.task_id, b.task_id, question_similarity, content_similarity))
+    return pairs
+
+
+def group_pairs(pairs):
+    """Пары похожих заданий -> группы (система непересекающихся множеств), крупные первыми"""
+    parent = {}
+
+    def find(task_id):
+        parent.setdefault(task_id, task_id)
+        while parent[task_id] != task_id:
+            parent[task_id] = parent[parent[task_id]]
+            task_id = parent[task_id]
+        return task_id
+
+    for first, second, *_ in pairs:
+        parent[find(first)] = find(second)
+    groups = defaultdict(list)
+    for task_id in parent:
+        groups[find(task_id)].append(task_id)
+    return sorted((sorted(group) for group in groups.values()), key=lambda group: (-len(group), group[0]))
+
+
+def load_tasks(conn, active_only=False):
+    """Задания базы -> ({id: (линия, is_active, вопрос, ответ)}, [TaskShingles])"""
+    rows = conn.execute(f'''
+        SELECT id, line_number, is_active, question_text, options_text, content_z, content_text, correct_answer
+        FROM tasks {"WHERE is_active = 1" if active_only else ""}
+    ''')
+    info, items = {}, []
+    for task_id, line, is_active, question, options, content_z, content_text, answer in rows:
+        info[task_id] = (line, is_active, question, answer)
+        content = decompress_text(content_z) if content_z else content_text
+        items.append(TaskShingles(task_id, line, f"{question}\n{options or ''}", content))
+    return info, items
+
+
+def preview(value):
+    text = "" if value is None else str(value).replace("\n", " ")
+    return text if len(text) <= PREVIEW_LENGTH else text[:PREVIEW_LENGTH] + "..."
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Отчет о почти одинаковых заданиях")
+    parser.add_argument("--db", default=DB_NAME)
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="минимальное сходство (мера Жаккара) вопроса и текста")
+    parser.add_argument("--active-only", action="store_true", help="не учитывать скрытые задания")
+    parser.add_argument("--report", help="сохранить группы в JSON")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    start = time.perf_counter()
+    info, items = load_tasks(conn, args.active_only)
+    conn.close()
+    loaded = time.perf_counter()
+    pairs = find_similar_pairs(items, args.threshold)
+    groups = group_pairs(pairs)
+    # Наименьшее сходство среди пар с участием задания - для заголовка группы
+    lowest = {}
+    for first, second, question_similarity, content_similarity in pairs:
+        for task_id in (first, second):
+            lowest[task_id] = min(lowest.get(task_id, 1.0), question_similarity, content_similarity)
+
+    for number, group in enumerate(groups, start=1):
+        print(f"\n--- Группа {number}: заданий {len(group)}, сходство от {min(lowest[t] for t in group):.2f}")
+        for task_id in group:
+            line, is_active, question, answer = info[task_id]
+            hidden = "" if is_active else " [скрыто]"
+            print(f"    №{task_id} (линия {line}){hidden}: {preview(question)} -> {preview(answer)}")
+    print(f"\n>>> Заданий: {len(items)}, похожих пар: {len(pairs)}, групп: {len(groups)}. "
+          f"Чтение {loaded - start:.1f} с, поиск {time.perf_counter() - loaded:.1f} с")
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump([{'task_ids': group, 'lines': sorted({info[t][0] for t in group})} for group in groups],
+                      f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
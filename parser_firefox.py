@@ -1,6 +1,9 @@
+import argparse
+import multiprocessing
 import time
-import sqlite3
 import re
+from queue import Empty
+from urllib.parse import urlsplit, urlunsplit, parse_qs, urlencode
 from selenium import webdriver
 from selenium.webdriver.firefox.service import Service
 from selenium.webdriver.firefox.options import Options
@@ -8,198 +11,508 @@ from selenium.webdriver.common.by import By
 from webdriver_manager.firefox import GeckoDriverManager
 from bs4 import BeautifulSoup
 
+from card_parser import (CARD_SELECTOR, DETAIL_SELECTOR, SOURCE_ID_PATTERN, clean_text,
+                         parse_answer_from_text, source_id_from_html, parse_card)
+from create_db import create_database
+from html_archive import HtmlArchive, DEFAULT_ARCHIVE_DIR
+from task_loader import load_tasks, LoadResult
+
 # --- НАСТРОЙКИ ---
 # Новая ссылка на 1156 заданий
 TARGET_URL = "https://neofamily.ru/literatura/task-bank?sort_by=id&sort_order=asc&parts=%D0%A7%D0%B0%D1%81%D1%82%D1%8C+1&Print=true&Answers=with_answers&lines=184,186,187,190,191,192&themes=174,172,173,876,175,176,177,178,180,181,367,368,370,371,372,373,374,375,376,377,378,379,380,877,382,383,384,385,386,387,388,389,390,391,392,393,394,395,396,397,398,400,401,402,406,409,411"
 TARGET_COUNT = 1156
 DB_NAME = 'literature_bot.db'
+# Сюда режимы snapshot и parallel складывают исходный HTML карточек (см. reparse_archive.py)
+ARCHIVE_DIR = DEFAULT_ARCHIVE_DIR
+
+# Сколько ждать отрисовки после массового раскрытия всех карточек в режиме snapshot
+SNAPSHOT_SETTLE_SECONDS = 5
+# Как часто (в карточках) сохранять чекпоинт, чтобы --resume не повторял работу
+CHECKPOINT_EVERY = 50
+
+# Префикс строк лога: в параллельном режиме у каждого воркера свой (см. scrape_partition)
+LOG_PREFIX = ""
+
+def log(message):
+    print(f"{LOG_PREFIX}{message}", flush=True)
 
 def get_db_connection():
-    return sqlite3.connect(DB_NAME)
+    # Миграции применяются до записи: загрузчику нужна колонка content_hash
+    return create_database(DB_NAME)
 
-def initialize_driver():
+def initialize_driver(headless=False):
     options = Options()
+    if headless:
+        options.add_argument("-headless")
     try:
         service = Service(GeckoDriverManager().install())
         driver = webdriver.Firefox(service=service, options=options)
-        driver.maximize_window()
+        if headless:
+            driver.set_window_size(1920, 1080)
+        else:
+            driver.maximize_window()
         return driver
     except Exception as e:
-        print(f"ОШИБКА драйвера: {e}")
+        log(f"ОШИБКА драйвера: {e}")
         return None
 
-def clean_text(html_content):
+# Номер задания у последней загруженной карточки (null, если не найден)
+LAST_SOURCE_ID_JS = """
+const cards = document.querySelectorAll(arguments[0]);
+if (!cards.length) return null;
+const match = cards[cards.length - 1].innerHTML.match(new RegExp(arguments[1]));
+return match ? parseInt(match[1] || match[2]) : null;
+"""
+
+def open_and_scroll(driver, url=TARGET_URL, target_count=TARGET_COUNT, stop_at_id=None):
     """
-    Очистка текста с сохранением форматирования (абзацы, пробелы, подчеркивания).
+    Открывает банк заданий и прокручивает ленту до target_count карточек
+    (None - пока лента подгружается). С stop_at_id лента должна быть отсортирована
+    по убыванию номера: скролл останавливается, как только дошел до уже известных заданий.
+    Возвращает (число карточек, дошли ли до конца ленты).
     """
-    if not html_content: return None
-    
-    # 1. Заменяем блочные элементы на переносы строк
-    html_content = html_content.replace("<br>", "\n").replace("<br/>", "\n")
-    html_content = html_content.replace("</p>", "\n\n")
-    html_content = html_content.replace("</div>", "\n")
-    html_content = html_content.replace("</li>", "\n")
-
-    soup = BeautifulSoup(html_content, "html.parser")
-
-    # 2. Обработка пропусков (подчеркнутый текст)
-    for tag in soup.find_all(True):
-        style = tag.get('style', '')
-        is_underlined = (tag.name == 'u') or ('text-decoration' in style and 'underline' in style)
-        
-        if is_underlined:
-            inner_text = tag.get_text(strip=True)
-            if not inner_text: # Если внутри только пробелы
-                tag.replace_with(" _______ ")
-    
-    # 3. Получаем текст с разделителем-пробелом (чтобы не было вертикальных слов)
-    text = soup.get_text(separator=" ")
-    
-    # 4. Финальная чистка
-    text = re.sub(r'[ \t]+', ' ', text)      # Убираем лишние пробелы
-    text = re.sub(r' *\n *', '\n', text)     # Убираем пробелы у переносов строк
-    text = re.sub(r'\n{3,}', '\n\n', text)   # Не более 2 пустых строк
-    
-    return text.strip()
-
-def parse_answer_from_text(full_text):
-    """Ищет слово 'Ответ:' в полном тексте карточки"""
-    if "Ответ:" in full_text:
-        parts = full_text.split("Ответ:")
-        if len(parts) > 1:
-            raw_ans = parts[-1].strip().split('\n')[0]
-            if "Источник" in raw_ans:
-                raw_ans = raw_ans.split("Источник")[0].strip()
-            raw_ans = raw_ans.replace(" ИЛИ ", "|").replace(" или ", "|")
-            return raw_ans.lower()
-    return None
-
-def scrape_neofamily():
-    driver = initialize_driver()
-    if not driver: return
+    log(f">>> Открываю сайт...")
+    driver.get(url)
+    time.sleep(5)
 
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    log(f">>> Начинаю скроллинг до {target_count or 'конца ленты'} заданий...")
+    last_height = driver.execute_script("return document.body.scrollHeight")
+    reached_end = False
 
-    try:
-        print(f">>> Открываю сайт...")
-        driver.get(TARGET_URL)
-        time.sleep(5)
-
-        # --- ЭТАП 1: СКРОЛЛИНГ ---
-        print(f">>> Начинаю скроллинг до {TARGET_COUNT} заданий...")
-        last_height = driver.execute_script("return document.body.scrollHeight")
-        
-        while True:
-            driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+    while True:
+        driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+        time.sleep(2)
+
+        # Быстрый подсчет через JS
+        current_count = driver.execute_script("return document.getElementsByClassName('rounded-xl border-natural-2').length")
+        log(f"    -> Загружено: {current_count}")
+
+        new_height = driver.execute_script("return document.body.scrollHeight")
+        if target_count and current_count >= target_count:
+            log(f">>> Ура! Найдено {current_count} заданий.")
+            break
+        if stop_at_id is not None:
+            last_id = driver.execute_script(LAST_SOURCE_ID_JS, CARD_SELECTOR, SOURCE_ID_PATTERN)
+            if last_id is not None and last_id <= stop_at_id:
+                log(f">>> Дошли до известных заданий (№ {last_id}).")
+                break
+        if new_height == last_height:
+            # Вторая попытка
             time.sleep(2)
-            
-            # Быстрый подсчет через JS
-            current_count = driver.execute_script("return document.getElementsByClassName('rounded-xl border-natural-2').length")
-            print(f"    -> Загружено: {current_count}")
-            
-            new_height = driver.execute_script("return document.body.scrollHeight")
-            if current_count >= TARGET_COUNT:
-                print(f">>> Ура! Найдено {current_count} заданий.")
+            driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+            new_height_2 = driver.execute_script("return document.body.scrollHeight")
+            if new_height_2 == last_height:
+                log(">>> Скролл остановился.")
+                reached_end = True
                 break
-            if new_height == last_height:
-                # Вторая попытка
-                time.sleep(2)
-                driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-                new_height_2 = driver.execute_script("return document.body.scrollHeight")
-                if new_height_2 == last_height:
-                    print(">>> Скролл остановился.")
-                    break
-            last_height = new_height
-
-        # --- ЭТАП 2: СБОР ---
-        print(">>> Начинаю обработку...")
-        
-        for i in range(current_count):
+        last_height = new_height
+    return current_count, reached_end
+
+def is_known(source_id, min_source_id):
+    return min_source_id is not None and source_id is not None and source_id <= min_source_id
+
+def collect_live(driver, current_count, start_index=0, min_source_id=None):
+    """
+    Старый сбор: карточки обходятся по одной в живом браузере.
+    Список карточек ищется заново на каждой итерации, после каждого клика - пауза.
+    Отдает словари {'line', 'question', 'content', 'answer', 'source_id'}.
+    Карточки до start_index пропускаются; с min_source_id (лента по убыванию)
+    сбор заканчивается на первом уже известном задании.
+    """
+    for i in range(start_index, current_count):
+        try:
+            # 1. Находим все карточки заново
+            cards = driver.find_elements(By.CSS_SELECTOR, CARD_SELECTOR)
+
+            if i >= len(cards):
+                print(">>> Индекс вышел за пределы списка.")
+                break
+
+            card = cards[i]
+            source_id = source_id_from_html(card.get_attribute('innerHTML'))
+            if is_known(source_id, min_source_id):
+                break
+
+            # 2. Скроллим к карточке и ЖДЕМ отрисовки
+            driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", card)
+            time.sleep(0.5)
+
+            # --- СБОР ДАННЫХ ---
+
+            # А. Линия
             try:
-                # 1. Находим все карточки заново
-                cards = driver.find_elements(By.CSS_SELECTOR, "div.rounded-xl.border-natural-2")
-                
-                if i >= len(cards):
-                    print(">>> Индекс вышел за пределы списка.")
-                    break
-                
-                card = cards[i]
-                
-                # 2. Скроллим к карточке и ЖДЕМ отрисовки
-                driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", card)
-                time.sleep(0.5) 
-                
-                # --- СБОР ДАННЫХ ---
-                
-                # А. Линия
-                try:
-                    line_text = card.find_element(By.XPATH, ".//div[contains(text(), 'линия')]").text
-                    line_number = int(re.search(r'\d+', line_text).group())
-                except:
-                    print(f"[{i+1}] Линия не найдена, пропускаю.")
-                    continue
+                line_text = card.find_element(By.XPATH, ".//div[contains(text(), 'линия')]").text
+                line_number = int(re.search(r'\d+', line_text).group())
+            except:
+                print(f"[{i+1}] Линия не найдена, пропускаю.")
+                continue
 
-                # Б. Вопрос (с новой очисткой)
-                try:
-                    q_el = card.find_element(By.CSS_SELECTOR, ".detail-text_detailText__YRcv_")
-                    question_text = clean_text(q_el.get_attribute('innerHTML'))
-                except:
-                    question_text = "Текст вопроса не найден"
+            # Б. Вопрос (с новой очисткой)
+            try:
+                q_el = card.find_element(By.CSS_SELECTOR, DETAIL_SELECTOR)
+                question_text = clean_text(q_el.get_attribute('innerHTML'))
+            except:
+                question_text = "Текст вопроса не найден"
 
-                # В. Текст произведения
-                content_text = None
+            # В. Текст произведения
+            content_text = None
+            try:
+                expand_btns = card.find_elements(By.XPATH, ".//button[contains(text(), 'Показать полностью')]")
+                if expand_btns:
+                    driver.execute_script("arguments[0].click();", expand_btns[0])
+                    time.sleep(0.2)
+
+                    text_blocks = card.find_elements(By.CSS_SELECTOR, DETAIL_SELECTOR)
+                    if len(text_blocks) > 1:
+                        content_text = clean_text(text_blocks[1].get_attribute('innerHTML'))
+            except:
+                pass
+
+            # Г. Ответ
+            card_full_text = card.text
+            correct_answer = parse_answer_from_text(card_full_text)
+
+            if not correct_answer:
                 try:
-                    expand_btns = card.find_elements(By.XPATH, ".//button[contains(text(), 'Показать полностью')]")
-                    if expand_btns:
-                        driver.execute_script("arguments[0].click();", expand_btns[0])
-                        time.sleep(0.2)
-                        
-                        text_blocks = card.find_elements(By.CSS_SELECTOR, ".detail-text_detailText__YRcv_")
-                        if len(text_blocks) > 1:
-                            content_text = clean_text(text_blocks[1].get_attribute('innerHTML'))
-                except:
+                    sol_btn = card.find_element(By.CSS_SELECTOR, "button[data-name='solution']")
+                    driver.execute_script("arguments[0].click();", sol_btn)
+                    time.sleep(0.5)
+
+                    card_full_text_after_click = card.text
+                    correct_answer = parse_answer_from_text(card_full_text_after_click)
+                except Exception as e:
+                    if i == 0: driver.save_screenshot("debug_error.png")
                     pass
 
-                # Г. Ответ
-                card_full_text = card.text
-                correct_answer = parse_answer_from_text(card_full_text)
-                
-                if not correct_answer:
-                    try:
-                        sol_btn = card.find_element(By.CSS_SELECTOR, "button[data-name='solution']")
-                        driver.execute_script("arguments[0].click();", sol_btn)
-                        time.sleep(0.5) 
-                        
-                        card_full_text_after_click = card.text
-                        correct_answer = parse_answer_from_text(card_full_text_after_click)
-                    except Exception as e:
-                        if i == 0: driver.save_screenshot("debug_error.png")
-                        pass
-
-                # Д. Запись
-                if correct_answer:
-                    cursor.execute("SELECT id FROM tasks WHERE question_text = ? AND correct_answer = ?", (question_text, correct_answer))
-                    if not cursor.fetchone():
-                        # ВАЖНО: is_active = 1
-                        cursor.execute('''
-                            INSERT INTO tasks (line_number, question_text, content_text, correct_answer, is_active)
-                            VALUES (?, ?, ?, ?, 1)
-                        ''', (line_number, question_text, content_text, correct_answer))
-                        conn.commit()
-                        print(f"[{i+1}/{current_count}] Линия {line_number} -> OK: {correct_answer}")
-                    else:
-                        print(f"[{i+1}/{current_count}] Уже в базе")
-                else:
-                    print(f"[{i+1}/{current_count}] Ответ не извлечен.")
+            yield i, {'line': line_number, 'question': question_text, 'content': content_text,
+                      'answer': correct_answer, 'source_id': source_id}
 
-            except Exception as e:
-                print(f"[{i+1}] Сбой итерации: {e}")
-                continue
+        except Exception as e:
+            print(f"[{i+1}] Сбой итерации: {e}")
+            continue
+
+# Один проход по всем карточкам: раскрыть тексты и решения.
+# Карточки, у которых была кнопка «Показать полностью», помечаются data-has-text:
+# после клика кнопка может исчезнуть, а разбор должен знать, что второй блок - текст произведения.
+EXPAND_ALL_JS = """
+const cards = document.querySelectorAll(arguments[0]);
+let expanded = 0, solutions = 0;
+for (const card of cards) {
+    for (const btn of card.querySelectorAll('button')) {
+        if (btn.textContent.includes('Показать полностью')) {
+            card.setAttribute('data-has-text', '1');
+            btn.click();
+            expanded++;
+            break;
+        }
+    }
+    if (!card.innerText.includes('Ответ:')) {
+        const sol = card.querySelector("button[data-name='solution']");
+        if (sol) { sol.click(); solutions++; }
+    }
+}
+return [cards.length, expanded, solutions];
+"""
+
+def expand_all(driver):
+    total, expanded, solutions = driver.execute_script(EXPAND_ALL_JS, CARD_SELECTOR)
+    log(f">>> Раскрыто текстов: {expanded}, решений: {solutions} (карточек: {total})")
+    time.sleep(SNAPSHOT_SETTLE_SECONDS)
+
+def collect_snapshot(driver, start_index=0, min_source_id=None, archive=None):
+    """
+    Быстрый сбор: все карточки раскрываются одним JS-проходом, затем берется
+    один снимок page_source и разбирается офлайн, без обращений к браузеру.
+    start_index и min_source_id - как в collect_live. С archive (HtmlArchive)
+    HTML каждой карточки сохраняется до разбора, а задание получает его ключ raw_hash.
+    """
+    expand_all(driver)
+    soup = BeautifulSoup(driver.page_source, "html.parser")
+    for i, card in enumerate(soup.select(CARD_SELECTOR)):
+        if i < start_index:
+            continue
+        card_html = str(card)
+        if is_known(source_id_from_html(card_html), min_source_id):
+            break
+        raw_hash = archive.put(card_html) if archive else None
+        try:
+            task = parse_card(card)
+        except Exception as e:
+            log(f"[{i+1}] Сбой разбора: {e}")
+            continue
+        if task is None:
+            log(f"[{i+1}] Линия не найдена, пропускаю.")
+            continue
+        task['raw_hash'] = raw_hash
+        yield i, task
+
+# --- ЧЕКПОИНТЫ ---
+# scrape_checkpoints хранит для каждой ленты (url) наибольший загруженный номер задания
+# и индекс последней обработанной карточки. --incremental собирает только задания новее
+# max_source_id, --resume продолжает прерванный полный проход с last_index + 1.
+
+def load_checkpoint(conn, url):
+    """(max_source_id, last_index, finished) или None"""
+    return conn.execute("SELECT max_source_id, last_index, finished FROM scrape_checkpoints WHERE url = ?",
+                        (url,)).fetchone()
+
+def save_checkpoint(conn, url, max_source_id, last_index, finished):
+    with conn:
+        conn.execute('''
+            INSERT INTO scrape_checkpoints (url, max_source_id, last_index, finished, updated_at)
+            VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+            ON CONFLICT(url) DO UPDATE SET max_source_id = excluded.max_source_id, last_index = excluded.last_index,
+                finished = excluded.finished, updated_at = excluded.updated_at
+        ''', (url, max_source_id, last_index, int(finished)))
+
+def known_max_source_id(conn, url):
+    """Наибольший известный номер: из чекпоинта ленты или из заданий, загруженных другим путем"""
+    checkpoint = load_checkpoint(conn, url)
+    in_tasks = conn.execute("SELECT MAX(source_id) FROM tasks").fetchone()[0]
+    known = [value for value in (checkpoint[0] if checkpoint else None, in_tasks) if value is not None]
+    return max(known) if known else None
 
+def save_tasks(conn, tasks, total, checkpoint_url=None, max_source_id=None, last_index=-1, full_pass=True, finished=False):
+    """
+    Пишет собранные задания через task_loader пачками по CHECKPOINT_EVERY карточек
+    (каждая пачка - одна транзакция, дедупликация по хешу). С checkpoint_url после
+    каждой пачки сохраняется чекпоинт, в конце - еще раз, с флагом finished.
+    Инкрементальный сбор (full_pass=False) идет по ленте в обратном порядке,
+    поэтому двигает только max_source_id, а last_index и finished оставляет как были.
+    finished - пройдена ли лента до конца: полный проход, остановленный раньше
+    (например, на target_count), пройденным не отмечается.
+    """
+    totals = LoadResult()
+    chunk = []
+    seen = 0
+
+    def flush():
+        result = load_tasks(conn, chunk)
+        for field in LoadResult.__slots__:
+            setattr(totals, field, getattr(totals, field) + getattr(result, field))
+        chunk.clear()
+        if checkpoint_url:
+            save_checkpoint(conn, checkpoint_url, max_source_id, last_index, finished)
+
+    for i, task in tasks:
+        if task['answer']:
+            chunk.append(task)
+        else:
+            print(f"[{i+1}/{total}] Ответ не извлечен.")
+        if task.get('source_id') is not None:
+            max_source_id = max(max_source_id or 0, task['source_id'])
+        if full_pass:
+            last_index = max(last_index, i)
+        seen += 1
+        if len(chunk) >= CHECKPOINT_EVERY:
+            flush()
+            print(f"    -> Обработано карточек: {seen}")
+    flush()
+    if checkpoint_url:
+        save_checkpoint(conn, checkpoint_url, max_source_id, last_index, finished)
+    print(f">>> Запись в базу: {totals}")
+
+def incremental_url(url):
+    """Та же лента, но новые задания первыми"""
+    parts = urlsplit(url)
+    query = dict(parse_qs(parts.query), sort_order=["desc"])
+    return urlunsplit(parts._replace(query=urlencode(query, doseq=True, safe=",")))
+
+def scrape_neofamily(mode="snapshot", incremental=False, resume=False):
+    conn = get_db_connection()
+    checkpoint = load_checkpoint(conn, TARGET_URL)
+    start_index, min_source_id, url, target_count = 0, None, TARGET_URL, TARGET_COUNT
+    max_source_id, last_index, finished = checkpoint if checkpoint else (None, -1, False)
+    if incremental:
+        min_source_id = known_max_source_id(conn, TARGET_URL)
+        url, target_count = incremental_url(TARGET_URL), None
+        print(f">>> Инкрементальный сбор: задания новее № {min_source_id}")
+    elif resume:
+        if not checkpoint or checkpoint[2]:
+            print(">>> Незавершенного прохода нет, продолжать нечего.")
+            conn.close()
+            return
+        start_index = last_index + 1
+        print(f">>> Продолжаю с карточки {start_index + 1}")
+
+    driver = initialize_driver()
+    if not driver:
+        conn.close()
+        return
+
+    try:
+        started = time.perf_counter()
+        current_count, reached_end = open_and_scroll(driver, url, target_count, stop_at_id=min_source_id)
+        scrolled = time.perf_counter()
+
+        print(f">>> Начинаю обработку ({mode})...")
+        if mode == "snapshot":
+            tasks = collect_snapshot(driver, start_index, min_source_id, HtmlArchive(ARCHIVE_DIR))
+        else:
+            tasks = collect_live(driver, current_count, start_index, min_source_id)
+        if incremental:
+            save_tasks(conn, tasks, current_count, TARGET_URL, max_source_id, last_index, full_pass=False, finished=finished)
+        else:
+            save_tasks(conn, tasks, current_count, TARGET_URL, max_source_id, start_index - 1, finished=reached_end)
+        done = time.perf_counter()
+
+        print(f">>> Время: скроллинг {scrolled - started:.0f} с, сбор {done - scrolled:.0f} с, "
+              f"всего {done - started:.0f} с ({mode})")
     finally:
         conn.close()
         driver.quit()
 
+def compare_modes(limit):
+    """
+    Замер обоих способов сбора на одной ленте, без записи в базу.
+    Старый цикл проходит только первые limit карточек, его время экстраполируется на всю ленту.
+    Страница перезагружается между режимами: старый цикл уже раскрыл часть карточек.
+    """
+    driver = initialize_driver()
+    if not driver: return
+
+    try:
+        current_count, _ = open_and_scroll(driver)
+        limit = min(limit, current_count)
+        started = time.perf_counter()
+        live = dict(collect_live(driver, limit))
+        live_time = time.perf_counter() - started
+
+        open_and_scroll(driver)
+        started = time.perf_counter()
+        snapshot = dict(collect_snapshot(driver))
+        snapshot_time = time.perf_counter() - started
+    finally:
+        driver.quit()
+
+    mismatches = [i for i in live if live[i] != snapshot.get(i)]
+    print(f"\n{'режим':<10} {'карточек':>9} {'время':>10} {'на карточку':>12} {'на все ' + str(current_count):>14}")
+    print(f"{'live':<10} {len(live):>9} {live_time:>9.1f}с {live_time / max(len(live), 1):>11.2f}с "
+          f"{live_time / max(limit, 1) * current_count:>13.0f}с")
+    print(f"{'snapshot':<10} {len(snapshot):>9} {snapshot_time:>9.1f}с {snapshot_time / max(len(snapshot), 1):>11.3f}с "
+          f"{snapshot_time:>13.0f}с")
+    print(f"Расхождений в первых {limit} карточках: {len(mismatches)}")
+    for i in mismatches[:5]:
+        print(f"    [{i+1}] live: {live[i]}\n         snapshot: {snapshot.get(i)}")
+
+# --- ПАРАЛЛЕЛЬНЫЙ СБОР ---
+# Лента делится по фильтру lines (одна линия на воркер) или по группам themes.
+# Каждый воркер - отдельный процесс с headless Firefox и режимом snapshot,
+# готовые карточки он отправляет в очередь. В базу пишет только главный процесс.
+
+def partition_urls(split, workers):
+    """[(имя части, url)] для параллельного сбора"""
+    parts = urlsplit(TARGET_URL)
+    query = parse_qs(parts.query)
+    ids = query[split][0].split(",")
+    if split == "lines":
+        groups = [[line_id] for line_id in ids]
+    else:
+        size = -(-len(ids) // workers)
+        groups = [ids[start:start + size] for start in range(0, len(ids), size)]
+    result = []
+    for group in groups:
+        part_query = dict(query, **{split: [",".join(group)]})
+        name = f"{split}={group[0]}" if len(group) == 1 else f"{split}={group[0]}..{group[-1]}"
+        result.append((name, urlunsplit(parts._replace(query=urlencode(part_query, doseq=True, safe=",")))))
+    return result
+
+def scrape_partition(name, url, queue, min_source_id=None):
+    """Процесс-воркер: собирает свою часть ленты и шлет в очередь ('task'|'done'|'error', имя, ...)"""
+    global LOG_PREFIX
+    LOG_PREFIX = f"[{name}] "
+    started = time.perf_counter()
+    driver = initialize_driver(headless=True)
+    if not driver:
+        queue.put(('error', name, "драйвер не запустился", time.perf_counter() - started))
+        return
+    try:
+        # Размер части заранее неизвестен - скроллим до конца ленты (или до известных заданий)
+        if min_source_id is not None:
+            url = incremental_url(url)
+        open_and_scroll(driver, url, target_count=None, stop_at_id=min_source_id)
+        count = 0
+        for _, task in collect_snapshot(driver, min_source_id=min_source_id, archive=HtmlArchive(ARCHIVE_DIR)):
+            queue.put(('task', name, task))
+            count += 1
+        queue.put(('done', name, count, time.perf_counter() - started))
+    except Exception as e:
+        queue.put(('error', name, str(e), time.perf_counter() - started))
+    finally:
+        driver.quit()
+
+def scrape_parallel(split="lines", workers=6, incremental=False):
+    started = time.perf_counter()
+    conn = get_db_connection()
+    checkpoint = load_checkpoint(conn, TARGET_URL)
+    min_source_id = known_max_source_id(conn, TARGET_URL) if incremental else None
+    partitions = partition_urls(split, workers)
+    queue = multiprocessing.Queue()
+    processes = {}
+    for name, url in partitions:
+        process = multiprocessing.Process(target=scrape_partition, args=(name, url, queue, min_source_id), daemon=True)
+        process.start()
+        processes[name] = process
+    print(f">>> Запущено воркеров: {len(processes)} (разбиение по {split})")
+
+    report = {}
+
+    def tasks_from_queue():
+        received = 0
+        while len(report) < len(processes):
+            try:
+                message = queue.get(timeout=5)
+            except Empty:
+                # Воркер, упавший без отчета (например, убит браузер), не должен повесить запись
+                for name, process in processes.items():
+                    if name not in report and not process.is_alive():
+                        report[name] = ('error', name, f"процесс завершился с кодом {process.exitcode}", 0.0)
+                        print(f">>> [{name}] СБОЙ: процесс завершился с кодом {process.exitcode}")
+                continue
+            kind, name = message[0], message[1]
+            if kind == 'task':
+                received += 1
+                yield received - 1, message[2]
+            else:
+                report[name] = message
+                if kind == 'done':
+                    print(f">>> [{name}] готово: {message[2]} карточек за {message[3]:.0f} с")
+                else:
+                    print(f">>> [{name}] СБОЙ через {message[3]:.0f} с: {message[2]}")
+
+    # Части идут вперемешку, поэтому индекс карточки в полной ленте не ведем - только наибольший номер
+    max_source_id, last_index, finished = checkpoint if checkpoint else (None, -1, False)
+    try:
+        save_tasks(conn, tasks_from_queue(), "?", TARGET_URL, max_source_id, last_index, full_pass=False, finished=finished)
+    finally:
+        conn.close()
+    for process in processes.values():
+        process.join()
+
+    elapsed = time.perf_counter() - started
+    worker_time = sum(message[3] for message in report.values())
+    print(f"\n{'часть':<28} {'статус':<8} {'карточек':>9} {'время':>8}")
+    for name, _ in partitions:
+        kind, _, result, seconds = report[name]
+        print(f"{name:<28} {kind:<8} {result if kind == 'done' else '-':>9} {seconds:>7.0f}с")
+    print(f"Общее время: {elapsed:.0f} с, сумма времени воркеров: {worker_time:.0f} с "
+          f"(ускорение x{worker_time / max(elapsed, 1e-9):.1f})")
+
 if __name__ == "__main__":
-    scrape_neofamily()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Сбор заданий с neofamily.ru")
+    parser.add_argument("--mode", choices=["snapshot", "live", "compare", "parallel"], default="snapshot",
+                        help="snapshot - один снимок страницы и офлайн-разбор, live - старый обход по карточкам, "
+                             "compare - замер обоих без записи в базу, parallel - несколько headless-браузеров")
+    parser.add_argument("--limit", type=int, default=50, help="сколько карточек проходить старым циклом в режиме compare")
+    parser.add_argument("--split", choices=["lines", "themes"], default="lines",
+                        help="как делить ленту в режиме parallel: по линии на воркер или на группы тем")
+    parser.add_argument("--workers", type=int, default=6, help="число групп тем при --split themes")
+    parser.add_argument("--incremental", action="store_true", help="собрать только задания новее загруженных")
+    parser.add_argument("--resume", action="store_true", help="продолжить прерванный проход с последнего чекпоинта")
+    args = parser.parse_args()
+    if args.mode == "compare":
+        compare_modes(args.limit)
+    elif args.mode == "parallel":
+        scrape_parallel(args.split, args.workers, args.incremental)
+    else:
+        scrape_neofamily(args.mode, args.incremental, args.resume)
@@ -0,0 +1,113 @@
+import asyncio
+import logging
+
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.exceptions import TelegramRetryAfter
+
+# Лимиты Telegram: около 30 сообщений в секунду на бота и около 1 в секунду в один чат.
+# Берем с запасом.
+DEFAULT_GLOBAL_RATE = 25
+DEFAULT_CHAT_RATE = 1
+DEFAULT_CHAT_BURST = 3
+# Сколько bucket'ов чатов держим до первой очистки от простаивающих
+CHAT_SWEEP_THRESHOLD = 1024
+
+# Методы, которые отправляют или меняют сообщения и попадают под лимиты
+LIMITED_METHODS = {"SendMessage", "EditMessageText", "EditMessageReplyMarkup", "SendDocument", "SendPhoto"}
+
+
+class TokenBucket:
+    """Классический token bucket: rate токенов в секунду, не больше capacity в запасе."""
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = None
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        # Ожидающие обслуживаются по очереди (asyncio.Lock справедлив)
+        async with self._lock:
+            loop = asyncio.get_running_loop()
+            while True:
+                now = loop.time()
+                if self._updated is not None:
+                    self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def is_idle(self, now):
+        """Запас снова полон и никто не ждет: такой bucket ничем не отличается от нового"""
+        if self._lock.locked():
+            return False
+        return self._updated is None or self._tokens + (now - self._updated) * self.rate >= self.capacity
+
+
+class RateLimiter:
+    """
+    Общий лимитер исходящих сообщений: глобальный bucket на бота и по bucket на чат.
+    После flood-ошибки от Telegram все отправки ставятся на паузу.
+    Bucket'ы чатов, у которых запас снова полон, удаляются при очистке: она запускается,
+    когда чатов вдвое больше, чем осталось после прошлой (не реже CHAT_SWEEP_THRESHOLD).
+    """
+    def __init__(self, rate=DEFAULT_GLOBAL_RATE, chat_rate=DEFAULT_CHAT_RATE, chat_burst=DEFAULT_CHAT_BURST):
+        self._global = TokenBucket(rate, rate)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self._chats = {}
+        self._sweep_at = CHAT_SWEEP_THRESHOLD
+        self._paused_until = 0.0
+
+    def set_rate(self, rate):
+        """Новый общий лимит (например, доля процесса при нескольких воркерах); вызывать до начала отправки"""
+        self._global = TokenBucket(rate, rate)
+
+    async def acquire(self, chat_id=None):
+        loop = asyncio.get_running_loop()
+        while loop.time() < self._paused_until:
+            await asyncio.sleep(self._paused_until - loop.time())
+        if chat_id is not None:
+            bucket = self._chats.get(chat_id)
+            if bucket is None:
+                if len(self._chats) >= self._sweep_at:
+                    self._sweep(loop.time())
+                bucket = self._chats[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+            await bucket.acquire()
+        await self._global.acquire()
+
+    def _sweep(self, now):
+        self._chats = {chat_id: bucket for chat_id, bucket in self._chats.items() if not bucket.is_idle(now)}
+        self._sweep_at = max(CHAT_SWEEP_THRESHOLD, 2 * len(self._chats))
+
+    def pause(self, seconds):
+        loop = asyncio.get_running_loop()
+        self._paused_until = max(self._paused_until, loop.time() + seconds)
+
+
+class RateLimitMiddleware(BaseRequestMiddleware):
+    """
+    Middleware сессии бота: каждый вызов Bot API из LIMITED_METHODS проходит через лимитер,
+    при TelegramRetryAfter ждем указанное время и повторяем запрос.
+    Подключение: bot.session.middleware(RateLimitMiddleware(limiter))
+    """
+    def __init__(self, limiter, max_retries=3):
+        self.limiter = limiter
+        self.max_retries = max_retries
+
+    async def __call__(self, make_request, bot, method):
+        limited = type(method).__name__ in LIMITED_METHODS
+        for attempt in range(self.max_retries + 1):
+            if limited:
+                await self.limiter.acquire(getattr(method, "chat_id", None))
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                if attempt == self.max_retries:
+                    raise
+                logging.warning(f"Flood control: ждем {e.retry_after} с перед повтором {type(method).__name__}")
+                self.limiter.pause(e.retry_after)
+                if not limited:
+                    await asyncio.sleep(e.retry_after)
@@ -0,0 +1,85 @@
+import asyncio
+import logging
+import time
+
+from aiogram.exceptions import TelegramAPIError, TelegramForbiddenError
+
+
+class ReminderStats:
+    __slots__ = ('day', 'resumed', 'candidates', 'sent', 'failed', 'blocked', 'seconds', 'day_totals')
+
+    def __init__(self, day, resumed):
+        self.day = day
+        self.resumed = resumed
+        self.candidates = 0
+        self.sent = 0
+        self.failed = 0
+        self.blocked = 0
+        self.seconds = 0.0
+        self.day_totals = (0, 0)  # (доставлено, ошибок) за день вместе с прерванными запусками
+
+    def __str__(self):
+        rate = self.sent / self.seconds if self.seconds else 0.0
+        resumed = " (продолжение прерванной рассылки)" if self.resumed else ""
+        return (f"Напоминания за {self.day}{resumed}: учеников {self.candidates}, доставлено {self.sent}, "
+                f"ошибок {self.failed} (из них бот заблокирован: {self.blocked}), "
+                f"{self.seconds:.1f} с, {rate:.1f} сообщ./с"
+                + (f"; всего за день доставлено {self.day_totals[0]}, ошибок {self.day_totals[1]}" if self.resumed else ""))
+
+
+class ReminderBroadcast:
+    """
+    Рассылка напоминания ученикам, не закончившим день.
+
+    Список учеников - один запрос (Database.get_users_to_remind). Отправка идет пачками
+    по batch_size: пачка сначала отмечается в reminder_deliveries, затем отправляется
+    не больше concurrency сообщений одновременно, затем записываются итоги.
+    Темп и повторы после flood-ошибок обеспечивает RateLimiter в сессии бота (rate_limiter.py).
+    После перезапуска рассылка продолжается с еще не отмеченных учеников.
+    """
+    def __init__(self, bot, db, text, reply_markup=None, concurrency=5, batch_size=100):
+        self.bot = bot
+        self.db = db
+        self.text = text
+        self.reply_markup = reply_markup
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+
+    async def run(self, day):
+        stats = ReminderStats(day, await self.db.is_reminder_run_unfinished(day))
+        started = time.monotonic()
+        await self.db.start_reminder_run(day)
+        user_ids = await self.db.get_users_to_remind(day)
+        stats.candidates = len(user_ids)
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        for start in range(0, len(user_ids), self.batch_size):
+            batch = user_ids[start:start + self.batch_size]
+            await self.db.claim_reminders(day, batch)
+            results = await asyncio.gather(*(self._send(semaphore, user_id, stats) for user_id in batch))
+            delivered = [user_id for user_id, ok in zip(batch, results) if ok]
+            failed = [user_id for user_id, ok in zip(batch, results) if not ok]
+            await self.db.record_reminders(day, delivered, failed)
+            stats.sent += len(delivered)
+            stats.failed += len(failed)
+
+        stats.day_totals = await self.db.finish_reminder_run(day)
+        stats.seconds = time.monotonic() - started
+        return stats
+
+    async def _send(self, semaphore, user_id, stats):
+        async with semaphore:
+            try:
+                await self.bot.send_message(user_id, self.text, reply_markup=self.reply_markup, parse_mode="HTML")
+                return True
+            except TelegramForbiddenError:
+                # Ученик заблокировал бота - обычное дело, не ошибка рассылки
+                stats.blocked += 1
+                return False
+            except TelegramAPIError as e:
+                logging.warning(f"Напоминание ученику {user_id} не отправлено: {e}")
+                return False
+            except Exception:
+                # Сбой одного сообщения не должен останавливать рассылку остальным
+                logging.exception(f"Напоминание ученику {user_id} не отправлено")
+                return False
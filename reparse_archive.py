@@ -0,0 +1,116 @@
+"""
+Повторный разбор архива исходного HTML карточек (html_archive.py).
+
+Для каждого задания с raw_hash карточка читается из архива и заново проходит
+через clean_text и parse_answer_from_text (card_parser.parse_card) в пуле процессов.
+Изменившиеся задания обновляются в tasks одной транзакцией, по каждому
+печатается, какие поля поменялись. Запущенный бот увидит изменения после перезапуска
+(кеш заданий, см. task_cache.py).
+
+Запуск: python reparse_archive.py [--db literature_bot.db] [--archive html_archive] [--dry-run] [--report diff.json]
+"""
+import argparse
+import json
+import os
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+
+from bs4 import BeautifulSoup
+
+from card_parser import parse_card
+from create_db import DB_NAME
+from html_archive import HtmlArchive, DEFAULT_ARCHIVE_DIR
+from task_loader import task_hash
+from text_storage import compress_text, decompress_text, index_task_texts
+
+FIELDS = ('line', 'question', 'content', 'answer')
+PREVIEW_LENGTH = 80
+
+
+def reparse_one(job):
+    """(task_id, archive_root, raw_hash) -> (task_id, задание | None, ошибка | None). Выполняется в процессе пула."""
+    task_id, root, raw_hash = job
+    try:
+        card = BeautifulSoup(HtmlArchive(root).get(raw_hash), "html.parser").find()
+        return task_id, parse_card(card), None
+    except Exception as e:
+        return task_id, None, str(e)
+
+
+def preview(value):
+    text = "" if value is None else str(value).replace("\n", "\\n")
+    return text if len(text) <= PREVIEW_LENGTH else text[:PREVIEW_LENGTH] + "..."
+
+
+def reparse(db_name=DB_NAME, archive_root=DEFAULT_ARCHIVE_DIR, workers=None, dry_run=False):
+    """Возвращает список изменений [{'task_id', 'changes': {поле: [было, стало]}}] и число ошибок"""
+    conn = sqlite3.connect(db_name)
+    rows = conn.execute('''
+        SELECT id, raw_hash, line_number, question_text, content_z, content_text, correct_answer
+        FROM tasks WHERE raw_hash IS NOT NULL
+    ''').fetchall()
+    current = {row[0]: {'line': row[2], 'question': row[3],
+                        'content': decompress_text(row[4]) if row[4] else row[5], 'answer': row[6]}
+               for row in rows}
+    # Хеши остальных заданий: новый вопрос/ответ не должен совпасть с чужим заданием
+    taken = dict(conn.execute("SELECT content_hash, id FROM tasks WHERE content_hash IS NOT NULL"))
+
+    diff, updates, texts, errors = [], [], [], 0
+    jobs = [(task_id, archive_root, raw_hash) for task_id, raw_hash, *_ in rows]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for task_id, parsed, error in pool.map(reparse_one, jobs, chunksize=32):
+            if parsed is None or not parsed['answer']:
+                errors += 1
+                print(f"[{task_id}] Не разобрано: {error or 'нет линии или ответа'}")
+                continue
+            old = current[task_id]
+            changes = {field: [old[field], parsed[field]] for field in FIELDS if old[field] != parsed[field]}
+            if not changes:
+                continue
+            new_hash = task_hash(parsed['question'], parsed['answer'])
+            if taken.get(new_hash, task_id) != task_id:
+                errors += 1
+                print(f"[{task_id}] Совпадает с заданием {taken[new_hash]} после разбора, пропускаю")
+                continue
+            taken[new_hash] = task_id
+            diff.append({'task_id': task_id, 'changes': changes})
+            updates.append((parsed['line'], parsed['question'], compress_text(parsed['content']),
+                            parsed['answer'], new_hash, task_id))
+            texts.append((task_id, parsed['content']))
+
+    if updates and not dry_run:
+        with conn:
+            # Старый хеш освобождается тем же UPDATE, поэтому обмен вопросами между заданиями тут не поддержан
+            conn.executemany('''
+                UPDATE tasks SET line_number = ?, question_text = ?, content_z = ?, content_text = NULL,
+                                 correct_answer = ?, content_hash = ?
+                WHERE id = ?
+            ''', updates)
+            index_task_texts(conn.cursor(), texts)
+    conn.close()
+    print(f">>> Заданий в архиве: {len(rows)}, изменилось: {len(diff)}, не разобрано: {errors}"
+          f"{' (dry-run, база не изменена)' if dry_run else ''}")
+    return diff, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Повторный разбор архива HTML карточек")
+    parser.add_argument("--db", default=DB_NAME)
+    parser.add_argument("--archive", default=DEFAULT_ARCHIVE_DIR)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--dry-run", action="store_true", help="только показать изменения")
+    parser.add_argument("--report", help="сохранить изменения в JSON")
+    args = parser.parse_args()
+
+    diff, _ = reparse(args.db, args.archive, args.workers, args.dry_run)
+    for entry in diff:
+        print(f"\n--- Задание {entry['task_id']}")
+        for field, (old, new) in entry['changes'].items():
+            print(f"    {field}: {preview(old)}\n    {' ' * len(field)}  -> {preview(new)}")
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(diff, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
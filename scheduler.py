@@ -0,0 +1,54 @@
+import asyncio
+import datetime
+import logging
+
+
+def parse_time(value):
+    """'HH:MM' -> datetime.time; пустая строка - задача выключена (None)"""
+    if not value:
+        return None
+    hours, minutes = value.split(":")
+    return datetime.time(int(hours), int(minutes))
+
+
+def seconds_until(at, now=None):
+    """Секунд до ближайшего наступления локального времени at"""
+    now = now or datetime.datetime.now()
+    moment = datetime.datetime.combine(now.date(), at)
+    if moment <= now:
+        moment += datetime.timedelta(days=1)
+    return (moment - now).total_seconds()
+
+
+class DailyJob:
+    """
+    Фоновая задача бота, которая раз в сутки в локальное время at вызывает корутину callback().
+    Ошибка одного запуска пишется в лог и не останавливает расписание.
+    """
+    def __init__(self, name, at, callback):
+        self.name = name
+        self.at = at
+        self.callback = callback
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(seconds_until(self.at))
+            try:
+                await self.callback()
+            except Exception:
+                logging.exception(f"Сбой ежедневной задачи {self.name}")
@@ -0,0 +1,122 @@
+import asyncio
+import logging
+import multiprocessing
+import queue
+import signal
+
+from aiogram.methods import GetUpdates
+
+POLLING_TIMEOUT = 30
+# Сколько апдейтов может ждать в очереди одного воркера, прежде чем приемник притормозит
+WORKER_QUEUE_SIZE = 1000
+
+
+def shard_of(update, workers):
+    """
+    Номер воркера для апдейта: по id пользователя, чтобы весь сценарий одного ученика
+    (FSM-состояние, его выборщик заданий в памяти) жил в одном процессе.
+    Апдейты без пользователя уходят в воркер 0.
+    """
+    user = getattr(update.event, "from_user", None)
+    return user.id % workers if user else 0
+
+
+async def run_sharded_polling(bot, worker_target, workers, drain_timeout=30):
+    """
+    Long polling в главном процессе и обработка апдейтов в workers процессах.
+    worker_target(index, updates_queue) - точка входа воркера, должна быть функцией уровня модуля
+    (процессы запускаются через spawn). Воркер получает апдейты как dict и None как сигнал остановки.
+    Останавливается по SIGINT/SIGTERM: перестаем забирать апдейты и ждем, пока воркеры доделают свои.
+    """
+    context = multiprocessing.get_context("spawn")
+    queues = [context.Queue(WORKER_QUEUE_SIZE) for _ in range(workers)]
+    processes = [context.Process(target=worker_target, args=(index, queues[index]), name=f"bot-worker-{index}")
+                 for index in range(workers)]
+    for process in processes:
+        process.start()
+    print(f"Запущено воркеров: {workers}")
+
+    loop = asyncio.get_running_loop()
+    stop_event = asyncio.Event()
+    signals = []
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop_event.set)
+            signals.append(sig)
+        except (NotImplementedError, RuntimeError):
+            pass
+
+    polling = asyncio.create_task(_poll(bot, queues, workers))
+    stopped = asyncio.create_task(stop_event.wait())
+    try:
+        await asyncio.wait([polling, stopped], return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for sig in signals:
+            loop.remove_signal_handler(sig)
+        polling.cancel()
+        stopped.cancel()
+        for updates_queue in queues:
+            await loop.run_in_executor(None, updates_queue.put, None)
+        for process in processes:
+            await loop.run_in_executor(None, process.join, drain_timeout)
+            if process.is_alive():
+                logging.error(f"{process.name} не остановился за {drain_timeout} с, завершаем принудительно")
+                process.kill()
+
+
+async def _poll(bot, queues, workers):
+    loop = asyncio.get_running_loop()
+    get_updates = GetUpdates(timeout=POLLING_TIMEOUT)
+    delay = 1.0
+    while True:
+        try:
+            updates = await bot(get_updates, request_timeout=POLLING_TIMEOUT + 10)
+            delay = 1.0
+        except Exception as e:
+            logging.error(f"Не удалось получить апдейты: {e}. Повтор через {delay:.0f} с")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 30.0)
+            continue
+
+        for update in updates:
+            target = queues[shard_of(update, workers)]
+            raw = update.model_dump(mode="json", exclude_unset=True)
+            try:
+                target.put_nowait(raw)
+            except queue.Full:
+                # Воркер не успевает: ждем места, не теряя апдейт
+                await loop.run_in_executor(None, target.put, raw)
+            get_updates.offset = update.update_id + 1
+
+
+async def serve_updates(dp, bot, updates_queue):
+    """
+    Цикл воркера: берет апдейты из очереди и обрабатывает каждый отдельной задачей, как это делает polling.
+    После None дожидается начатых хендлеров, выполняет shutdown диспетчера и закрывает сессию бота.
+    """
+    # Сигналы остановки получает главный процесс и присылает None, сами воркеры их игнорируют
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, signal.SIG_IGN)
+    loop = asyncio.get_running_loop()
+    in_flight = set()
+    await dp.emit_startup(bot=bot)
+    try:
+        while True:
+            raw = await loop.run_in_executor(None, updates_queue.get)
+            if raw is None:
+                break
+            task = asyncio.create_task(_feed(dp, bot, raw))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+        if in_flight:
+            await asyncio.wait(in_flight)
+    finally:
+        await dp.emit_shutdown(bot=bot)
+        await bot.session.close()
+
+
+async def _feed(dp, bot, raw):
+    try:
+        await dp.feed_raw_update(bot, raw)
+    except Exception:
+        logging.exception(f"Ошибка обработки апдейта {raw.get('update_id')}")
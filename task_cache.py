@@ -0,0 +1,91 @@
+import html
+import sys
+import threading
+from collections import OrderedDict
+
+from answer_matching import AnswerMatcher
+
+# Лимит памяти под страницы текстов произведений по умолчанию (остальные поля заданий маленькие)
+DEFAULT_TEXT_CACHE_BYTES = 32 * 1024 * 1024
+
+
+class TaskRecord:
+    """Задание в виде, готовом для отправки и проверки: HTML уже экранирован, ответ собран в AnswerMatcher."""
+    __slots__ = ('id', 'line', 'question_html', 'options_html', 'answer_variants', 'matcher', 'has_text', 'text_pages')
+
+    def __init__(self, task_id, line, question, options, correct_answer, has_text):
+        self.id = task_id
+        self.line = line
+        self.question_html = html.escape(question)
+        self.options_html = html.escape(options) if options else ""
+        self.answer_variants = tuple(correct_answer.split("|"))
+        self.matcher = AnswerMatcher(line, correct_answer)
+        self.has_text = bool(has_text)
+        # Готовые HTML-страницы текста произведения. Заполняются лениво, вытесняются по LRU
+        self.text_pages = None
+
+
+class TaskCache:
+    """
+    Общий на процесс кеш заданий.
+    Короткие поля (вопрос, варианты, ответы) хранятся для всех заданий банка,
+    отрендеренные страницы больших текстов произведений - в LRU с ограничением по памяти.
+    """
+    def __init__(self, text_cache_bytes=DEFAULT_TEXT_CACHE_BYTES):
+        self.text_cache_bytes = text_cache_bytes
+        self._lock = threading.Lock()
+        self._records = {}
+        self._text_lru = OrderedDict()  # task_id -> размер текста в байтах
+        self._text_bytes = 0
+
+    def get(self, task_id):
+        return self._records.get(task_id)
+
+    def put(self, record):
+        with self._lock:
+            old = self._records.get(record.id)
+            if old is not None:
+                self._drop_text(old)
+            self._records[record.id] = record
+
+    def get_pages(self, task_id):
+        with self._lock:
+            record = self._records.get(task_id)
+            if record is None or record.text_pages is None:
+                return None
+            self._text_lru.move_to_end(task_id)
+            return record.text_pages
+
+    def put_pages(self, task_id, pages):
+        size = sys.getsizeof(pages) + sum(sys.getsizeof(page) for page in pages)
+        with self._lock:
+            record = self._records.get(task_id)
+            # Текст больше всего лимита не кешируем вовсе
+            if record is None or size > self.text_cache_bytes:
+                return
+            self._drop_text(record)
+            record.text_pages = pages
+            self._text_lru[task_id] = size
+            self._text_bytes += size
+            while self._text_bytes > self.text_cache_bytes:
+                evicted_id, evicted_size = self._text_lru.popitem(last=False)
+                self._records[evicted_id].text_pages = None
+                self._text_bytes -= evicted_size
+
+    def invalidate(self, task_id=None):
+        """Сбрасывает одно задание или (без аргумента) весь кеш"""
+        with self._lock:
+            if task_id is None:
+                self._records.clear()
+                self._text_lru.clear()
+                self._text_bytes = 0
+                return
+            record = self._records.pop(task_id, None)
+            if record is not None:
+                self._drop_text(record)
+
+    def _drop_text(self, record):
+        size = self._text_lru.pop(record.id, None)
+        if size is not None:
+            self._text_bytes -= size
+        record.text_pages = None
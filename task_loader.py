@@ -0,0 +1,91 @@
+import hashlib
+
+from text_storage import compress_text, decompress_text, index_task_texts
+
+# Сколько строк отправляется одним executemany
+DEFAULT_BATCH_SIZE = 500
+
+
+def task_hash(question_text, correct_answer):
+    """Ключ дедупликации заданий (tasks.content_hash): тот же, что старый поиск по вопросу и ответу"""
+    return hashlib.sha1(f"{question_text}\x00{correct_answer}".encode("utf-8")).hexdigest()
+
+
+class LoadResult:
+    __slots__ = ('inserted', 'updated', 'skipped')
+
+    def __init__(self):
+        self.inserted = self.updated = self.skipped = 0
+
+    def __str__(self):
+        return f"добавлено {self.inserted}, обновлено {self.updated}, пропущено {self.skipped}"
+
+
+def load_tasks(conn, tasks, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Массовая загрузка заданий в tasks одной транзакцией.
+
+    tasks - итерируемое словарей {'line', 'question', 'answer', 'content', 'options', 'source_id', 'raw_hash'}
+    (все, кроме первых трех, необязательны). Задание ищется по content_hash
+    (вопрос + ответ): новое добавляется, у найденного обновляются линия, варианты,
+    текст произведения, номер на сайте и ключ в архиве HTML, если они изменились
+    (отсутствующие номер и ключ не затирают сохраненные); is_active не трогается, чтобы
+    не вернуть скрытые админом задания. Без вопроса или ответа - пропускается.
+    Возвращает LoadResult.
+    """
+    result = LoadResult()
+    batch = {}
+    with conn:
+        cursor = conn.cursor()
+        for task in tasks:
+            if not task.get('question') or not task.get('answer'):
+                result.skipped += 1
+                continue
+            row = (task['line'], task['question'], task.get('options'), compress_text(task.get('content')),
+                   task['answer'], task_hash(task['question'], task['answer']),
+                   task.get('source_id'), task.get('raw_hash'))
+            if row[5] in batch:
+                result.skipped += 1
+            batch[row[5]] = row
+            if len(batch) >= batch_size:
+                _flush(cursor, batch, result)
+                batch = {}
+        if batch:
+            _flush(cursor, batch, result)
+    return result
+
+
+def _flush(cursor, batch, result):
+    placeholders = ",".join("?" * len(batch))
+    existing = {row[0]: row[1:] for row in cursor.execute(
+        f"SELECT content_hash, line_number, options_text, content_z, source_id, raw_hash FROM tasks WHERE content_hash IN ({placeholders})",
+        list(batch))}
+    changed = []
+    for content_hash, row in batch.items():
+        old = existing.get(content_hash)
+        if old is None:
+            result.inserted += 1
+        elif old[:3] != (row[0], row[2], row[3]) or any(
+                new is not None and new != saved for new, saved in zip(row[6:], old[3:])):
+            result.updated += 1
+        else:
+            result.skipped += 1
+            continue
+        changed.append(row)
+    cursor.executemany('''
+        INSERT INTO tasks (line_number, question_text, options_text, content_z, correct_answer, content_hash, source_id, raw_hash, is_active)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, 1)
+        ON CONFLICT(content_hash) DO UPDATE SET
+            line_number = excluded.line_number,
+            options_text = excluded.options_text,
+            content_z = excluded.content_z,
+            content_text = NULL,
+            source_id = COALESCE(excluded.source_id, source_id),
+            raw_hash = COALESCE(excluded.raw_hash, raw_hash)
+    ''', changed)
+    # Текст произведения в поисковый индекс (вопрос туда кладет триггер на INSERT)
+    if changed:
+        ids = dict(cursor.execute(
+            f"SELECT content_hash, id FROM tasks WHERE content_hash IN ({','.join('?' * len(changed))})",
+            [row[5] for row in changed]).fetchall())
+        index_task_texts(cursor, ((ids[row[5]], decompress_text(row[3])) for row in changed))
@@ -0,0 +1,117 @@
+import random
+import threading
+from array import array
+
+
+class TaskSampler:
+    """
+    Выбор случайного нерешенного задания без ORDER BY RANDOM().
+
+    Для каждой линии хранится компактный массив id активных заданий,
+    для каждого ученика - множество id заданий, которые он уже получал
+    (загружается из user_results один раз). Выбор - случайный индекс в массиве,
+    в среднем O(1) на линию, пока ученик не прошел большую часть линии.
+
+    Состояние живет в памяти процесса. Database обновляет его при выдаче заданий
+    и при скрытии/возврате задания; задания, добавленные парсером в работающую базу,
+    появятся после reload_tasks() или перезапуска бота.
+    """
+    # Сколько раз пробуем случайный индекс, прежде чем отфильтровать линию целиком
+    MAX_RANDOM_ATTEMPTS = 8
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._line_tasks = {}   # line_number -> array('q') id активных заданий
+        self._positions = {}    # task_id -> индекс в массиве своей линии
+        self._task_lines = {}   # task_id -> line_number
+        self._seen = {}         # user_id -> set(task_id)
+
+    def is_loaded(self):
+        return self._loaded
+
+    def load_tasks(self, rows):
+        """rows: пары (task_id, line_number) всех активных заданий"""
+        with self._lock:
+            self._line_tasks = {}
+            self._positions = {}
+            self._task_lines = {}
+            for task_id, line_number in rows:
+                self._add(task_id, line_number)
+            self._loaded = True
+
+    def reload_tasks(self):
+        """Следующий вызов Database перечитает активные задания из базы"""
+        with self._lock:
+            self._loaded = False
+
+    def has_user(self, user_id):
+        return user_id in self._seen
+
+    def load_user(self, user_id, task_ids):
+        with self._lock:
+            self._seen[user_id] = set(task_ids)
+
+    def clear_users(self):
+        """Забывает историю всех учеников (задания остаются загруженными)"""
+        with self._lock:
+            self._seen.clear()
+
+    def forget(self, user_id, task_ids):
+        """Задания снова доступны ученику (выдача отменена)"""
+        with self._lock:
+            seen = self._seen.get(user_id)
+            if seen is not None:
+                seen.difference_update(task_ids)
+
+    def mark_seen(self, user_id, task_id):
+        with self._lock:
+            seen = self._seen.get(user_id)
+            if seen is not None:
+                seen.add(task_id)
+
+    def set_active(self, task_id, line_number, is_active):
+        with self._lock:
+            if is_active:
+                self._add(task_id, line_number)
+            else:
+                self._remove(task_id)
+
+    def draw(self, user_id, line_number):
+        """Случайный id активного задания линии, которое ученик еще не получал, или None"""
+        with self._lock:
+            tasks = self._line_tasks.get(line_number)
+            if not tasks:
+                return None
+            seen = self._seen.get(user_id, ())
+
+            for _ in range(self.MAX_RANDOM_ATTEMPTS):
+                task_id = tasks[random.randrange(len(tasks))]
+                if task_id not in seen:
+                    return task_id
+
+            # Ученик прошел большую часть линии: выбираем из оставшихся явно
+            candidates = [task_id for task_id in tasks if task_id not in seen]
+            return random.choice(candidates) if candidates else None
+
+    # --- Внутренние операции (вызываются под self._lock) ---
+
+    def _add(self, task_id, line_number):
+        if task_id in self._positions:
+            return
+        tasks = self._line_tasks.setdefault(line_number, array('q'))
+        self._positions[task_id] = len(tasks)
+        self._task_lines[task_id] = line_number
+        tasks.append(task_id)
+
+    def _remove(self, task_id):
+        index = self._positions.pop(task_id, None)
+        if index is None:
+            return
+        tasks = self._line_tasks[self._task_lines.pop(task_id)]
+        # Меняем местами с последним элементом и удаляем хвост - O(1)
+        last_id = tasks[-1]
+        tasks[index] = last_id
+        tasks.pop()
+        if last_id != task_id:
+            self._positions[last_id] = index
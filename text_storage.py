@@ -0,0 +1,76 @@
+import html
+import zlib
+
+# Размер страницы текста в символах ПОСЛЕ экранирования.
+# Лимит Telegram - 4096, остаток оставляем под заголовок и служебные строки.
+TEXT_PAGE_SIZE = 3300
+COMPRESSION_LEVEL = 9
+
+
+def compress_text(text):
+    """Текст произведения -> zlib-блоб для колонки tasks.content_z"""
+    if not text:
+        return None
+    return zlib.compress(text.encode("utf-8"), COMPRESSION_LEVEL)
+
+
+def decompress_text(blob):
+    if not blob:
+        return None
+    return zlib.decompress(blob).decode("utf-8")
+
+
+def search_text(text):
+    """Текст для поискового индекса tasks_fts: unicode61 приводит регистр кириллицы, но ё считает отдельной буквой"""
+    return text.replace("ё", "е").replace("Ё", "Е") if text else None
+
+
+def index_task_texts(cursor, texts):
+    """
+    [(task_id, текст произведения)] -> колонка content_text индекса tasks_fts.
+    Вопросы индексируют триггеры, а тексты сжаты в content_z и SQL их не прочитает,
+    поэтому каждый, кто пишет content_z, обновляет индекс этой функцией.
+    """
+    cursor.executemany("UPDATE tasks_fts SET content_text = ? WHERE rowid = ?",
+                       ((search_text(text), task_id) for task_id, text in texts))
+
+
+def paginate_html(text, page_size=TEXT_PAGE_SIZE):
+    """
+    Делит текст на страницы для Telegram и экранирует каждую.
+    Режем по абзацам, затем по словам и только в крайнем случае посреди слова.
+    Экранируется каждый кусок целиком, поэтому HTML-сущность никогда не разрывается.
+    """
+    pages = []
+    current = []
+    current_size = 0
+
+    for piece in _split_pieces(text, page_size):
+        size = len(html.escape(piece))
+        if current and current_size + size > page_size:
+            pages.append("".join(current).strip())
+            current, current_size = [], 0
+        current.append(piece)
+        current_size += size
+
+    if current:
+        pages.append("".join(current).strip())
+    return [html.escape(page) for page in pages if page]
+
+
+def _split_pieces(text, page_size):
+    """Куски текста, каждый из которых после экранирования не длиннее page_size"""
+    for line in text.splitlines(keepends=True):
+        if len(html.escape(line)) <= page_size:
+            yield line
+            continue
+        words = line.split(" ")
+        for number, word in enumerate(words):
+            if number < len(words) - 1:
+                word += " "
+            while len(html.escape(word)) > page_size:
+                # Экранирование удлиняет текст максимум в 6 раз ('"' -> '&quot;')
+                cut = page_size // 6
+                yield word[:cut]
+                word = word[cut:]
+            yield word
@@ -0,0 +1,96 @@
+import asyncio
+import logging
+import signal
+
+from aiohttp import web
+from aiogram.methods import TelegramMethod
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+
+
+class TrackedRequestHandler(SimpleRequestHandler):
+    """
+    Обработчик вебхука: отвечает Telegram сразу, апдейт обрабатывает фоновой задачей
+    и хранит эти задачи, чтобы при остановке дождаться уже принятых апдейтов.
+    Апдейт учитывается с приема запроса, а не в middleware диспетчера: апдейт, который ждет
+    блокировку своего чата (SimpleEventIsolation), в цепочку middleware еще не вошел.
+    """
+    def __init__(self, dispatcher, bot, secret_token):
+        super().__init__(dispatcher=dispatcher, bot=bot, secret_token=secret_token)
+        self.in_flight = set()
+
+    async def handle(self, request):
+        bot = await self.resolve_bot(request)
+        if not self.verify_secret(request.headers.get("X-Telegram-Bot-Api-Secret-Token", ""), bot):
+            return web.Response(body="Unauthorized", status=401)
+        update = await request.json(loads=bot.session.json_loads)
+        task = asyncio.create_task(self._feed(bot, update))
+        self.in_flight.add(task)
+        task.add_done_callback(self.in_flight.discard)
+        return web.json_response({}, dumps=bot.session.json_dumps)
+
+    async def _feed(self, bot, update):
+        try:
+            result = await self.dispatcher.feed_raw_update(bot=bot, update=update, **self.data)
+            # Ответ хендлера методом API (webhook reply) отправляем обычным запросом
+            if isinstance(result, TelegramMethod):
+                await self.dispatcher.silent_call_request(bot=bot, result=result)
+        except Exception:
+            logging.exception("Сбой обработки апдейта из вебхука")
+
+    async def wait_idle(self, timeout):
+        if not self.in_flight:
+            return True
+        _, pending = await asyncio.wait(set(self.in_flight), timeout=timeout)
+        return not pending
+
+
+def build_webhook_app(dp, bot, path, secret):
+    """aiohttp-приложение с эндпоинтом вебхука и проверкой X-Telegram-Bot-Api-Secret-Token"""
+    app = web.Application()
+    # Сначала startup/shutdown диспетчера, потом обработчик: при остановке наши on_shutdown
+    # (например, отправка очереди отчетов) выполняются до закрытия сессии бота
+    setup_application(app, dp, bot=bot)
+    handler = TrackedRequestHandler(dispatcher=dp, bot=bot, secret_token=secret)
+    handler.register(app, path=path)
+    return app, handler
+
+
+async def run_webhook(dp, bot, base_url, path, secret, host="0.0.0.0", port=8080,
+                      drain_timeout=30, stop_event=None):
+    """
+    Принимает апдейты через вебхук вместо long polling.
+    Останавливается по SIGINT/SIGTERM (или stop_event): сначала перестаем принимать запросы,
+    затем ждем завершения уже начатых хендлеров (не дольше drain_timeout), затем закрываемся.
+    Вебхук у Telegram не удаляем, а при запуске не сбрасываем очередь - апдейты, пришедшие
+    во время перезапуска, Telegram доставит после него.
+    secret обязателен: без него эндпоинт принял бы апдейты от кого угодно.
+    """
+    if not secret:
+        raise ValueError("Для вебхука нужен секрет (X-Telegram-Bot-Api-Secret-Token)")
+    app, handler = build_webhook_app(dp, bot, path, secret)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    await bot.set_webhook(f"{base_url.rstrip('/')}{path}", secret_token=secret)
+    print(f"Вебхук слушает {host}:{port}{path}")
+
+    stop_event = stop_event or asyncio.Event()
+    loop = asyncio.get_running_loop()
+    signals = []
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop_event.set)
+            signals.append(sig)
+        except (NotImplementedError, RuntimeError):
+            pass  # Windows: остановка по Ctrl+C через KeyboardInterrupt
+
+    try:
+        await stop_event.wait()
+    finally:
+        for sig in signals:
+            loop.remove_signal_handler(sig)
+        await site.stop()
+        if not await handler.wait_idle(drain_timeout):
+            logging.error(f"Остановка: не дождались {len(handler.in_flight)} хендлеров")
+        await runner.cleanup()